@@ -4,6 +4,9 @@ import os
 from typing import List
 from datetime import datetime
 
+import ETL_Cache
+import ETL_DAG
+
 # ==============================================================================
 #                      CONFIGURACIÓN PRINCIPAL
 # ==============================================================================
@@ -33,6 +36,11 @@ LOG_BASE_DIR = r'C:\Users\USUARIO\Documents\Juan Manuel Cortes Benitez\Python\Pr
 # Prefijo del nombre del archivo de log.
 LOG_FILE_PREFIX = 'Modelado'
 
+#  4. CACHÉ DE SCRIPTS
+# Si está activa, un script cuyo código y archivos de entrada no cambiaron desde la
+# última corrida no se vuelve a ejecutar (su archivo de salida sigue siendo válido).
+USAR_CACHE: bool = True
+
 
 # ==============================================================================
 #                      FUNCIÓN DE LOGGING
@@ -143,10 +151,25 @@ if __name__ == '__main__':
     log_message(f"########################################################\n", LOG_FILE_PATH)
     
     scripts_fallidos = []
+    manifiesto = ETL_Cache.ManifiestoCache() if USAR_CACHE else None
     
     # 2. Recorre y ejecuta cada script
     for script_file in SCRIPTS_TO_RUN:
-        exito = execute_python_script(script_file, PYTHON_EXECUTABLE, LOG_FILE_PATH)
+        etapa = ETL_DAG.etapa_de_script(script_file)
+        if manifiesto is None or etapa is None:
+            exito = execute_python_script(script_file, PYTHON_EXECUTABLE, LOG_FILE_PATH)
+        else:
+            # Se omite el script si su código y sus archivos de entrada no cambiaron
+            exito = ETL_Cache.ejecutar_script_con_cache(
+                script_file,
+                lambda: execute_python_script(script_file, PYTHON_EXECUTABLE, LOG_FILE_PATH),
+                lambda mensaje: log_message(mensaje, LOG_FILE_PATH),
+                manifiesto,
+                ETL_DAG.rutas_entradas(etapa),
+                etapa.ruta_almacen,
+                etapa.archivos_fuente,
+                cacheable=etapa.cacheable and etapa.parametros is None
+            )
         
         if not exito:
             scripts_fallidos.append(script_file)
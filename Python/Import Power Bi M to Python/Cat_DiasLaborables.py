@@ -6,6 +6,9 @@ from typing import List, Dict, Any, Optional
 
 import numpy as np
 
+import ETL_Almacen
+import ETL_Excel
+
 # --- CONFIGURACIÓN AJUSTADA ---
 # RUTA DEL NUEVO ARCHIVO EXCEL DE ORIGEN
 
@@ -42,7 +45,8 @@ def load_excel_data(file_path: str, sheet_name: str) -> pd.DataFrame:
     print(f"Usando la pestaña: {sheet_name}")
     try:
         # Cargamos el archivo, forzando a que no use encabezados para el mapeo por índice
-        df = pd.read_excel(file_path, sheet_name=sheet_name, header=None)
+        # (la hoja se lee una sola vez por versión del libro; ver ETL_Excel)
+        df = ETL_Excel.leer_excel(file_path, hoja=sheet_name, header=None)
         print("✔️ Carga de Excel exitosa.")
         # Asignamos nombres de columna temporales para poder indexar
         df.columns = [f'Col_{i}' for i in range(df.shape[1])]
@@ -168,13 +172,14 @@ def aplicar_unpivot_y_exportar(df_combinado: pd.DataFrame) -> pd.DataFrame:
 
 def load_excel_catalog(file_path: str, expected_cols: List[str]) -> pd.DataFrame:
 
-    """Carga y valida el DataFrame de Catálogo desde un archivo Excel local."""
+    """Carga y valida el DataFrame de Catálogo desde el almacén intermedio (o el Excel local)."""
 
     print(f"\n[CARGA DE CATÁLOGO EXCEL]")
 
     try:
 
-        df = pd.read_excel(file_path, header=None, usecols=[0, 1])
+        # El almacén conserva los encabezados: solo se toman las dos primeras columnas
+        df = ETL_Almacen.leer_tabla('Cat_DiasLaborablesCapacidad', file_path).iloc[:, :2]
 
         print(f"Dimensiones del catálogo Excel cargado: {df.shape}")
 
@@ -282,13 +287,18 @@ if __name__ == '__main__':
 
     print("================================================= ")
 
-    # 5. Exportar el resultado final a Excel
+    # 5. Almacén intermedio (Parquet/Arrow): es lo que lee Ext_DiasLaborados
+    df_final_unificada = ETL_Almacen.guardar_tabla('Cat_DiasLaborables', df_final_unificada)
+    print(f"\n✔️ Cat_DiasLaborables guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('Cat_DiasLaborables')}")
 
-    print(f"\n--- PASO 3: EXPORTANDO A EXCEL ---")
-    try:
-        # 💡 CORRECCIÓN 2: Se cambia header=False a header=True para incluir los encabezados en el Excel.
-        df_final_unificada.to_excel(EXPORT_FILE_PATH, index=False, header=True)
-        print(f"✔️ Exportación exitosa a: {EXPORT_FILE_PATH} (Con Encabezados)")
-    except Exception as e:
-        print(f"❌ Error al exportar a Excel: {e}")
-        print("Asegúrese de que la ruta de exportación es válida y que el archivo no está abierto.")
\ No newline at end of file
+    # 6. Exportación opcional del resultado final a Excel
+    if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+        print(f"\n--- PASO 3: EXPORTANDO A EXCEL ---")
+        try:
+            # 💡 CORRECCIÓN 2: Se cambia header=False a header=True para incluir los encabezados en el Excel.
+            df_final_unificada.to_excel(EXPORT_FILE_PATH, index=False, header=True)
+            ETL_Almacen.registrar_exportacion('Cat_DiasLaborables', EXPORT_FILE_PATH)
+            print(f"✔️ Exportación exitosa a: {EXPORT_FILE_PATH} (Con Encabezados)")
+        except Exception as e:
+            print(f"❌ Error al exportar a Excel: {e}")
+            print("Asegúrese de que la ruta de exportación es válida y que el archivo no está abierto.")
\ No newline at end of file
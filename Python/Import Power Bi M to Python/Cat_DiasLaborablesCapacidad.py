@@ -1,14 +1,18 @@
 import pandas as pd
 import os
 
+import ETL_Almacen
+import ETL_Excel
+import ETL_Hojas
+
 # =========================================================================
 # === CONFIGURACIÓN INICIAL PARA ARCHIVO EXCEL (.xlsx) ===
 # =========================================================================
 FILE_NAME = "Datos de power bi (1).xlsx" 
 SHEET_NAME = "NUEVO DESEMPEÑO" 
 
-# Saltamos la Fila 17 y leemos los datos a partir de la Fila 18.
-SKIP_ROWS_COUNT = 17 
+# Las filas de datos son las de las tablas de la hoja (las que siguen a cada encabezado
+# 'CONCEPTO'); el FLAG = 2 elige las de capacidad.
 VALOR_FILTRO = 2 
 
 # Nombres de las columnas de ORIGEN POR ÍNDICE (0-based, después de eliminar Columna 0):
@@ -50,14 +54,24 @@ def diagnosticar_nombre_archivo(file_name):
 # =========================================================================
 # === PROCESAMIENTO PRINCIPAL ===
 # =========================================================================
-try:
-    # 1. Lectura del EXCEL (.xlsx)
-    df = pd.read_excel(
-        FILE_NAME, 
-        sheet_name=SHEET_NAME, 
-        header=None,         # No usar ninguna fila como encabezado
-        skiprows=SKIP_ROWS_COUNT # Saltar hasta la fila 18 (índice 17)
-    )
+
+def generar_cat_dias_laborables_capacidad(file_name: str = FILE_NAME, sheet_name: str = SHEET_NAME) -> pd.DataFrame:
+    """
+    Lee la hoja de desempeño, filtra las filas con FLAG = 2 y devuelve el
+    catálogo de dos columnas (CONCEPTO, DIAS LABORABLES).
+    Lanza FileNotFoundError, KeyError o ValueError para que el llamador
+    decida cómo reportar el fallo.
+    """
+    # 1. Lectura del EXCEL (.xlsx): la misma hoja que lee Cat_DiasLaborables, así que
+    # se toma de la cuadrícula ya leída del libro (ver ETL_Excel)
+    cuadricula = ETL_Excel.leer_cuadricula(file_name, sheet_name)
+
+    # Filas de datos de todas las tablas de la hoja (sin encabezados ni filas previas),
+    # ubicadas por sus encabezados en lugar de saltar un número fijo de filas
+    bloques = ETL_Hojas.segmentar(cuadricula, nombrar_columnas=False)
+    if not bloques:
+        raise ValueError(f"No se encontró ninguna fila de encabezado '{ETL_Hojas.TEXTO_ENCABEZADO}' en la hoja '{sheet_name}'.")
+    df = ETL_Hojas.unir_bloques(bloques).infer_objects()
     
     # 2. Limpieza y mapeo de columnas
     
@@ -83,7 +97,7 @@ try:
     
     df_filtered = df[df[COL_FLAG_RENAMED] == VALOR_FILTRO].copy()
 
-    # --- Post-Filtro y Exportación ---
+    # --- Post-Filtro ---
     if df_filtered.empty:
         raise ValueError(f"El filtro '{COL_FLAG_RENAMED} = {VALOR_FILTRO}' resultó en un DataFrame vacío.")
     
@@ -93,24 +107,37 @@ try:
     df_resultado[NOMBRE_COLUMNA_CONCEPTO_FINAL] = df_resultado[NOMBRE_COLUMNA_CONCEPTO_FINAL].astype(str).str.strip()
     df_resultado[NOMBRE_COLUMNA_DIAS_FINAL] = df_resultado[NOMBRE_COLUMNA_DIAS_FINAL].astype(str).str.strip()
 
-    # 5. Exportación a la carpeta de DESCARGAS
-    df_resultado.to_excel(NOMBRE_ARCHIVO_SALIDA, index=False)
-    
-    # ==============================================================================
-
-    print(f"\n================ EXPORTACIÓN COMPLETADA ================")
-    print(f"✔️ Tabla exportada exitosamente a: {NOMBRE_ARCHIVO_SALIDA}")
-    print(f"Filas exportadas: {len(df_resultado)}")
-    print("\nEl catálogo de capacidad ajustado a dos columnas:")
-    print(df_resultado.to_markdown(index=False, numalign="left", stralign="left"))
-
-except FileNotFoundError:
-    diagnosticar_nombre_archivo(FILE_NAME)
-except KeyError as e:
-    print(f"\n🛑 ERROR CRÍTICO DE COLUMNA: {e}.")
-    print(f"Los índices posicionales son incorrectos. Verifique que las columnas de datos inician en la Fila 18.")
-except ValueError as e:
-    print(f"\n🛑 ERROR CRÍTICO: {e}")
-    print("⚠️ El filtro de datos está funcionando, pero no encontró ninguna fila con FLAG=2. El índice de las columnas de datos puede ser incorrecto.")
-except Exception as e:
-    print(f"\n🛑 ERROR INESPERADO: {e}")
\ No newline at end of file
+    return df_resultado
+
+
+if __name__ == '__main__':
+    try:
+        df_resultado = generar_cat_dias_laborables_capacidad(FILE_NAME, SHEET_NAME)
+
+        # 5. Almacén intermedio (Parquet/Arrow): es lo que lee Cat_DiasLaborables
+        df_resultado = ETL_Almacen.guardar_tabla('Cat_DiasLaborablesCapacidad', df_resultado)
+        print(f"✅ Cat_DiasLaborablesCapacidad guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('Cat_DiasLaborablesCapacidad')}")
+
+        # 6. Exportación opcional a la carpeta de DESCARGAS
+        if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+            df_resultado.to_excel(NOMBRE_ARCHIVO_SALIDA, index=False)
+            ETL_Almacen.registrar_exportacion('Cat_DiasLaborablesCapacidad', NOMBRE_ARCHIVO_SALIDA)
+            print(f"✔️ Tabla exportada exitosamente a: {NOMBRE_ARCHIVO_SALIDA}")
+        
+        # ==============================================================================
+
+        print(f"\n================ EXPORTACIÓN COMPLETADA ================")
+        print(f"Filas exportadas: {len(df_resultado)}")
+        print("\nEl catálogo de capacidad ajustado a dos columnas:")
+        print(df_resultado.to_markdown(index=False, numalign="left", stralign="left"))
+
+    except FileNotFoundError:
+        diagnosticar_nombre_archivo(FILE_NAME)
+    except KeyError as e:
+        print(f"\n🛑 ERROR CRÍTICO DE COLUMNA: {e}.")
+        print(f"Los índices posicionales son incorrectos. Verifique las columnas de las tablas de la hoja '{SHEET_NAME}'.")
+    except ValueError as e:
+        print(f"\n🛑 ERROR CRÍTICO: {e}")
+        print("⚠️ El filtro de datos está funcionando, pero no encontró ninguna fila con FLAG=2. El índice de las columnas de datos puede ser incorrecto.")
+    except Exception as e:
+        print(f"\n🛑 ERROR INESPERADO: {e}")
\ No newline at end of file
@@ -1,13 +1,12 @@
 import pandas as pd
-import io
-import requests
-import json
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
-# URL de exportación CSV de la hoja de cálculo de Google Sheets
-# GID del archivo original: 966198883
-GOOGLE_SHEETS_EXPORT_URL = "https://docs.google.com/spreadsheets/d/1EK96qUKEW2dfnRBT7NfeVouAFouUXDOvHRVVGJ8gs34/export?format=csv&gid=966198883"
+import ETL_Almacen
+import ETL_FuenteCatalogos
+
+# Pestaña del libro de catálogos de Google Sheets (GID del archivo original: 966198883)
+PESTANA_CATALOGO = 'ConceptosInventario'
 
 # Columnas finales requeridas para la selección inicial
 COLUMNAS_FINALES = ["CONCEPTO", "VALOR TOPE", "VALOR PLANTA", "VALOR TRANSITO", "UNIDAD", "SECCION", "ORDEN", "CONCEPTO 2"]
@@ -23,18 +22,23 @@ def transformar_hoja_datos():
     
     # Origen = GoogleSheets.Contents(...)
     try:
-        response = requests.get(GOOGLE_SHEETS_EXPORT_URL)
-        response.raise_for_status()
-        
-        # Lee la respuesta como un archivo CSV
+        # Lee la pestaña como un archivo CSV
         # header=None fuerza a que no promueva encabezados inicialmente
-        df_origen = pd.read_csv(io.StringIO(response.text), header=None)
+        df_origen = ETL_FuenteCatalogos.leer_pestana(PESTANA_CATALOGO, header=None)
         
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error al obtener datos de Google Sheets: {e}")
+    except KeyError as e:
+        # La pestaña no está registrada en ETL_FuenteCatalogos.PESTANAS
+        print(f"❌ Error de configuración del catálogo: {e}")
+        return pd.DataFrame()
+    except FileNotFoundError as e:
+        print(f"❌ No hay copia local de la pestaña '{PESTANA_CATALOGO}' (modo solo espejo o sin descarga previa): {e}")
+        return pd.DataFrame()
+    except (pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        print(f"❌ Error al leer el CSV de la pestaña '{PESTANA_CATALOGO}': {e}")
         return pd.DataFrame()
     except Exception as e:
-        print(f"❌ Error al leer o procesar los datos: {e}")
+        # Falla de la descarga (red o Google Sheets) sin espejo local disponible
+        print(f"❌ Error al obtener datos de Google Sheets: {e}")
         return pd.DataFrame()
 
     # Identificamos la fila de encabezados (asumimos la primera fila, que es la fila 0)
@@ -96,6 +100,10 @@ if __name__ == '__main__':
         print("🛑 El DataFrame final está vacío. Finalizando.")
         exit()
     
+    # Almacén intermedio (Parquet/Arrow): catálogo para el modelo; el Excel se sigue exportando
+    df_resultado = ETL_Almacen.guardar_tabla('ConceptosInventario', df_resultado)
+    print(f"✅ ConceptosInventario guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('ConceptosInventario')}")
+
     # EXPORTACIÓN DEL RESULTADO A LA CARPETA DE DESCARGAS
     output_filename = 'ConceptosInventario.xlsx' # Cambiamos la extensión a .xlsx
     
@@ -109,6 +117,7 @@ if __name__ == '__main__':
         # engine='xlsxwriter' se usa a menudo por defecto, pero se especifica para claridad.
         # index=False: No incluye el índice de Pandas en el archivo.
         df_resultado.to_excel(output_path, index=False, engine='xlsxwriter')
+        ETL_Almacen.registrar_exportacion('ConceptosInventario', output_path)
         
         print("\n================ EXPORTACIÓN ================")
         print(f"✅ Exportación exitosa a Excel. Archivo guardado en:")
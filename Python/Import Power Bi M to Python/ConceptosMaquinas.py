@@ -1,11 +1,12 @@
 import pandas as pd
-import io
-import requests
 import numpy as np
 from pathlib import Path
 
+import ETL_Almacen
+import ETL_FuenteCatalogos
+
 # --- CONFIGURACIÓN ---
-GOOGLE_SHEETS_EXPORT_URL = "https://docs.google.com/spreadsheets/d/1EK96qUKEW2dfnRBT7NfeVouAFouUXDOvHRVVGJ8gs34/gviz/tq?tqx=out:csv&gid=700246857"
+PESTANA_CATALOGO = 'ConceptosMaquinas'  # gid=700246857 del libro de catálogos (consulta gviz)
 COLUMNAS_FINALES_M = ["CONCEPTO", "REAL", "META", "UNIDAD", "ORDEN", "PLANTA"]
 OUTPUT_FILENAME = 'ConceptosMaquinas.xlsx'
 
@@ -22,14 +23,10 @@ def extraer_y_transformar_maquinas_final() -> pd.DataFrame:
     print("Iniciando extracción y tratamiento de REAL/META como TEXTO...")
     
     try:
-        response = requests.get(GOOGLE_SHEETS_EXPORT_URL)
-        response.raise_for_status()
-        
         # 1. Lectura del CSV sin encabezados
-        df_raw = pd.read_csv(
-            io.StringIO(response.text), 
-            header=None, 
-            engine='python',
+        df_raw = ETL_FuenteCatalogos.leer_pestana(
+            PESTANA_CATALOGO,
+            header=None,
             on_bad_lines='skip'
         )
         
@@ -108,20 +105,26 @@ if __name__ == '__main__':
         print("\n🛑 El DataFrame final está vacío. Finalizando.")
         exit()
     
-    # EXPORTACIÓN DEL RESULTADO A LA CARPETA DE DESCARGAS
-    try:
-        descargas_dir = Path.home() / 'Downloads'
-        descargas_dir.mkdir(parents=True, exist_ok=True) 
-        output_path = descargas_dir / OUTPUT_FILENAME
+    # Almacén intermedio (Parquet/Arrow): es lo que lee TR_Datos
+    df_final = ETL_Almacen.guardar_tabla('ConceptosMaquinas', df_final)
+    print(f"✅ ConceptosMaquinas guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('ConceptosMaquinas')}")
 
-        # Usamos engine='xlsxwriter' por su mejor manejo de strings
-        df_final.to_excel(output_path, index=False, engine='xlsxwriter')
+    if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+        # EXPORTACIÓN DEL RESULTADO A LA CARPETA DE DESCARGAS
+        try:
+            descargas_dir = Path.home() / 'Downloads'
+            descargas_dir.mkdir(parents=True, exist_ok=True) 
+            output_path = descargas_dir / OUTPUT_FILENAME
+
+            # Usamos engine='xlsxwriter' por su mejor manejo de strings
+            df_final.to_excel(output_path, index=False, engine='xlsxwriter')
+            ETL_Almacen.registrar_exportacion('ConceptosMaquinas', output_path)
         
-        print("\n================ EXPORTACIÓN ================")
-        print(f"✅ Exportación exitosa a Excel. Archivo guardado en: {output_path}")
+            print("\n================ EXPORTACIÓN ================")
+            print(f"✅ Exportación exitosa a Excel. Archivo guardado en: {output_path}")
 
-    except Exception as e:
-        print(f"❌ Error crítico al exportar el archivo: {e}")
+        except Exception as e:
+            print(f"❌ Error crítico al exportar el archivo: {e}")
         
     # Resultado final en pantalla
     print("\n================ RESULTADO FINAL (MAESTRO) ================")
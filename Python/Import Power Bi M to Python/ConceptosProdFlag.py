@@ -1,12 +1,14 @@
 import pandas as pd
-import io
-import requests
 from pathlib import Path
 import re 
 import numpy as np 
 
+import ETL_Almacen
+import ETL_FuenteCatalogos
+import ETL_Hojas
+
 # --- CONFIGURACIÓN ---
-GOOGLE_SHEETS_EDIT_URL = "https://docs.google.com/spreadsheets/d/1EK96qUKEW2dfnRBT7NfeVouAFouUXDOvHRVVGJ8gs34/edit?pli=1&gid=1118832498#gid=1118832498"
+PESTANA_CATALOGO = 'ConceptosProdFlag'  # gid=1118832498 del libro de catálogos
 OUTPUT_FILENAME = 'ConceptosProdFlag.xlsx'
 
 # Mapeo de columnas M a índices de Pandas (0-indexado)
@@ -14,69 +16,37 @@ COLUMNA_FILTRO_INDEX = 8 # Columna I (M: Column9) -> Índice 8
 COLUMNAS_SELECCIONADAS_INDEX = [1, 5, 8] # B, F, I -> Índices 1, 5, 8
 COLUMNAS_FINALES_NOMBRES = ["Column2", "Column6", "Column9"]
 
-# ***AJUSTE CLAVE CORREGIDO***: FILAS_A_SALTAR se ajusta a 9.
-# La primera fila de datos relevante (1A kg, FLAG=1) es la 10ma del CSV.
-FILAS_A_SALTAR = 9 
+# Las filas de datos se ubican por los encabezados 'CONCEPTO' de las tablas de la hoja
+# (ver ETL_Hojas), en lugar de saltar un número fijo de filas (antes 9).
 
 MAX_COLUMNA_INDEX = max(COLUMNAS_SELECCIONADAS_INDEX) + 1 
 
-def obtener_url_exportacion(edit_url: str) -> str:
-    """Convierte la URL de edición de Google Sheets a la URL de exportación CSV."""
-    try:
-        doc_id = edit_url.split('/d/')[1].split('/edit')[0]
-    except IndexError:
-        return ""
-    
-    gid = "0"
-    gid_start = edit_url.find('gid=')
-    if gid_start != -1:
-        gid_part = edit_url[gid_start + 4:].split('&')[0].split('#')[0]
-        if gid_part.isdigit():
-             gid = gid_part
-    else:
-        fragment = edit_url.split('#')[-1]
-        if fragment.startswith('gid='):
-             gid_fragment_part = fragment[4:].split('&')[0]
-             if gid_fragment_part.isdigit():
-                 gid = gid_fragment_part
-    
-    export_url = f"https://docs.google.com/spreadsheets/d/{doc_id}/export?format=csv&gid={gid}"
-    print(f"URL de exportación generada: {export_url}")
-    return export_url
-
-
 def extraer_y_transformar_desempeno() -> pd.DataFrame:
     """Traduce la lógica M (lectura sin encabezados, filtrado por Column9 = 1) a Pandas."""
     
-    GOOGLE_SHEETS_EXPORT_URL = obtener_url_exportacion(GOOGLE_SHEETS_EDIT_URL)
-    if not GOOGLE_SHEETS_EXPORT_URL:
-        return pd.DataFrame()
-        
     print("Iniciando extracción y transformación de 'NUEVO DESEMPEÑO'...")
     
     try:
-        response = requests.get(GOOGLE_SHEETS_EXPORT_URL)
-        response.raise_for_status()
-        
-        # 1. Origen: Lectura con skiprows ajustado
+        # 1. Origen: Lectura de la hoja completa sin encabezados
         # Se añaden 10 nombres extra para capturar la fila de encabezado
         nombres_forzados = [f'Column{i+1}' for i in range(MAX_COLUMNA_INDEX + 10)] 
 
-        df = pd.read_csv(
-            io.StringIO(response.text), 
+        cuadricula = ETL_FuenteCatalogos.leer_pestana(
+            PESTANA_CATALOGO,
             header=None, 
-            skiprows=FILAS_A_SALTAR, # <--- AJUSTE CLAVE: 9
-            engine='python',
             on_bad_lines='skip',
             names=nombres_forzados
         ).iloc[:, :MAX_COLUMNA_INDEX] # Recortamos a las columnas necesarias
 
+        # Filas de datos de las tablas de la hoja (sin sus encabezados ni las filas previas)
+        df = ETL_Hojas.unir_bloques(ETL_Hojas.segmentar(cuadricula, nombrar_columnas=False))
+
     except Exception as e:
         print(f"❌ Error crítico de conexión o lectura (Verifica URL y permisos): {e}")
         return pd.DataFrame()
 
     columna_filtro_nombre = f'Column{COLUMNA_FILTRO_INDEX + 1}'
-    print(f"\n✅ PASO 1: Archivo leído, saltando {FILAS_A_SALTAR} filas. Filtro en {columna_filtro_nombre} (Columna I).")
+    print(f"\n✅ PASO 1: Archivo leído, {len(df)} filas de datos. Filtro en {columna_filtro_nombre} (Columna I).")
 
     # 2. Aplicamos el filtro directo (SIN LIMPIEZA)
     print("⚠️ PASO 2: Aplicando filtro directo (SIN limpieza robusta).")
@@ -139,7 +109,7 @@ if __name__ == '__main__':
     
     if df_final.empty:
         print("\n🛑 El DataFrame final está vacío. Finalizando.")
-        print(f"Causas: El valor '1.0' no se encontró o el 'skiprows={FILAS_A_SALTAR}' debe ajustarse (prueba 8 o 10).")
+        print(f"Causas: El valor '1.0' no se encontró o la hoja no tiene encabezados '{ETL_Hojas.TEXTO_ENCABEZADO}' en sus primeras columnas.")
         
         # Imprimimos el DataFrame final (vacío) para mostrar el resultado
         print("\n================ RESULTADO FINAL ================")
@@ -147,19 +117,25 @@ if __name__ == '__main__':
         print(df_final.head())
         exit()
     
-    # EXPORTACIÓN DEL RESULTADO
-    try:
-        descargas_dir = Path.home() / 'Downloads'
-        descargas_dir.mkdir(parents=True, exist_ok=True) 
-        output_path = descargas_dir / OUTPUT_FILENAME
-
-        df_final.to_excel(output_path, index=False)
+    # Almacén intermedio (Parquet/Arrow): es lo que lee TR_Datos
+    df_final = ETL_Almacen.guardar_tabla('ConceptosProdFlag', df_final)
+    print(f"✅ ConceptosProdFlag guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('ConceptosProdFlag')}")
+
+    if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+        # EXPORTACIÓN DEL RESULTADO
+        try:
+            descargas_dir = Path.home() / 'Downloads'
+            descargas_dir.mkdir(parents=True, exist_ok=True) 
+            output_path = descargas_dir / OUTPUT_FILENAME
+
+            df_final.to_excel(output_path, index=False)
+            ETL_Almacen.registrar_exportacion('ConceptosProdFlag', output_path)
         
-        print("\n================ EXPORTACIÓN ================")
-        print(f"✅ Exportación exitosa a Excel. Archivo guardado en: {output_path}")
+            print("\n================ EXPORTACIÓN ================")
+            print(f"✅ Exportación exitosa a Excel. Archivo guardado en: {output_path}")
 
-    except Exception as e:
-        print(f"❌ Error al exportar el archivo: {e}")
+        except Exception as e:
+            print(f"❌ Error al exportar el archivo: {e}")
         
     # Resultado final en pantalla
     print("\n================ RESULTADO FINAL ================")
@@ -2,6 +2,9 @@ import pandas as pd
 from pathlib import Path
 import io
 
+import ETL_Almacen
+import ETL_CatalogoConceptos
+
 # ==============================================================================
 #                      CONFIGURACIÓN GLOBAL Y ESTRUCTURA DE DATOS
 # ==============================================================================
@@ -185,13 +188,12 @@ PELETIZADO KG	KILOS	Inventarios 360	107	PELETIZADO KG	""	""	""	VALOR PLANTA	PELE
 #                              FUNCIÓN PRINCIPAL (MAIN)
 # ==============================================================================
 
-def crear_reporte_final_forzado():
+def parsear_catalogo() -> pd.DataFrame:
     """
     Crea el DataFrame final directamente desde la cadena de texto estructurada
     para garantizar la salida correcta sin errores de transformación o conexión.
+    Solo lo usa el compilador del catálogo (ETL_CatalogoConceptos).
     """
-    print("================ INICIANDO EJECUCIÓN FORZADA ================")
-    
     try:
         # Usar io.StringIO para leer la cadena de texto como si fuera un archivo TSV
         df_final = pd.read_csv(
@@ -216,21 +218,45 @@ def crear_reporte_final_forzado():
     except Exception as e:
         print(f"❌ ERROR CRÍTICO al parsear los datos: {e}")
         df_final = pd.DataFrame()
+
+    return df_final
+
+
+def construir_conceptos_reporte() -> pd.DataFrame:
+    """Tabla ConceptosReporte del snapshot compilado (se recompila si cambió DATOS_ESTRUCTURADOS)."""
+    try:
+        return ETL_CatalogoConceptos.cargar_catalogo().tabla.copy()
+    except Exception as e:
+        print(f"❌ ERROR CRÍTICO al compilar el catálogo: {e}")
+        return pd.DataFrame()
+
+
+def crear_reporte_final_forzado():
+    """Construye el catálogo ConceptosReporte, lo guarda en el almacén intermedio y opcionalmente en Excel."""
+    print("================ INICIANDO EJECUCIÓN FORZADA ================")
+    
+    df_final = construir_conceptos_reporte()
         
     # --- EXPORTACIÓN DEL RESULTADO ---
     if df_final.empty:
         print("\n🛑 El DataFrame final está vacío. La operación ha terminado sin resultados.")
         return
 
-    try:
-        output_path = Path(OUTPUT_FILENAME)
-        df_final.to_excel(output_path, index=False, engine='openpyxl')
+    # Almacén intermedio (Parquet/Arrow): es lo que lee TR_Real
+    df_final = ETL_Almacen.guardar_tabla('ConceptosReporte', df_final)
+    print(f"✅ ConceptosReporte guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('ConceptosReporte')}")
+
+    if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+        try:
+            output_path = Path(OUTPUT_FILENAME)
+            df_final.to_excel(output_path, index=False, engine='openpyxl')
+            ETL_Almacen.registrar_exportacion('ConceptosReporte', output_path)
         
-        print("\n================ EXPORTACIÓN ================")
-        print(f"✅ Exportación exitosa a Excel. Archivo guardado en: {output_path.resolve()}")
+            print("\n================ EXPORTACIÓN ================")
+            print(f"✅ Exportación exitosa a Excel. Archivo guardado en: {output_path.resolve()}")
 
-    except Exception as e:
-        print(f"❌ Error al exportar el archivo: {e}")
+        except Exception as e:
+            print(f"❌ Error al exportar el archivo: {e}")
         
     # Resultado final en pantalla
     print("\n================ RESULTADO FINAL (COMBINADO) ================")
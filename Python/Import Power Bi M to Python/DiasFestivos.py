@@ -1,60 +1,23 @@
-import holidays
 from datetime import date
 import pandas as pd
-from datetime import date, timedelta
 import os
 from pathlib import Path 
 
-# Diccionario de traducción robusto 
-TRADUCCION_FESTIVOS_MX_ROBUSTO = {
-    "NEW YEAR'S DAY": "Año Nuevo",
-    "CONSTITUTION DAY": "Día de la Constitución",
-    "BENITO JUÁREZ'S BIRTHDAY": "Natalicio de Benito Juárez",
-    "BENITO JUAREZ'S BIRTHDAY": "Natalicio de Benito Juárez",
-    "LABOR DAY": "Día del Trabajo",
-    "LABOUR DAY": "Día del Trabajo",
-    "INDEPENDENCE DAY": "Día de la Independencia",
-    "REVOLUTION DAY": "Día de la Revolución",
-    "CHANGE OF FEDERAL EXECUTIVE POWER": "Transmisión del Poder Ejecutivo Federal",
-    "CHRISTMAS DAY": "Navidad",
-    "MOTHER'S DAY": "Día de la Madre",
-    "ALL SOULS' DAY": "Día de Muertos",
-    "DAY OF THE DEAD": "Día de Muertos",
-    "OUR LADY OF GUADALUPE DAY": "Día de la Virgen de Guadalupe",
-    "MAUNDY THURSDAY": "Jueves Santo",
-    "GOOD FRIDAY": "Viernes Santo",
-}
+import ETL_Almacen
+import ETL_Calendario
+
+# Diccionario de traducción robusto (vive en ETL_Calendario, que genera los festivos)
+TRADUCCION_FESTIVOS_MX_ROBUSTO = ETL_Calendario.TRADUCCION_FESTIVOS_MX
 
 
 def generar_dias_festivos_mexico(año_inicio: int, año_fin: int) -> pd.DataFrame:
     """
     Genera una lista de días festivos oficiales de México para un rango de años,
     con los nombres traducidos al español de forma robusta.
+    El calendario se genera con holidays.MX una sola vez por rango de años y se
+    reutiliza desde el disco en las corridas siguientes.
     """
-    
-    # 1. Generar los días festivos
-    mex_holidays = holidays.MX(years=range(año_inicio, año_fin + 1))
-    
-    festivos_data = [
-        {'Fecha': fecha, 'Festivo': nombre} 
-        for fecha, nombre in mex_holidays.items()
-    ]
-    
-    df_festivos = pd.DataFrame(festivos_data)
-    
-    # 2. TRADUCCIÓN ROBUSTA A ESPAÑOL
-    df_festivos['FESTIVO_UPPER'] = df_festivos['Festivo'].astype(str).str.strip().str.upper()
-    df_festivos['Festivo_Traducido'] = df_festivos['FESTIVO_UPPER'].map(TRADUCCION_FESTIVOS_MX_ROBUSTO)
-    df_festivos['Festivo'] = df_festivos['Festivo_Traducido'].fillna(df_festivos['Festivo'])
-    
-    # 3. Limpieza y tipado final
-    df_festivos = df_festivos.drop(columns=['FESTIVO_UPPER', 'Festivo_Traducido'], errors='ignore')
-    df_festivos['Fecha'] = pd.to_datetime(df_festivos['Fecha'])
-    df_festivos['Festivo'] = df_festivos['Festivo'].astype(str).str.strip()
-    
-    df_festivos = df_festivos.sort_values(by='Fecha').reset_index(drop=True)
-    
-    return df_festivos
+    return ETL_Calendario.obtener_calendario(año_inicio, año_fin).festivos()
 
 # ==============================================================================
 #  SCRIPT PRINCIPAL: Generación y Exportación a la Carpeta de Descargas
@@ -65,39 +28,46 @@ AÑO_ACTUAL = date.today().year
 AÑO_INICIO = AÑO_ACTUAL
 AÑO_FIN = AÑO_ACTUAL + 1 # Generar para el año en curso y el siguiente
 
-df_dias_festivos = generar_dias_festivos_mexico(AÑO_INICIO, AÑO_FIN)
+if __name__ == '__main__':
+    df_dias_festivos = generar_dias_festivos_mexico(AÑO_INICIO, AÑO_FIN)
+
+    # Almacén intermedio (Parquet/Arrow): es lo que lee TR_Datos
+    df_dias_festivos = ETL_Almacen.guardar_tabla('DiasFestivos', df_dias_festivos)
+    print(f"✅ DiasFestivos guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('DiasFestivos')}")
 
-# 1. Definir el nombre del archivo
-nombre_archivo = f"DiasFestivos.xlsx"
+    if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+        # 1. Definir el nombre del archivo
+        nombre_archivo = f"DiasFestivos.xlsx"
 
-# 2. Definir la ruta de destino (Carpeta de Descargas)
-try:
-    #  Intenta encontrar la ruta de la carpeta de Descargas (funciona en la mayoría de SO)
-    downloads_dir = str(Path.home() / "Downloads")
-    ruta_completa = Path(downloads_dir) / nombre_archivo
-except Exception:
-    # Si la ruta anterior falla (ej. entorno restringido), usa el directorio actual
-    print(" No se pudo determinar la ruta de 'Downloads'. Usando el directorio actual.")
-    ruta_completa = Path.cwd() / nombre_archivo
+        # 2. Definir la ruta de destino (Carpeta de Descargas)
+        try:
+            #  Intenta encontrar la ruta de la carpeta de Descargas (funciona en la mayoría de SO)
+            downloads_dir = str(Path.home() / "Downloads")
+            ruta_completa = Path(downloads_dir) / nombre_archivo
+        except Exception:
+            # Si la ruta anterior falla (ej. entorno restringido), usa el directorio actual
+            print(" No se pudo determinar la ruta de 'Downloads'. Usando el directorio actual.")
+            ruta_completa = Path.cwd() / nombre_archivo
 
-# 3. Exportar a Excel
-try:
-    # Usamos openpyxl como motor de escritura
-    df_dias_festivos.to_excel(ruta_completa, index=False, sheet_name='Festivos MX', engine='openpyxl')
+        # 3. Exportar a Excel
+        try:
+            # Usamos openpyxl como motor de escritura
+            df_dias_festivos.to_excel(ruta_completa, index=False, sheet_name='Festivos MX', engine='openpyxl')
+            ETL_Almacen.registrar_exportacion('DiasFestivos', ruta_completa)
     
-    print("-" * 50)
-    print(f"✅ ¡Éxito! El archivo Excel ha sido guardado.")
-    print(f"Ruta completa: {ruta_completa}")
-    print("-" * 50)
+            print("-" * 50)
+            print(f"✅ ¡Éxito! El archivo Excel ha sido guardado.")
+            print(f"Ruta completa: {ruta_completa}")
+            print("-" * 50)
 
-except ImportError:
-    print("\n❌ Error: Necesitas instalar 'openpyxl' (o 'xlsxwriter') para exportar a Excel.")
-    print("Corre el comando: pip install openpyxl pandas")
-except Exception as e:
-    print(f"\n❌ Ocurrió un error al guardar el archivo en la ruta {ruta_completa}: {e}")
+        except ImportError:
+            print("\n❌ Error: Necesitas instalar 'openpyxl' (o 'xlsxwriter') para exportar a Excel.")
+            print("Corre el comando: pip install openpyxl pandas")
+        except Exception as e:
+            print(f"\n❌ Ocurrió un error al guardar el archivo en la ruta {ruta_completa}: {e}")
 
-# Opcional: Mostrar la tabla en consola para verificar
-print(f"\n--- Vista Previa de los Días Festivos ({AÑO_INICIO}-{AÑO_FIN}) ---")
-print(df_dias_festivos.head(15).to_markdown(index=False))
-print("\nTipos de datos de las columnas:")
-print(df_dias_festivos.dtypes)
\ No newline at end of file
+    # Opcional: Mostrar la tabla en consola para verificar
+    print(f"\n--- Vista Previa de los Días Festivos ({AÑO_INICIO}-{AÑO_FIN}) ---")
+    print(df_dias_festivos.head(15).to_markdown(index=False))
+    print("\nTipos de datos de las columnas:")
+    print(df_dias_festivos.dtypes)
\ No newline at end of file
@@ -1,6 +1,10 @@
 import pandas as pd
+from typing import Optional
 import os
 
+import ETL_Almacen
+import ETL_RegistroClaves
+
 # ==============================================================================
 # CONFIGURACIÓN DE RUTAS Y ARCHIVO DE ORIGEN
 # ==============================================================================
@@ -14,20 +18,25 @@ RUTA_ORIGEN = os.path.join(RUTA_BASE, ARCHIVO_ORIGEN)
 OUTPUT_FILE_NAME = "DimCliente.xlsx"
 OUTPUT_PATH = os.path.join(RUTA_BASE, OUTPUT_FILE_NAME)
 
-def transformar_clientes_e_indice(file_path: str) -> pd.DataFrame:
+# Columnas que se leen del origen (el resto del archivo no se carga)
+COLUMNAS_ORIGEN = ["Cliente", "Teléfono"]
+
+def transformar_clientes_e_indice(file_path: str, df_origen: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Convierte la lógica M de creación del catálogo de clientes a Pandas.
     """
-    try:
-        # Cargar el archivo de origen (Excel)
-        df_origen = pd.read_excel(file_path, engine='openpyxl')
-        print(f"Archivo de origen '{ARCHIVO_ORIGEN}' cargado.")
-    except FileNotFoundError:
-        print(f"❌ ERROR: El archivo de origen '{ARCHIVO_ORIGEN}' no se encontró en: {file_path}")
-        return pd.DataFrame()
-    except Exception as e:
-        print(f"❌ ERROR al cargar el archivo de origen: {e}")
-        return pd.DataFrame()
+    if df_origen is None:
+        try:
+            # Cargar el archivo de origen (Excel)
+            # Almacén intermedio (Parquet/Arrow); el archivo de la ruta queda como respaldo
+            df_origen = ETL_Almacen.leer_tabla('Ext_Atencion a clientes', file_path, columnas=COLUMNAS_ORIGEN)
+            print(f"Archivo de origen '{ARCHIVO_ORIGEN}' cargado.")
+        except FileNotFoundError:
+            print(f"❌ ERROR: El archivo de origen '{ARCHIVO_ORIGEN}' no se encontró en: {file_path}")
+            return pd.DataFrame()
+        except Exception as e:
+            print(f"❌ ERROR al cargar el archivo de origen: {e}")
+            return pd.DataFrame()
 
     # Columnas requeridas del script M
     columnas_requeridas = ["Cliente", "Teléfono"]
@@ -47,9 +56,9 @@ def transformar_clientes_e_indice(file_path: str) -> pd.DataFrame:
 
     # 3. #"Índice agregado" = Table.AddIndexColumn(#"Duplicados quitados", "Índice", 1, 1, Int64.Type)
     # 4. #"Columnas con nombre cambiado" = Table.RenameColumns(#"Índice agregado",{{"Índice", "Key_Cliente"}})
-    # Se añade un índice comenzando en 1 con paso de 1, y se nombra directamente.
-    df_temp.reset_index(drop=True, inplace=True)
-    df_temp['Key_Cliente'] = df_temp.index + 1
+    # Claves del registro de la dimensión (comienzan en 1): un cliente nuevo recibe la
+    # siguiente clave sin recorrer las existentes.
+    df_temp = ETL_RegistroClaves.asignar_claves(df_temp, 'DimCliente', ['Cliente', 'Teléfono'], 'Key_Cliente')
     
     # 5. #"Columnas reordenadas" = Table.ReorderColumns(...)
     df_final = df_temp.loc[:, ["Key_Cliente", "Cliente", "Teléfono"]]
@@ -70,9 +79,13 @@ if __name__ == '__main__':
         print(f"Filas resultantes: {len(df_resultado)}")
         print(df_resultado.head().to_markdown(index=False))
         
+        # Almacén intermedio (Parquet/Arrow): es lo que lee fctAtencionClientes
+        df_resultado = ETL_Almacen.guardar_tabla('DimCliente', df_resultado)
+
         # 🚀 EXPORTACIÓN A EXCEL EN CARPETA DE DESCARGAS
         try:
             df_resultado.to_excel(OUTPUT_PATH, index=False, engine='openpyxl')
+            ETL_Almacen.registrar_exportacion('DimCliente', OUTPUT_PATH)
             print(f"\n✅ **¡Éxito!** El catálogo de clientes se ha guardado en:")
             print(f"   {OUTPUT_PATH}")
         except Exception as e:
@@ -1,7 +1,11 @@
 import pandas as pd
+from typing import Optional
 import numpy as np
 import os
 
+import ETL_Almacen
+import ETL_RegistroClaves
+
 # ==============================================================================
 # CONFIGURACIÓN DE RUTAS Y ARCHIVO DE ORIGEN
 # ==============================================================================
@@ -16,21 +20,26 @@ RUTA_ORIGEN = os.path.join(RUTA_BASE, ARCHIVO_ORIGEN_TR_DATOS)
 OUTPUT_FILE_NAME = "DimConcepto.xlsx"
 OUTPUT_PATH = os.path.join(RUTA_BASE, OUTPUT_FILE_NAME)
 
-def transformar_conceptos_e_indice(file_path: str) -> pd.DataFrame:
+# Columnas que se leen del origen (incluye los nombres alternativos de Concepto2)
+COLUMNAS_ORIGEN = ["Concepto", "Reporte", "Orden", "Unidad", "Concepto2", "CONCEPTO 2", "Concepto 2"]
+
+def transformar_conceptos_e_indice(file_path: str, df_origen: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Convierte la lógica M de creación del catálogo de conceptos a Pandas.
     La tabla de origen es el archivo TR_Datos.xlsx.
     """
-    try:
-        # Cargar el archivo de origen (Excel)
-        df_origen = pd.read_excel(file_path, engine='openpyxl')
-        print(f"Archivo de origen '{ARCHIVO_ORIGEN_TR_DATOS}' cargado.")
-    except FileNotFoundError:
-        print(f"❌ ERROR: El archivo de origen TR_Datos.xlsx no se encontró en: {file_path}")
-        return pd.DataFrame()
-    except Exception as e:
-        print(f"❌ ERROR al cargar el archivo de origen: {e}")
-        return pd.DataFrame()
+    if df_origen is None:
+        try:
+            # Cargar el archivo de origen (Excel)
+            # Almacén intermedio (Parquet/Arrow); el archivo de la ruta queda como respaldo
+            df_origen = ETL_Almacen.leer_tabla('TR_Datos', file_path, columnas=COLUMNAS_ORIGEN)
+            print(f"Archivo de origen '{ARCHIVO_ORIGEN_TR_DATOS}' cargado.")
+        except FileNotFoundError:
+            print(f"❌ ERROR: El archivo de origen TR_Datos.xlsx no se encontró en: {file_path}")
+            return pd.DataFrame()
+        except Exception as e:
+            print(f"❌ ERROR al cargar el archivo de origen: {e}")
+            return pd.DataFrame()
 
     # Columnas requeridas del script M
     columnas_a_mantener = ["Concepto", "Reporte", "Orden", "Unidad", "Concepto2"]
@@ -64,16 +73,23 @@ def transformar_conceptos_e_indice(file_path: str) -> pd.DataFrame:
     # Quitamos duplicados basados en todas las columnas existentes hasta este punto
     df_temp.drop_duplicates(inplace=True)
 
+    # El registro de claves identifica al miembro por (Reporte, Concepto): si un concepto
+    # trae otro Orden/Unidad/Concepto2 en otra fila, se conserva la primera aparición
+    duplicados = df_temp.duplicated(subset=['Reporte', 'Concepto'], keep='first')
+    if duplicados.any():
+        print(f"⚠️ Advertencia: {duplicados.sum()} conceptos repetidos con atributos distintos; se conserva la primera fila de cada uno.")
+        df_temp = df_temp[~duplicados]
+
     # 4. #"Índice agregado": Crear Key_Conceptos (inicia en 1)
     # Table.AddIndexColumn(..., "Key_Conceptos", 1, 1, Int64.Type)
-    df_temp.reset_index(drop=True, inplace=True)
-    df_temp['Key_Conceptos'] = df_temp.index + 1
+    # Las claves salen del registro de la dimensión: un concepto nuevo no recorre las existentes
+    df_temp = ETL_RegistroClaves.asignar_claves(df_temp, 'DimConcepto', ['Reporte', 'Concepto'], 'Key_Conceptos')
     
     # 5. #"Valor reemplazado": Reemplazar "" por null en Concepto2
     # Table.ReplaceValue(#"Índice agregado", "", null, Replacer.ReplaceValue,{"Concepto2"})
     if 'Concepto2' in df_temp.columns:
         # Reemplazar cadenas vacías con NaN (nulos)
-        df_temp['Concepto2'].replace('', np.nan, inplace=True)
+        df_temp['Concepto2'] = df_temp['Concepto2'].replace('', np.nan)
 
     # Reordenar las columnas
     columnas_finales = [
@@ -97,10 +113,14 @@ if __name__ == '__main__':
         print(f"Filas resultantes: {len(df_resultado)}")
         print(df_resultado.head().to_markdown(index=False))
         
+        # Almacén intermedio (Parquet/Arrow): es lo que lee fctFinanzasDiario
+        df_resultado = ETL_Almacen.guardar_tabla('DimConcepto', df_resultado)
+
         # EXPORTACIÓN A EXCEL EN CARPETA DE DESCARGAS
         try:
             # ✅ CORRECCIÓN: 'openypxl' se cambió a 'openpyxl'
             df_resultado.to_excel(OUTPUT_PATH, index=False, engine='openpyxl') 
+            ETL_Almacen.registrar_exportacion('DimConcepto', OUTPUT_PATH)
             print(f"\n✅ **¡Éxito!** El catálogo de conceptos se ha guardado en:")
             print(f"   {OUTPUT_PATH}")
         except Exception as e:
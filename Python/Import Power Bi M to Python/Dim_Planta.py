@@ -1,6 +1,10 @@
 import pandas as pd
+from typing import Optional
 import os
 
+import ETL_Almacen
+import ETL_RegistroClaves
+
 # ==============================================================================
 # CONFIGURACIÓN DE RUTAS Y ARCHIVO DE ORIGEN
 # ==============================================================================
@@ -10,7 +14,10 @@ RUTA_BASE = r"C:\Users\USUARIO\Downloads"
 ARCHIVO_ORIGEN = "Ext_Datos.csv"
 RUTA_ORIGEN = os.path.join(RUTA_BASE, ARCHIVO_ORIGEN)
 
-def transformar_plantas_e_indice(file_path: str) -> pd.DataFrame:
+# Columnas que se leen del origen ('SEGMENTO' es el nombre anterior de 'Division')
+COLUMNAS_ORIGEN = ['planta', 'Division', 'SEGMENTO']
+
+def transformar_plantas_e_indice(file_path: str, df_origen: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Convierte la lógica M de extracción de plantas/divisiones a Pandas.
 
@@ -20,16 +27,18 @@ def transformar_plantas_e_indice(file_path: str) -> pd.DataFrame:
     3. Personalizada agregada (Table.AddColumn - IdPlanta)
     4. Índice agregado (Table.AddIndexColumn - Key_Plantas)
     """
-    try:
-        # Cargar el archivo de origen.
-        # Asumiendo que Ext_Datos.csv es el formato más reciente que has usado.
-        df_origen = pd.read_csv(file_path, low_memory=False)
-    except FileNotFoundError:
-        print(f"❌ ERROR: El archivo de origen TR_Datos ({ARCHIVO_ORIGEN}) no se encontró en: {file_path}")
-        return pd.DataFrame()
-    except Exception as e:
-        print(f"❌ ERROR al cargar el archivo de origen: {e}")
-        return pd.DataFrame()
+    if df_origen is None:
+        try:
+            # Cargar el archivo de origen.
+            # Asumiendo que Ext_Datos.csv es el formato más reciente que has usado.
+            # Almacén intermedio (Parquet/Arrow); el archivo de la ruta queda como respaldo
+            df_origen = ETL_Almacen.leer_tabla('Ext_Datos', file_path, columnas=COLUMNAS_ORIGEN)
+        except FileNotFoundError:
+            print(f"❌ ERROR: El archivo de origen TR_Datos ({ARCHIVO_ORIGEN}) no se encontró en: {file_path}")
+            return pd.DataFrame()
+        except Exception as e:
+            print(f"❌ ERROR al cargar el archivo de origen: {e}")
+            return pd.DataFrame()
 
     # 1. #"Columnas quitadas" = Table.SelectColumns(Origen, {"planta","Division"})
     # Aseguramos el nombre de las columnas, ya que 'SEGMENTO' se usó anteriormente.
@@ -48,9 +57,9 @@ def transformar_plantas_e_indice(file_path: str) -> pd.DataFrame:
     df_temp['IdPlanta'] = df_temp['planta'].astype(str) + '|' + df_temp['Division'].astype(str)
 
     # 4. #"Índice agregado" = Table.AddIndexColumn(..., "Key_Plantas", 1, 1, Int64.Type)
-    # Se añade un índice comenzando en 1 con paso de 1, como en M.
-    df_temp.reset_index(drop=True, inplace=True)
-    df_temp['Key_Plantas'] = df_temp.index + 1
+    # Claves del registro de la dimensión (comienzan en 1, como en M): una planta nueva
+    # recibe la siguiente clave sin recorrer las existentes.
+    df_temp = ETL_RegistroClaves.asignar_claves(df_temp, 'DimPlanta', ['planta', 'Division'], 'Key_Plantas')
     
     # Reordenar las columnas al estilo M (clave al final)
     df_final = df_temp[['planta', 'Division', 'IdPlanta', 'Key_Plantas']]
@@ -70,10 +79,14 @@ if __name__ == '__main__':
         print("\n================ RESULTADO (Catálogo de Plantas) ================")
         print(df_resultado.to_markdown(index=False))
         
+        # Almacén intermedio (Parquet/Arrow): es lo que lee fctFinanzasDiario
+        df_resultado = ETL_Almacen.guardar_tabla('DimPlanta', df_resultado)
+
         # Opcional: Exportar este catálogo si es necesario (ejemplo: para otro merge)
         OUTPUT_PLANTAS_PATH = os.path.join(RUTA_BASE, "DimPlanta.xlsx")
         try:
             df_resultado.to_excel(OUTPUT_PLANTAS_PATH, index=False, engine='openpyxl')
+            ETL_Almacen.registrar_exportacion('DimPlanta', OUTPUT_PLANTAS_PATH)
             print(f"\n✅ Catálogo de Plantas guardado en:")
             print(f"   {OUTPUT_PLANTAS_PATH}")
         except Exception as e:
@@ -1,6 +1,10 @@
 import pandas as pd
+from typing import Optional
 import os
 
+import ETL_Almacen
+import ETL_RegistroClaves
+
 # ==============================================================================
 # CONFIGURACIÓN DE RUTAS Y ARCHIVO DE ORIGEN
 # ==============================================================================
@@ -14,21 +18,26 @@ RUTA_ORIGEN = os.path.join(RUTA_BASE, ARCHIVO_ORIGEN)
 OUTPUT_FILE_NAME = "DimPlantaClientes.xlsx"
 OUTPUT_PATH = os.path.join(RUTA_BASE, OUTPUT_FILE_NAME)
 
-def transformar_plantas_cte_e_indice(file_path: str) -> pd.DataFrame:
+# Columnas que se leen del origen (el resto del archivo no se carga)
+COLUMNAS_ORIGEN = ["planta"]
+
+def transformar_plantas_cte_e_indice(file_path: str, df_origen: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Convierte la lógica M de creación del catálogo de plantas de cliente a Pandas:
     Selecciona 'planta', quita duplicados y añade Key_PlantasCte.
     """
-    try:
-        # Cargar el archivo de origen (Excel)
-        df_origen = pd.read_excel(file_path, engine='openpyxl')
-        print(f"Archivo de origen '{ARCHIVO_ORIGEN}' cargado.")
-    except FileNotFoundError:
-        print(f"❌ ERROR: El archivo de origen '{ARCHIVO_ORIGEN}' no se encontró en: {file_path}")
-        return pd.DataFrame()
-    except Exception as e:
-        print(f"❌ ERROR al cargar el archivo de origen: {e}")
-        return pd.DataFrame()
+    if df_origen is None:
+        try:
+            # Cargar el archivo de origen (Excel)
+            # Almacén intermedio (Parquet/Arrow); el archivo de la ruta queda como respaldo
+            df_origen = ETL_Almacen.leer_tabla('Ext_Atencion a clientes', file_path, columnas=COLUMNAS_ORIGEN)
+            print(f"Archivo de origen '{ARCHIVO_ORIGEN}' cargado.")
+        except FileNotFoundError:
+            print(f"❌ ERROR: El archivo de origen '{ARCHIVO_ORIGEN}' no se encontró en: {file_path}")
+            return pd.DataFrame()
+        except Exception as e:
+            print(f"❌ ERROR al cargar el archivo de origen: {e}")
+            return pd.DataFrame()
 
     # Columna requerida del script M
     columna_requerida = "planta"
@@ -45,9 +54,9 @@ def transformar_plantas_cte_e_indice(file_path: str) -> pd.DataFrame:
     df_temp.drop_duplicates(inplace=True)
 
     # 3. #"Índice agregado" = Table.AddIndexColumn(#"Duplicados quitados1", "Key_PlantasCte", 1, 1, Int64.Type)
-    # Se añade un índice comenzando en 1 con paso de 1, y se nombra "Key_PlantasCte".
-    df_temp.reset_index(drop=True, inplace=True)
-    df_temp['Key_PlantasCte'] = df_temp.index + 1
+    # Claves del registro de la dimensión (comienzan en 1): una planta nueva recibe la
+    # siguiente clave sin recorrer las existentes.
+    df_temp = ETL_RegistroClaves.asignar_claves(df_temp, 'DimPlantaClientes', ['planta'], 'Key_PlantasCte')
     
     # Reordenar las columnas para que la clave quede al inicio
     df_final = df_temp.loc[:, ["Key_PlantasCte", "planta"]]
@@ -68,9 +77,13 @@ if __name__ == '__main__':
         print(f"Filas resultantes: {len(df_resultado)}")
         print(df_resultado.head().to_markdown(index=False))
         
+        # Almacén intermedio (Parquet/Arrow): es lo que lee fctAtencionClientes
+        df_resultado = ETL_Almacen.guardar_tabla('DimPlantaClientes', df_resultado)
+
         # 🚀 EXPORTACIÓN A EXCEL EN CARPETA DE DESCARGAS
         try:
             df_resultado.to_excel(OUTPUT_PATH, index=False, engine='openpyxl')
+            ETL_Almacen.registrar_exportacion('DimPlantaClientes', OUTPUT_PATH)
             print(f"\n✅ **¡Éxito!** El catálogo de plantas de cliente se ha guardado en:")
             print(f"   {OUTPUT_PATH}")
         except Exception as e:
@@ -0,0 +1,203 @@
+import json
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+import ETL_Esquemas
+import ETL_Excel
+import ETL_Metricas
+
+# pyarrow es opcional: sin él, el almacén usa pickle (rápido y conserva los tipos de pandas)
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_DISPONIBLE = True
+except ImportError:
+    PYARROW_DISPONIBLE = False
+
+# ==============================================================================
+#                      CONFIGURACIÓN DEL ALMACÉN INTERMEDIO
+# ==============================================================================
+# Las etapas se pasan las tablas a través de este almacén columnar en lugar de
+# escribir y releer Excel con openpyxl. El Excel queda como salida opcional.
+
+RUTA_ALMACEN = os.environ.get('ETL_RUTA_ALMACEN', str(Path.home() / 'Downloads' / 'ETL_Almacen'))
+
+# 'parquet' (por defecto), 'arrow' (Arrow IPC / Feather) o 'pickle'
+FORMATO_ALMACEN = os.environ.get('ETL_FORMATO_ALMACEN', 'parquet').lower()
+
+# Exportar también a Excel/CSV las tablas intermedias (TR_Real, TR_Datos, catálogos...).
+# Las tablas finales del modelo (Dim*, fct*) siempre se exportan a Excel.
+EXPORTAR_INTERMEDIOS: bool = os.environ.get('ETL_EXPORTAR_INTERMEDIOS', '0') == '1'
+
+EXTENSIONES = {'parquet': '.parquet', 'arrow': '.arrow', 'pickle': '.pkl'}
+
+
+def formato_efectivo() -> str:
+    """Formato que realmente se usa (Parquet/Arrow requieren pyarrow)."""
+    if FORMATO_ALMACEN not in EXTENSIONES:
+        raise ValueError(f"Formato de almacén no reconocido: '{FORMATO_ALMACEN}'. Opciones: {list(EXTENSIONES)}")
+    if FORMATO_ALMACEN in ('parquet', 'arrow') and not PYARROW_DISPONIBLE:
+        return 'pickle'
+    return FORMATO_ALMACEN
+
+
+def extension() -> str:
+    """Extensión de los archivos del almacén según el formato efectivo."""
+    return EXTENSIONES[formato_efectivo()]
+
+
+def ruta_tabla(nombre: str) -> str:
+    """Ruta de la tabla en el almacén (ej. Downloads/ETL_Almacen/TR_Datos.parquet)."""
+    return os.path.join(RUTA_ALMACEN, nombre + extension())
+
+
+# ==============================================================================
+#                      LECTURA Y ESCRITURA
+# ==============================================================================
+
+def _escribir(df: pd.DataFrame, ruta: str, formato: str) -> None:
+    if formato == 'parquet':
+        df.to_parquet(ruta, index=False)
+    elif formato == 'arrow':
+        df.reset_index(drop=True).to_feather(ruta)
+    else:
+        df.to_pickle(ruta)
+
+
+def escribir_archivo(df: pd.DataFrame, ruta: str) -> pd.DataFrame:
+    """
+    Escribe un DataFrame en el formato del almacén (ruta con la extensión de extension()).
+    Devuelve el DataFrame tal como quedó escrito.
+    """
+    formato = formato_efectivo()
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+    # Se escribe a un temporal y se reemplaza: un lector nunca ve un archivo a medias
+    ruta_temporal = ruta + '.tmp'
+    try:
+        _escribir(df, ruta_temporal, formato)
+    except Exception:
+        if formato == 'pickle':
+            raise
+        # Columnas con tipos mezclados (frecuente en catálogos de Google Sheets)
+        print(f"⚠️ Advertencia: '{os.path.basename(ruta)}' tiene columnas con tipos mezclados; se guardan como texto.")
+        df = ETL_Esquemas.textos_homogeneos(df)
+        _escribir(df, ruta_temporal, formato)
+    os.replace(ruta_temporal, ruta)
+    ETL_Metricas.sumar_bytes_archivo(ruta, leido=False)
+
+    return df
+
+
+def guardar_tabla(nombre: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica el esquema tipado de la tabla y la guarda en el almacén.
+    Devuelve el DataFrame ya tipado (el mismo que leerá la siguiente etapa).
+    """
+    df = ETL_Esquemas.aplicar_esquema(df, nombre)
+    return escribir_archivo(df, ruta_tabla(nombre))
+
+
+def _presentes(df: pd.DataFrame, columnas: Optional[List[str]]) -> pd.DataFrame:
+    """Solo las 'columnas' que existen en el DataFrame (todas si columnas=None)."""
+    if columnas is None:
+        return df
+    return df[[col for col in columnas if col in df.columns]]
+
+
+def leer_archivo(ruta: str, columnas: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Lee una tabla según la extensión del archivo (almacén, CSV o Excel).
+    Con 'columnas' solo se leen esas columnas; las que no existen en el archivo se omiten
+    (ej. nombres alternativos como 'SEGMENTO' / 'Division').
+    """
+    ETL_Metricas.sumar_bytes_archivo(ruta)
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in ('.parquet', '.arrow'):
+        lector = pd.read_parquet if extension == '.parquet' else pd.read_feather
+        try:
+            return lector(ruta, columns=columnas)
+        except (KeyError, ValueError):
+            # Alguna columna pedida no existe en el archivo: se lee completo y se proyecta
+            return _presentes(lector(ruta), columnas)
+    if extension == '.pkl':
+        return _presentes(pd.read_pickle(ruta), columnas)
+
+    usecols = (lambda col: col in columnas) if columnas is not None else None
+    if extension == '.csv':
+        return pd.read_csv(ruta, encoding='utf-8-sig', low_memory=False, usecols=usecols)
+    return ETL_Excel.leer_excel(ruta, usecols=usecols)
+
+
+# ==============================================================================
+#                      EXPORTACIONES Y ARCHIVOS DE RESPALDO
+# ==============================================================================
+# El Excel/CSV que exporta el flujo siempre se escribe después de la tabla del
+# almacén, así que la fecha sola no distingue una exportación del flujo de un
+# archivo editado a mano: cada exportación se registra junto a la tabla
+# (<nombre>.exportacion.json, con la fecha de modificación y el tamaño del
+# archivo) y solo un respaldo que no coincide con ese registro cuenta como externo.
+
+def _ruta_exportacion(nombre: str) -> str:
+    return os.path.join(RUTA_ALMACEN, nombre + '.exportacion.json')
+
+
+def _firma(ruta: str) -> List[int]:
+    estado = os.stat(ruta)
+    return [estado.st_mtime_ns, estado.st_size]
+
+
+def registrar_exportacion(nombre: str, ruta_exportada: str) -> None:
+    """Registra que el Excel/CSV 'ruta_exportada' lo escribió el flujo a partir de la tabla."""
+    try:
+        os.makedirs(RUTA_ALMACEN, exist_ok=True)
+        with open(_ruta_exportacion(nombre), 'w', encoding='utf-8') as f:
+            json.dump({'ruta': os.path.abspath(ruta_exportada), 'firma': _firma(ruta_exportada)}, f)
+    except OSError as e:
+        print(f"⚠️ Advertencia: No se pudo registrar la exportación de '{nombre}': {e}")
+
+
+def es_exportacion(nombre: str, ruta: str) -> bool:
+    """True si el archivo es, sin cambios, la última exportación de la tabla hecha por el flujo."""
+    try:
+        with open(_ruta_exportacion(nombre), 'r', encoding='utf-8') as f:
+            registro = json.load(f)
+        return registro['ruta'] == os.path.abspath(ruta) and registro['firma'] == _firma(ruta)
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def ruta_vigente(nombre: str, ruta_respaldo: Optional[str] = None) -> Optional[str]:
+    """
+    Archivo del que se debe leer la tabla: el del almacén siempre que exista. El
+    respaldo (Excel/CSV) solo se usa si la tabla no está en el almacén o si se
+    escribió fuera del flujo (a mano o con una versión anterior del script) después
+    de guardarla; las exportaciones registradas del propio flujo no cuentan.
+    """
+    ruta = ruta_tabla(nombre)
+    existe_respaldo = bool(ruta_respaldo) and os.path.exists(ruta_respaldo)
+
+    if not os.path.exists(ruta):
+        return ruta_respaldo if existe_respaldo else None
+    if (existe_respaldo and os.path.getmtime(ruta_respaldo) > os.path.getmtime(ruta)
+            and not es_exportacion(nombre, ruta_respaldo)):
+        return ruta_respaldo
+    return ruta
+
+
+def leer_tabla(nombre: str, ruta_respaldo: Optional[str] = None, columnas: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Lee una tabla del almacén (o de su archivo de respaldo) con los tipos de su esquema.
+    Lanza FileNotFoundError si no existe en ninguno de los dos.
+    """
+    ruta = ruta_vigente(nombre, ruta_respaldo)
+    if ruta is None:
+        raise FileNotFoundError(f"La tabla '{nombre}' no está en el almacén ({RUTA_ALMACEN}) ni en {ruta_respaldo}")
+
+    df = leer_archivo(ruta, columnas)
+    if ruta != ruta_tabla(nombre):
+        # Desde Excel/CSV los tipos no están garantizados
+        df = ETL_Esquemas.aplicar_esquema(df, nombre)
+    return df
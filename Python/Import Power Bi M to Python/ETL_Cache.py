@@ -0,0 +1,212 @@
+import ast
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+# ==============================================================================
+#                      CONFIGURACIÓN DE LA CACHÉ DE ETAPAS
+# ==============================================================================
+# Manifiesto con la firma (código + entradas + parámetros) y el hash de la salida
+# de cada etapa. Si en la siguiente corrida la firma es la misma y el archivo de
+# salida sigue intacto en el almacén intermedio, la etapa no se vuelve a ejecutar.
+
+# Carpeta de los scripts: un cambio en el script de la etapa o en un módulo de esta
+# carpeta que importe (directa o indirectamente) invalida la caché de esa etapa
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_DIR = str(Path.home() / 'Downloads' / '.etl_cache')
+RUTA_MANIFIESTO = os.path.join(CACHE_DIR, 'manifiesto.json')
+
+TAMANO_BLOQUE = 1024 * 1024  # Lectura de archivos por bloques de 1 MB
+
+
+# ==============================================================================
+#                      FUNCIONES DE HASH
+# ==============================================================================
+
+def hash_texto(*partes: str) -> str:
+    """SHA-256 de varias cadenas concatenadas (con separador)."""
+    h = hashlib.sha256()
+    for parte in partes:
+        h.update(str(parte).encode('utf-8'))
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+def hash_archivo(ruta: str) -> Optional[str]:
+    """SHA-256 del contenido de un archivo. None si el archivo no existe."""
+    if not ruta or not os.path.exists(ruta):
+        return None
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_BLOQUE), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    """
+    Hash del contenido de un DataFrame (valores, índice, columnas y tipos),
+    calculado en forma vectorizada con pd.util.hash_pandas_object.
+    """
+    h = hashlib.sha256()
+    h.update('|'.join(map(str, df.columns)).encode('utf-8'))
+    h.update('|'.join(map(str, df.dtypes)).encode('utf-8'))
+    try:
+        valores = pd.util.hash_pandas_object(df, index=True).values
+    except TypeError:
+        # Celdas no hasheables (listas, diccionarios): se hashea su representación en texto
+        valores = pd.util.hash_pandas_object(df.astype(str), index=True).values
+    h.update(valores.tobytes())
+    return h.hexdigest()
+
+
+def _importaciones(ruta: str) -> List[str]:
+    """Módulos que importa un script (import X / from X import ...), incluso dentro de funciones."""
+    try:
+        with open(ruta, 'rb') as f:
+            arbol = ast.parse(f.read(), filename=ruta)
+    except (OSError, SyntaxError, ValueError):
+        return []
+    modulos = []
+    for nodo in ast.walk(arbol):
+        if isinstance(nodo, ast.Import):
+            modulos += [alias.name.split('.')[0] for alias in nodo.names]
+        elif isinstance(nodo, ast.ImportFrom) and nodo.level == 0 and nodo.module:
+            modulos.append(nodo.module.split('.')[0])
+    return modulos
+
+
+def modulos_locales(script: str) -> List[str]:
+    """
+    Ruta del script de la etapa seguida de las de los módulos de la carpeta que importa,
+    directa o indirectamente (ej. Ext_data.py -> ETL_KPI.py -> ETL_HTTP.py).
+    """
+    ruta_script = os.path.join(BASE_PATH, os.path.basename(script))
+    vistos = {ruta_script}
+    pendientes = [ruta_script]
+    while pendientes:
+        for modulo in _importaciones(pendientes.pop()):
+            ruta = os.path.join(BASE_PATH, modulo + '.py')
+            if ruta not in vistos and os.path.exists(ruta):
+                vistos.add(ruta)
+                pendientes.append(ruta)
+    return [ruta_script] + sorted(vistos - {ruta_script})
+
+
+def hash_codigo(script: str) -> str:
+    """Hash del script de la etapa más los módulos de la carpeta que importa."""
+    return hash_texto(*[f"{os.path.basename(a)}={hash_archivo(a)}" for a in modulos_locales(script)])
+
+
+def firma_etapa(
+    script: str,
+    hashes_entradas: Dict[str, Optional[str]],
+    archivos_fuente: Optional[List[str]] = None,
+    parametros: Optional[Dict[str, Any]] = None
+) -> str:
+    """Firma de una etapa: si no cambia, su salida tampoco debería cambiar."""
+    partes = [f"codigo={hash_codigo(script)}"]
+    partes += [f"entrada:{nombre}={hashes_entradas[nombre]}" for nombre in sorted(hashes_entradas)]
+    partes += [f"fuente:{os.path.basename(ruta)}={hash_archivo(ruta)}" for ruta in (archivos_fuente or [])]
+    partes += [f"parametros={json.dumps(parametros or {}, sort_keys=True, default=str)}"]
+    return hash_texto(*partes)
+
+
+# ==============================================================================
+#                      MANIFIESTO
+# ==============================================================================
+
+class ManifiestoCache:
+    """Manifiesto JSON de la caché: clave de etapa -> firma y hashes de su salida."""
+
+    def __init__(self, ruta: str = RUTA_MANIFIESTO):
+        self.ruta = ruta
+        self.entradas: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                self.entradas = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Advertencia: Manifiesto de caché ilegible ({e}). Se reconstruirán todas las etapas.")
+
+    def vigente(self, clave: str, firma: str, ruta_salida: Optional[str]) -> bool:
+        """True si la firma coincide y el archivo de salida es el mismo que se registró."""
+        registro = self.entradas.get(clave)
+        if not registro or registro.get('firma') != firma:
+            return False
+        hash_actual = hash_archivo(ruta_salida)
+        return hash_actual is not None and hash_actual == registro.get('hash_archivo_salida')
+
+    def hash_salida(self, clave: str) -> Optional[str]:
+        """Hash del contenido producido por la etapa en la corrida registrada."""
+        return self.entradas.get(clave, {}).get('hash_salida')
+
+    def registrar(self, clave: str, firma: str, hash_salida: Optional[str], ruta_salida: Optional[str]) -> None:
+        self.entradas[clave] = {
+            'firma': firma,
+            'hash_salida': hash_salida,
+            'hash_archivo_salida': hash_archivo(ruta_salida),
+            'ruta_salida': ruta_salida,
+            'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self.guardar()
+
+    def invalidar(self, clave: str) -> None:
+        if self.entradas.pop(clave, None) is not None:
+            self.guardar()
+
+    def guardar(self) -> None:
+        """Escritura atómica (archivo temporal + reemplazo) para no dejar un JSON a medias."""
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            ruta_temporal = self.ruta + '.tmp'
+            with open(ruta_temporal, 'w', encoding='utf-8') as f:
+                json.dump(self.entradas, f, indent=2, ensure_ascii=False)
+            os.replace(ruta_temporal, self.ruta)
+        except OSError as e:
+            print(f"⚠️ Advertencia: No se pudo guardar el manifiesto de caché en {self.ruta}: {e}")
+
+
+# ==============================================================================
+#                      MODO SUBPROCESO (un script por intérprete)
+# ==============================================================================
+
+def ejecutar_script_con_cache(
+    script_path: str,
+    ejecutar: Callable[[], bool],
+    log: Callable[[str], None],
+    manifiesto: ManifiestoCache,
+    rutas_entradas: List[str],
+    ruta_salida: Optional[str],
+    archivos_fuente: Optional[List[str]] = None,
+    cacheable: bool = True
+) -> bool:
+    """
+    Ejecuta un script solo si cambió su código o alguno de sus archivos de entrada.
+    En este modo las entradas son los archivos que dejaron los scripts anteriores.
+    """
+    script_name = os.path.basename(script_path)
+    if not cacheable or not ruta_salida:
+        return ejecutar()
+
+    clave = f"SUBPROCESO|{script_name}"
+    hashes_entradas = {os.path.basename(ruta): hash_archivo(ruta) for ruta in rutas_entradas}
+    firma = firma_etapa(script_name, hashes_entradas, archivos_fuente)
+
+    if manifiesto.vigente(clave, firma, ruta_salida):
+        log(f" EN CACHÉ: {script_name} sin cambios en código ni entradas; se reutiliza {ruta_salida}.")
+        return True
+
+    exito = ejecutar()
+    if exito:
+        manifiesto.registrar(clave, firma, hash_archivo(ruta_salida), ruta_salida)
+    else:
+        manifiesto.invalidar(clave)
+    return exito
@@ -0,0 +1,205 @@
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import ETL_Almacen
+import ETL_Cache
+
+# holidays solo se necesita para generar los festivos oficiales la primera vez
+# que se pide un rango de años; después el calendario se lee del disco.
+try:
+    import holidays
+    HOLIDAYS_DISPONIBLE = True
+except ImportError:
+    HOLIDAYS_DISPONIBLE = False
+
+# ==============================================================================
+#                      DIMENSIÓN CALENDARIO
+# ==============================================================================
+# Un arreglo por atributo (domingo, festivo, nombre del festivo) indexado por el
+# ordinal del día (días desde 1970-01-01). Saber si una fecha es inhábil es una
+# sola lectura del arreglo en la posición de su ordinal, sin merge con la tabla
+# de festivos ni aritmética de día de la semana por fila.
+
+CACHE_CALENDARIO_DIR = os.path.join(ETL_Cache.CACHE_DIR, 'calendario')
+
+# Cambiar si cambian las reglas del calendario (invalida los calendarios en disco)
+VERSION_CALENDARIO = 1
+
+# Diccionario de traducción robusto
+TRADUCCION_FESTIVOS_MX: Dict[str, str] = {
+    "NEW YEAR'S DAY": "Año Nuevo",
+    "CONSTITUTION DAY": "Día de la Constitución",
+    "BENITO JUÁREZ'S BIRTHDAY": "Natalicio de Benito Juárez",
+    "BENITO JUAREZ'S BIRTHDAY": "Natalicio de Benito Juárez",
+    "LABOR DAY": "Día del Trabajo",
+    "LABOUR DAY": "Día del Trabajo",
+    "INDEPENDENCE DAY": "Día de la Independencia",
+    "REVOLUTION DAY": "Día de la Revolución",
+    "CHANGE OF FEDERAL EXECUTIVE POWER": "Transmisión del Poder Ejecutivo Federal",
+    "CHRISTMAS DAY": "Navidad",
+    "MOTHER'S DAY": "Día de la Madre",
+    "ALL SOULS' DAY": "Día de Muertos",
+    "DAY OF THE DEAD": "Día de Muertos",
+    "OUR LADY OF GUADALUPE DAY": "Día de la Virgen de Guadalupe",
+    "MAUNDY THURSDAY": "Jueves Santo",
+    "GOOD FRIDAY": "Viernes Santo",
+}
+
+# 1970-01-01 (ordinal 0) fue jueves: día de la semana (lunes = 0) = (ordinal + 3) % 7
+_DESFASE_DIA_SEMANA = 3
+_DOMINGO = 6
+
+
+def ordinales(fechas) -> np.ndarray:
+    """Ordinal (días desde 1970-01-01) de cada fecha; las fechas nulas quedan como NaT."""
+    return pd.to_datetime(pd.Series(fechas), errors='coerce').to_numpy(dtype='datetime64[D]')
+
+
+class Calendario:
+    """Días de [inicio, fin] con sus atributos en arreglos indexados por ordinal."""
+
+    def __init__(self, inicio: pd.Timestamp, fin: pd.Timestamp, festivos: Optional[pd.DataFrame] = None):
+        """'festivos': tabla con 'Fecha' y (opcional) 'Festivo' con el nombre del día festivo."""
+        self.inicio = pd.Timestamp(inicio).normalize()
+        self.fin = pd.Timestamp(fin).normalize()
+        self.ordinal_inicio = int(np.datetime64(self.inicio.date(), 'D').astype(np.int64))
+        dias = (self.fin - self.inicio).days + 1
+
+        ordinal = self.ordinal_inicio + np.arange(dias, dtype=np.int64)
+        self.es_domingo = (ordinal + _DESFASE_DIA_SEMANA) % 7 == _DOMINGO
+        self.es_festivo = np.zeros(dias, dtype=bool)
+        self.nombre_festivo = np.full(dias, None, dtype=object)
+
+        if festivos is not None and not festivos.empty:
+            posiciones = ordinales(festivos['Fecha']).astype(np.int64) - self.ordinal_inicio
+            en_rango = (posiciones >= 0) & (posiciones < dias) & ~pd.isna(festivos['Fecha']).to_numpy()
+            self.es_festivo[posiciones[en_rango]] = True
+            if 'Festivo' in festivos.columns:
+                self.nombre_festivo[posiciones[en_rango]] = festivos['Festivo'].to_numpy(dtype=object)[en_rango]
+
+        self.es_no_laborable_dia = self.es_domingo | self.es_festivo
+
+    @classmethod
+    def para_fechas(cls, fechas: pd.Series, festivos: Optional[pd.DataFrame] = None) -> 'Calendario':
+        """Calendario que cubre el rango de 'fechas' con los festivos indicados."""
+        validas = pd.to_datetime(fechas, errors='coerce').dropna()
+        if validas.empty:
+            hoy = pd.Timestamp.today()
+            return cls(hoy, hoy, festivos)
+        return cls(validas.min(), validas.max(), festivos)
+
+    @classmethod
+    def desde_tabla(cls, df: pd.DataFrame) -> 'Calendario':
+        """Reconstruye el calendario a partir de su tabla (ver tabla())."""
+        festivos = df.loc[df['Es_Festivo'].astype(bool), ['Fecha', 'Festivo']]
+        return cls(df['Fecha'].min(), df['Fecha'].max(), festivos)
+
+    def tabla(self) -> pd.DataFrame:
+        """Un renglón por día: Fecha, Ordinal, Es_Domingo, Es_Festivo, Festivo."""
+        ordinal = self.ordinal_inicio + np.arange(len(self.es_domingo), dtype=np.int64)
+        return pd.DataFrame({
+            'Fecha': pd.to_datetime(ordinal.astype('datetime64[D]')),
+            'Ordinal': ordinal.astype(np.int32),
+            'Es_Domingo': self.es_domingo,
+            'Es_Festivo': self.es_festivo,
+            'Festivo': self.nombre_festivo,
+        })
+
+    def festivos(self) -> pd.DataFrame:
+        """Tabla de días festivos (Fecha, Festivo), ordenada por fecha."""
+        df = self.tabla()
+        return df.loc[df['Es_Festivo'], ['Fecha', 'Festivo']].reset_index(drop=True)
+
+    def _leer(self, arreglo: np.ndarray, fechas, fuera_de_rango) -> np.ndarray:
+        """Lectura vectorizada de 'arreglo' en el ordinal de cada fecha."""
+        dias = ordinales(fechas)
+        validas = ~np.isnat(dias)
+        posiciones = dias.astype(np.int64) - self.ordinal_inicio
+        en_rango = validas & (posiciones >= 0) & (posiciones < len(arreglo))
+
+        resultado = np.zeros(len(dias), dtype=arreglo.dtype) if arreglo.dtype == bool else np.full(len(dias), None, dtype=object)
+        resultado[en_rango] = arreglo[posiciones[en_rango]]
+        fuera = validas & ~en_rango
+        if fuera.any() and fuera_de_rango is not None:
+            resultado[fuera] = fuera_de_rango(posiciones[fuera] + self.ordinal_inicio)
+        return resultado
+
+    def es_domingo_fechas(self, fechas) -> np.ndarray:
+        return self._leer(self.es_domingo, fechas, _es_domingo_ordinal)
+
+    def es_festivo_fechas(self, fechas) -> np.ndarray:
+        """Fuera del rango del calendario no se conocen festivos (False)."""
+        return self._leer(self.es_festivo, fechas, None)
+
+    def nombre_festivo_fechas(self, fechas) -> np.ndarray:
+        return self._leer(self.nombre_festivo, fechas, None)
+
+    def es_no_laborable(self, fechas) -> np.ndarray:
+        """True si la fecha es domingo o festivo. Las fechas nulas son False."""
+        return self._leer(self.es_no_laborable_dia, fechas, _es_domingo_ordinal)
+
+
+def _es_domingo_ordinal(ordinal: np.ndarray) -> np.ndarray:
+    return (ordinal + _DESFASE_DIA_SEMANA) % 7 == _DOMINGO
+
+
+# ==============================================================================
+#                      FESTIVOS OFICIALES DE MÉXICO (EN DISCO)
+# ==============================================================================
+
+def festivos_mexico(año_inicio: int, año_fin: int) -> pd.DataFrame:
+    """Festivos oficiales de México (holidays.MX) con los nombres traducidos al español."""
+    if not HOLIDAYS_DISPONIBLE:
+        raise ImportError("Se necesita 'holidays' para generar el calendario (pip install holidays).")
+
+    mex_holidays = holidays.MX(years=range(año_inicio, año_fin + 1))
+    df_festivos = pd.DataFrame(
+        [{'Fecha': fecha, 'Festivo': nombre} for fecha, nombre in mex_holidays.items()],
+        columns=['Fecha', 'Festivo']
+    )
+    traducido = df_festivos['Festivo'].astype(str).str.strip().str.upper().map(TRADUCCION_FESTIVOS_MX)
+    df_festivos['Festivo'] = traducido.fillna(df_festivos['Festivo']).astype(str).str.strip()
+    df_festivos['Fecha'] = pd.to_datetime(df_festivos['Fecha'])
+    return df_festivos.sort_values(by='Fecha').reset_index(drop=True)
+
+
+def _ruta_calendario(año_inicio: int, año_fin: int) -> str:
+    nombre = f"calendario_v{VERSION_CALENDARIO}_{año_inicio}_{año_fin}{ETL_Almacen.extension()}"
+    return os.path.join(CACHE_CALENDARIO_DIR, nombre)
+
+
+# Calendarios ya cargados en este proceso: (año_inicio, año_fin) -> Calendario
+_CALENDARIOS: Dict[Tuple[int, int], Calendario] = {}
+
+
+def obtener_calendario(año_inicio: int, año_fin: int) -> Calendario:
+    """
+    Calendario de México para el rango de años. Se genera con holidays.MX una sola
+    vez por rango y se guarda en disco; las corridas siguientes solo lo leen.
+    """
+    clave = (año_inicio, año_fin)
+    if clave in _CALENDARIOS:
+        return _CALENDARIOS[clave]
+
+    ruta = _ruta_calendario(año_inicio, año_fin)
+    calendario = None
+    if os.path.exists(ruta):
+        try:
+            calendario = Calendario.desde_tabla(ETL_Almacen.leer_archivo(ruta))
+            print(f"   ↺ Calendario {año_inicio}-{año_fin} leído del disco.")
+        except Exception as e:
+            print(f"⚠️ Advertencia: Calendario en disco ilegible ({e}). Se regenerará.")
+
+    if calendario is None:
+        calendario = Calendario(
+            pd.Timestamp(año_inicio, 1, 1), pd.Timestamp(año_fin, 12, 31), festivos_mexico(año_inicio, año_fin)
+        )
+        os.makedirs(CACHE_CALENDARIO_DIR, exist_ok=True)
+        ETL_Almacen.escribir_archivo(calendario.tabla(), ruta)
+        print(f"✔️ Calendario {año_inicio}-{año_fin} generado y guardado en: {ruta}")
+
+    _CALENDARIOS[clave] = calendario
+    return calendario
@@ -0,0 +1,210 @@
+import os
+import pickle
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import ETL_Cache
+import ETL_Joins
+import ETL_Metricas
+import ETL_Normalizacion
+
+# ==============================================================================
+#                      CATÁLOGO ConceptosReporte COMPILADO
+# ==============================================================================
+# El catálogo de conceptos se escribe a mano en ConceptosReporte.py (cadena TSV).
+# En lugar de parsear el texto en cada corrida y volver a normalizar sus claves
+# en cada script que lo une (TR_Real, api_python), se compila una vez a un
+# snapshot binario (pickle) con la tabla y con los índices
+# (CONCEPTO REPORTE, SECCION) -> filas ya construidos para cada normalización
+# de claves. El snapshot se identifica por la fecha de modificación y el tamaño
+# de los archivos de los que depende: si cambia el catálogo o la forma de
+# normalizar, se vuelve a compilar.
+
+CACHE_CATALOGOS_DIR = os.path.join(ETL_Cache.CACHE_DIR, 'catalogos')
+RUTA_SNAPSHOT = os.path.join(CACHE_CATALOGOS_DIR, 'ConceptosReporte.pkl')
+
+# Cambiar si cambia la estructura del snapshot (invalida los compilados en disco)
+VERSION_CATALOGO = 1
+
+# Archivos de los que depende el snapshot (fuente del catálogo y normalizaciones)
+ARCHIVOS_FUENTE = ['ConceptosReporte.py', 'ETL_Joins.py', 'ETL_Normalizacion.py']
+
+COLUMNAS_CLAVE = ['CONCEPTO REPORTE', 'SECCION']
+
+# Normalizaciones de claves con índice propio en el snapshot:
+# - 'texto': mayúsculas y sin espacios extremos (TR_Real)
+# - 'claves': además sin acentos, símbolos, espacios ni '360' (api_python)
+NORMALIZACIONES: Dict[str, Callable[[pd.Series], pd.Series]] = {
+    'texto': ETL_Joins.normalizar_texto,
+    'claves': ETL_Normalizacion.normalizar_claves,
+}
+
+Firma = Tuple[Tuple[str, float, int], ...]
+
+
+def _valores_clave(valores) -> np.ndarray:
+    """Valores de una columna de la clave con los nulos como None (pd.merge une nulo con nulo)."""
+    valores = np.asarray(valores, dtype=object)
+    return np.where(pd.isna(valores), None, valores)
+
+
+@dataclass
+class IndiceCatalogo:
+    """
+    Clave normalizada (CONCEPTO REPORTE, SECCION) -> filas del catálogo. Las filas de
+    cada clave están contiguas en 'filas', desde inicios[grupo] con conteos[grupo] filas.
+    """
+    grupos: Dict[Tuple[str, str], int]
+    filas: np.ndarray
+    inicios: np.ndarray
+    conteos: np.ndarray
+
+    @classmethod
+    def construir(cls, concepto_reporte: pd.Series, seccion: pd.Series) -> 'IndiceCatalogo':
+        claves = list(zip(_valores_clave(concepto_reporte), _valores_clave(seccion)))
+        codigos, unicas = pd.factorize(pd.Series(claves, dtype=object))
+        filas = np.argsort(codigos, kind='stable').astype(np.int64)  # En orden del catálogo dentro de cada clave
+        conteos = np.bincount(codigos, minlength=len(unicas)).astype(np.int64)
+        inicios = np.cumsum(conteos) - conteos
+        return cls({clave: i for i, clave in enumerate(unicas)}, filas, inicios, conteos)
+
+    def filas_de(self, clave: Tuple[str, str]) -> np.ndarray:
+        """Filas del catálogo con la clave (vacío si no existe)."""
+        grupo = self.grupos.get(clave)
+        if grupo is None:
+            return self.filas[:0]
+        return self.filas[self.inicios[grupo]:self.inicios[grupo] + self.conteos[grupo]]
+
+
+@dataclass
+class CatalogoConceptos:
+    """Tabla ConceptosReporte más sus índices por normalización de claves."""
+    tabla: pd.DataFrame
+    indices: Dict[str, IndiceCatalogo]
+
+    @ETL_Metricas.medido('union')
+    def unir(
+        self,
+        df: pd.DataFrame,
+        columnas_origen: List[str],
+        normalizacion: str = 'texto',
+        columnas: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Equivalente a pd.merge(df, catálogo, left_on=columnas_origen,
+        right_on=['CONCEPTO REPORTE', 'SECCION'], how='inner') con las claves de ambos
+        lados normalizadas con 'normalizacion'. Las claves de 'df' se buscan una vez por
+        valor distinto en el índice del snapshot. 'columnas' limita las columnas del
+        catálogo que se agregan (todas por defecto).
+        """
+        normalizar = NORMALIZACIONES[normalizacion]
+        indice = self.indices[normalizacion]
+
+        # Pares distintos (concepto reporte, sección) de la tabla de hechos
+        codigos_1, unicos_1 = pd.factorize(normalizar(df[columnas_origen[0]]), use_na_sentinel=False)
+        codigos_2, unicos_2 = pd.factorize(normalizar(df[columnas_origen[1]]), use_na_sentinel=False)
+        ancho = max(len(unicos_2), 1)
+        codigos, pares = pd.factorize(codigos_1.astype(np.int64) * ancho + codigos_2)
+        unicos_1, unicos_2 = _valores_clave(unicos_1), _valores_clave(unicos_2)
+        grupos = np.array(
+            [indice.grupos.get((unicos_1[par // ancho], unicos_2[par % ancho]), -1) for par in pares],
+            dtype=np.int64
+        )
+
+        # Cada fila se repite tantas veces como filas del catálogo tenga su clave (0 = sin coincidencia)
+        grupo_fila = grupos[codigos] if len(grupos) else np.zeros(0, dtype=np.int64)
+        conteo = np.where(grupo_fila >= 0, indice.conteos[grupo_fila], 0)
+        izquierda = np.repeat(np.arange(len(df)), conteo)
+        desplazamiento = np.arange(int(conteo.sum())) - np.repeat(np.cumsum(conteo) - conteo, conteo)
+        derecha = indice.filas[np.repeat(indice.inicios[grupo_fila], conteo) + desplazamiento]
+
+        tabla = self.tabla if columnas is None else self.tabla[columnas]
+        izquierda_df = df.iloc[izquierda].reset_index(drop=True)
+        derecha_df = tabla.iloc[derecha].reset_index(drop=True)
+
+        # Columnas repetidas: mismos sufijos que pd.merge
+        repetidas = set(izquierda_df.columns) & set(derecha_df.columns)
+        if repetidas:
+            izquierda_df = izquierda_df.rename(columns={col: f"{col}_x" for col in repetidas})
+            derecha_df = derecha_df.rename(columns={col: f"{col}_y" for col in repetidas})
+        return pd.concat([izquierda_df, derecha_df], axis=1)
+
+
+# Snapshot ya cargado en este proceso: (firma, catálogo)
+_CATALOGO: Optional[Tuple[Firma, CatalogoConceptos]] = None
+
+
+def firma_fuente() -> Firma:
+    """Fecha de modificación y tamaño de cada archivo del que depende el snapshot."""
+    firma = []
+    for nombre in ARCHIVOS_FUENTE:
+        estado = os.stat(os.path.join(ETL_Cache.BASE_PATH, nombre))
+        firma.append((nombre, estado.st_mtime, estado.st_size))
+    return tuple(firma)
+
+
+def compilar_catalogo() -> CatalogoConceptos:
+    """Parsea el catálogo de ConceptosReporte.py y construye sus índices. Lanza ValueError si queda vacío."""
+    import ConceptosReporte  # Importación diferida: ConceptosReporte también usa este módulo
+
+    tabla = ConceptosReporte.parsear_catalogo()
+    if tabla.empty:
+        raise ValueError("El catálogo ConceptosReporte quedó vacío; no se puede compilar.")
+    tabla = tabla.reset_index(drop=True)
+
+    indices = {
+        nombre: IndiceCatalogo.construir(normalizar(tabla[COLUMNAS_CLAVE[0]]), normalizar(tabla[COLUMNAS_CLAVE[1]]))
+        for nombre, normalizar in NORMALIZACIONES.items()
+    }
+    return CatalogoConceptos(tabla, indices)
+
+
+def _leer_snapshot(firma: Firma) -> Optional[CatalogoConceptos]:
+    try:
+        with open(RUTA_SNAPSHOT, 'rb') as f:
+            contenido = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Advertencia: Snapshot del catálogo ilegible ({e}). Se volverá a compilar.")
+        return None
+    if contenido.get('version') != VERSION_CATALOGO or tuple(contenido.get('firma', ())) != firma:
+        return None
+    return contenido['catalogo']
+
+
+def _guardar_snapshot(firma: Firma, catalogo: CatalogoConceptos) -> None:
+    """Escritura atómica (temporal + reemplazo): otro proceso nunca lee un archivo a medias."""
+    try:
+        os.makedirs(CACHE_CATALOGOS_DIR, exist_ok=True)
+        ruta_temporal = f"{RUTA_SNAPSHOT}.{os.getpid()}.tmp"
+        with open(ruta_temporal, 'wb') as f:
+            pickle.dump({'version': VERSION_CATALOGO, 'firma': firma, 'catalogo': catalogo}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(ruta_temporal, RUTA_SNAPSHOT)
+    except OSError as e:
+        print(f"⚠️ Advertencia: No se pudo guardar el snapshot del catálogo: {e}")
+
+
+def cargar_catalogo() -> CatalogoConceptos:
+    """
+    Catálogo ConceptosReporte compilado: de memoria, del snapshot en disco o, si la
+    fuente cambió, compilado de nuevo (y guardado). No modificar la tabla devuelta:
+    se comparte entre llamadas.
+    """
+    global _CATALOGO
+    firma = firma_fuente()
+    if _CATALOGO is not None and _CATALOGO[0] == firma:
+        return _CATALOGO[1]
+
+    catalogo = _leer_snapshot(firma)
+    if catalogo is None:
+        catalogo = compilar_catalogo()
+        _guardar_snapshot(firma, catalogo)
+        print(f"   📚 Catálogo ConceptosReporte compilado ({len(catalogo.tabla)} filas): {RUTA_SNAPSHOT}")
+
+    _CATALOGO = (firma, catalogo)
+    return catalogo
@@ -0,0 +1,701 @@
+import contextlib
+import importlib.util
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+import ETL_Almacen
+import ETL_Cache
+import ETL_CatalogoConceptos
+import ETL_Metricas
+import ETL_Perfil
+
+# ==============================================================================
+#                      CONFIGURACIÓN DEL DAG EN PROCESO
+# ==============================================================================
+# En lugar de lanzar un intérprete de Python por script (y releer el Excel que
+# dejó el paso anterior en Descargas), cada etapa importa la función de
+# transformación de su script y recibe sus entradas como DataFrames en memoria.
+# Cada salida se guarda además en el almacén intermedio (Parquet/Arrow), que es
+# de donde se leen las tablas que no se producen en la corrida.
+
+# Carpeta donde viven los scripts de las etapas (la misma que este archivo)
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# Carpeta de Descargas donde los scripts dejan sus salidas
+RUTA_DESCARGAS = str(Path.home() / 'Downloads')
+
+# Si es False, solo se exportan a Excel/CSV las tablas finales (dimensiones y hechos)
+EXPORTAR_INTERMEDIOS: bool = ETL_Almacen.EXPORTAR_INTERMEDIOS
+
+# Caché de módulos ya importados (un script se importa una sola vez por proceso)
+_MODULOS: Dict[str, Any] = {}
+
+
+# ==============================================================================
+#                      IMPORTACIÓN DE SCRIPTS
+# ==============================================================================
+
+def cargar_modulo(nombre_archivo: str):
+    """
+    Importa un script de la carpeta por su nombre de archivo.
+    Admite nombres con espacios (ej. 'Ext_Atencion a clientes.py'), que no se
+    pueden importar con la sentencia 'import'.
+    """
+    if nombre_archivo in _MODULOS:
+        return _MODULOS[nombre_archivo]
+
+    ruta = os.path.join(BASE_PATH, nombre_archivo)
+    nombre_modulo = re.sub(r'\W', '_', os.path.splitext(nombre_archivo)[0])
+
+    spec = importlib.util.spec_from_file_location(nombre_modulo, ruta)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"No se pudo importar el script '{nombre_archivo}' desde {ruta}")
+
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre_modulo] = modulo
+    spec.loader.exec_module(modulo)
+
+    _MODULOS[nombre_archivo] = modulo
+    return modulo
+
+
+# ==============================================================================
+#                      DEFINICIÓN DE ETAPAS
+# ==============================================================================
+
+@dataclass
+class Etapa:
+    """Una etapa del flujo: produce una tabla a partir de las tablas de 'entradas'."""
+    nombre: str                                   # Nombre de la tabla que produce
+    script: str                                   # Script de origen (para los segmentos)
+    funcion: Callable[..., pd.DataFrame]          # Recibe las entradas en el mismo orden
+    entradas: List[str] = field(default_factory=list)
+    ruta_salida: Optional[str] = None             # Exportación (sink) Excel/CSV en Descargas
+    final: bool = False                           # Tabla final del modelo (siempre se exporta)
+    opciones_excel: Dict[str, Any] = field(default_factory=dict)
+    red: bool = False                             # Lee de una API/Google Sheets: nunca se toma de caché
+    archivos_fuente: List[str] = field(default_factory=list)       # Archivos locales que lee la etapa
+    parametros: Optional[Callable[[], Dict[str, Any]]] = None      # Parámetros que cambian la salida
+    columnas: Optional[Callable[[], Dict[str, List[str]]]] = None  # Columnas que usa de cada entrada
+
+    @property
+    def cacheable(self) -> bool:
+        return not self.red
+
+    @property
+    def ruta_almacen(self) -> str:
+        """Archivo de la tabla en el almacén intermedio."""
+        return ETL_Almacen.ruta_tabla(self.nombre)
+
+    def columnas_de(self, entrada: str) -> Optional[List[str]]:
+        """Columnas que la etapa usa de 'entrada' (None = la tabla completa)."""
+        return self.columnas().get(entrada) if self.columnas else None
+
+
+# --- FASE 1: EXTRACCIÓN Y PREPARACIÓN (FINANCIERO) ---
+
+def etapa_ext_datos() -> pd.DataFrame:
+    return cargar_modulo('Ext_data.py').extraer_ext_datos()
+
+def etapa_conceptos_reporte() -> pd.DataFrame:
+    return cargar_modulo('ConceptosReporte.py').construir_conceptos_reporte()
+
+def etapa_concepto_inventario() -> pd.DataFrame:
+    return cargar_modulo('ConceptoInventario.py').transformar_hoja_datos()
+
+def etapa_conceptos_maquinas() -> pd.DataFrame:
+    return cargar_modulo('ConceptosMaquinas.py').extraer_y_transformar_maquinas_final()
+
+def etapa_conceptos_prod_flag() -> pd.DataFrame:
+    return cargar_modulo('ConceptosProdFlag.py').extraer_y_transformar_desempeno()
+
+def etapa_dias_festivos() -> pd.DataFrame:
+    m = cargar_modulo('DiasFestivos.py')
+    return m.generar_dias_festivos_mexico(m.AÑO_INICIO, m.AÑO_FIN)
+
+def parametros_dias_festivos() -> Dict[str, Any]:
+    m = cargar_modulo('DiasFestivos.py')
+    return {'año_inicio': m.AÑO_INICIO, 'año_fin': m.AÑO_FIN}
+
+def etapa_cat_dias_laborables_capacidad() -> pd.DataFrame:
+    m = cargar_modulo('Cat_DiasLaborablesCapacidad.py')
+    return m.generar_cat_dias_laborables_capacidad(os.path.join(BASE_PATH, m.FILE_NAME), m.SHEET_NAME)
+
+def etapa_cat_dias_laborables(df_capacidad: pd.DataFrame) -> pd.DataFrame:
+    m = cargar_modulo('Cat_DiasLaborables.py')
+    df_raw = m.load_excel_data(m.GOOGLE_SHEETS_FILE_PATH, m.SOURCE_SHEET_NAME)
+    df_combinado = m.aplicar_transformaciones_m(df_raw, df_capacidad)
+    return m.aplicar_unpivot_y_exportar(df_combinado)
+
+def etapa_ext_dias_laborados(df_cat_dias_laborables: pd.DataFrame) -> pd.DataFrame:
+    return cargar_modulo('Ext_DiasLaborados.py').transformar_api_a_reporte(df_cat_dias_laborables)
+
+def etapa_ext_atencion_clientes() -> pd.DataFrame:
+    return cargar_modulo('Ext_Atencion a clientes.py').transformar_servicio_cliente()
+
+def etapa_tr_real(df_ext_datos: pd.DataFrame, df_conceptos_reporte: pd.DataFrame) -> pd.DataFrame:
+    # ConceptosReporte sigue como entrada (un cambio en el catálogo invalida TR_Real en la
+    # caché), pero la unión usa el snapshot compilado, que ya trae el índice de sus claves
+    m = cargar_modulo('TR_Real.py')
+    return m.transformar_logica_m(m.preparar_origen(df_ext_datos), ETL_CatalogoConceptos.cargar_catalogo())
+
+def etapa_tr_datos(
+    df_tr_real: pd.DataFrame,
+    df_conceptos_maquinas: pd.DataFrame,
+    df_dias_festivos: pd.DataFrame,
+    df_conceptos_prod_flag: pd.DataFrame,
+    df_dias_laborados: pd.DataFrame
+) -> pd.DataFrame:
+    m = cargar_modulo('TR_Datos.py')
+    return m.aplicar_logica_m_completa(
+        m.preparar_origen(df_tr_real),
+        m.normalizar_catalogo(df_conceptos_maquinas, 'ConceptosMaquinas'),
+        m.normalizar_catalogo(df_dias_festivos, 'DiasFestivos'),
+        m.normalizar_catalogo(df_conceptos_prod_flag, 'ConceptosProdFlag'),
+        m.normalizar_catalogo(df_dias_laborados, 'Ext_DiasLaborados'),
+    )
+
+
+# --- FASE 2.1: MODELADO - DIMENSIONES ---
+
+def etapa_dim_concepto(df_tr_datos: pd.DataFrame) -> pd.DataFrame:
+    m = cargar_modulo('Dim_Concepto.py')
+    return m.transformar_conceptos_e_indice(m.RUTA_ORIGEN, df_tr_datos)
+
+def etapa_dim_planta(df_ext_datos: pd.DataFrame) -> pd.DataFrame:
+    m = cargar_modulo('Dim_Planta.py')
+    return m.transformar_plantas_e_indice(m.RUTA_ORIGEN, df_ext_datos)
+
+def etapa_dim_empleado(df_atencion: pd.DataFrame) -> pd.DataFrame:
+    m = cargar_modulo('Dim_Empleado.py')
+    return m.transformar_empleados_e_indice(m.RUTA_ORIGEN, df_atencion)
+
+def etapa_dim_planta_clientes(df_atencion: pd.DataFrame) -> pd.DataFrame:
+    m = cargar_modulo('Dim_Planta_clientes.py')
+    return m.transformar_plantas_cte_e_indice(m.RUTA_ORIGEN, df_atencion)
+
+def etapa_dim_cliente(df_atencion: pd.DataFrame) -> pd.DataFrame:
+    m = cargar_modulo('Dim_Cliente.py')
+    return m.transformar_clientes_e_indice(m.RUTA_ORIGEN, df_atencion)
+
+def columnas_origen(script: str, entrada: str) -> Dict[str, List[str]]:
+    """Las dimensiones solo reciben de su tabla de origen las columnas de COLUMNAS_ORIGEN."""
+    return {entrada: cargar_modulo(script).COLUMNAS_ORIGEN}
+
+
+# --- FASE 2.2: MODELADO - HECHOS ---
+
+def etapa_fct_finanzas_diario(
+    df_tr_datos: pd.DataFrame,
+    df_dim_concepto: pd.DataFrame,
+    df_dim_planta: pd.DataFrame
+) -> pd.DataFrame:
+    m = cargar_modulo('fctFinanzasDiario.py')
+    return m.transformar_e_integrar_datos(
+        m.RUTA_FACT, m.RUTA_DIM_CONCEPTO, m.RUTA_DIM_PLANTA,
+        df_fact=df_tr_datos, df_dim_concepto=df_dim_concepto, df_dim_planta=df_dim_planta
+    )
+
+def etapa_fct_atencion_clientes(
+    df_atencion: pd.DataFrame,
+    df_dim_cliente: pd.DataFrame,
+    df_dim_empleado: pd.DataFrame,
+    df_dim_planta_cte: pd.DataFrame
+) -> pd.DataFrame:
+    m = cargar_modulo('fctAtencionClientes.py')
+    return m.transformar_e_integrar_atencion_clientes(
+        df_fact=df_atencion, df_dim_cliente=df_dim_cliente,
+        df_dim_empleado=df_dim_empleado, df_dim_planta_cte=df_dim_planta_cte
+    )
+
+
+def _descargas(nombre_archivo: str) -> str:
+    return os.path.join(RUTA_DESCARGAS, nombre_archivo)
+
+
+# Libro de Excel local con la capacidad y los días laborables
+RUTA_DATOS_POWER_BI = os.path.join(BASE_PATH, 'Datos de power bi (1).xlsx')
+
+
+# Registro de etapas: nombre de tabla -> definición (entradas declaradas por nombre de tabla)
+ETAPAS: List[Etapa] = [
+    Etapa('Ext_Datos', 'Ext_data.py', etapa_ext_datos,
+          ruta_salida=_descargas('Ext_Datos.csv'), red=True),
+    Etapa('ConceptosReporte', 'ConceptosReporte.py', etapa_conceptos_reporte,
+          ruta_salida=_descargas('ConceptosReporte.xlsx')),
+    Etapa('ConceptosInventario', 'ConceptoInventario.py', etapa_concepto_inventario,
+          ruta_salida=_descargas('ConceptosInventario.xlsx'), final=True, red=True),
+    Etapa('ConceptosMaquinas', 'ConceptosMaquinas.py', etapa_conceptos_maquinas,
+          ruta_salida=_descargas('ConceptosMaquinas.xlsx'), red=True),
+    Etapa('ConceptosProdFlag', 'ConceptosProdFlag.py', etapa_conceptos_prod_flag,
+          ruta_salida=_descargas('ConceptosProdFlag.xlsx'), red=True),
+    Etapa('DiasFestivos', 'DiasFestivos.py', etapa_dias_festivos,
+          ruta_salida=_descargas('DiasFestivos.xlsx'), opciones_excel={'sheet_name': 'Festivos MX'},
+          parametros=parametros_dias_festivos),
+    Etapa('Cat_DiasLaborablesCapacidad', 'Cat_DiasLaborablesCapacidad.py', etapa_cat_dias_laborables_capacidad,
+          ruta_salida=_descargas('Cat_DiasLaborablesCapacidad.xlsx'), archivos_fuente=[RUTA_DATOS_POWER_BI]),
+    Etapa('Cat_DiasLaborables', 'Cat_DiasLaborables.py', etapa_cat_dias_laborables,
+          entradas=['Cat_DiasLaborablesCapacidad'],
+          ruta_salida=_descargas('Cat_DiasLaborables.xlsx'), archivos_fuente=[RUTA_DATOS_POWER_BI]),
+    Etapa('Ext_DiasLaborados', 'Ext_DiasLaborados.py', etapa_ext_dias_laborados,
+          entradas=['Cat_DiasLaborables'],
+          ruta_salida=_descargas('Ext_DiasLaborados.xlsx'), red=True),
+    Etapa('Ext_Atencion a clientes', 'Ext_Atencion a clientes.py', etapa_ext_atencion_clientes,
+          ruta_salida=_descargas('Ext_Atencion a clientes.xlsx'), red=True),
+    Etapa('TR_Real', 'TR_Real.py', etapa_tr_real,
+          entradas=['Ext_Datos', 'ConceptosReporte'],
+          ruta_salida=_descargas('TR_Real.xlsx')),
+    Etapa('TR_Datos', 'TR_Datos.py', etapa_tr_datos,
+          entradas=['TR_Real', 'ConceptosMaquinas', 'DiasFestivos', 'ConceptosProdFlag', 'Ext_DiasLaborados'],
+          ruta_salida=_descargas('TR_Datos.xlsx')),
+    Etapa('DimConcepto', 'Dim_Concepto.py', etapa_dim_concepto,
+          entradas=['TR_Datos'], columnas=partial(columnas_origen, 'Dim_Concepto.py', 'TR_Datos'),
+          ruta_salida=_descargas('DimConcepto.xlsx'), final=True),
+    Etapa('DimPlanta', 'Dim_Planta.py', etapa_dim_planta,
+          entradas=['Ext_Datos'], columnas=partial(columnas_origen, 'Dim_Planta.py', 'Ext_Datos'),
+          ruta_salida=_descargas('DimPlanta.xlsx'), final=True),
+    Etapa('DimEmpleado', 'Dim_Empleado.py', etapa_dim_empleado,
+          entradas=['Ext_Atencion a clientes'],
+          columnas=partial(columnas_origen, 'Dim_Empleado.py', 'Ext_Atencion a clientes'),
+          ruta_salida=_descargas('DimEmpleado.xlsx'), final=True),
+    Etapa('DimPlantaClientes', 'Dim_Planta_clientes.py', etapa_dim_planta_clientes,
+          entradas=['Ext_Atencion a clientes'],
+          columnas=partial(columnas_origen, 'Dim_Planta_clientes.py', 'Ext_Atencion a clientes'),
+          ruta_salida=_descargas('DimPlantaClientes.xlsx'), final=True),
+    Etapa('DimCliente', 'Dim_Cliente.py', etapa_dim_cliente,
+          entradas=['Ext_Atencion a clientes'],
+          columnas=partial(columnas_origen, 'Dim_Cliente.py', 'Ext_Atencion a clientes'),
+          ruta_salida=_descargas('DimCliente.xlsx'), final=True),
+    Etapa('fctFinanzasDiario', 'fctFinanzasDiario.py', etapa_fct_finanzas_diario,
+          entradas=['TR_Datos', 'DimConcepto', 'DimPlanta'],
+          ruta_salida=_descargas('fctFinanzasDiario.xlsx'), final=True),
+    Etapa('fctAtencionClientes', 'fctAtencionClientes.py', etapa_fct_atencion_clientes,
+          entradas=['Ext_Atencion a clientes', 'DimCliente', 'DimEmpleado', 'DimPlantaClientes'],
+          ruta_salida=_descargas('fctAtencionClientes.xlsx'), final=True,
+          opciones_excel={'sheet_name': 'fctAtencionClientes', 'datetime_format': 'yyyy-mm-dd'}),
+]
+
+ETAPAS_POR_NOMBRE: Dict[str, Etapa] = {etapa.nombre: etapa for etapa in ETAPAS}
+ETAPAS_POR_SCRIPT: Dict[str, Etapa] = {etapa.script: etapa for etapa in ETAPAS}
+
+
+def etapa_de_script(script_path: str) -> Optional[Etapa]:
+    """Etapa registrada para un script (ruta completa o nombre de archivo)."""
+    return ETAPAS_POR_SCRIPT.get(os.path.basename(script_path))
+
+
+def ruta_vigente(nombre: str) -> str:
+    """Archivo del que se lee hoy la tabla: el del almacén o, si se editó fuera del flujo, su Excel/CSV."""
+    etapa = ETAPAS_POR_NOMBRE[nombre]
+    return ETL_Almacen.ruta_vigente(nombre, etapa.ruta_salida) or etapa.ruta_almacen
+
+
+def rutas_entradas(etapa: Etapa) -> List[str]:
+    """Archivos de los que lee la etapa cuando se ejecuta como script independiente."""
+    return [ruta_vigente(e) for e in etapa.entradas if e in ETAPAS_POR_NOMBRE]
+
+
+def seleccionar_etapas(scripts: List[str]) -> List[Etapa]:
+    """Devuelve las etapas cuyos scripts están en la lista (rutas completas o nombres de archivo)."""
+    nombres_scripts = {os.path.basename(script) for script in scripts}
+    return [etapa for etapa in ETAPAS if etapa.script in nombres_scripts]
+
+
+def ordenar_etapas(etapas: List[Etapa]) -> List[Etapa]:
+    """
+    Orden topológico de las etapas (respeta el orden declarado entre etapas listas).
+    Las entradas que no produce ninguna etapa seleccionada se leen del almacén.
+    """
+    seleccionadas = {etapa.nombre for etapa in etapas}
+    pendientes = list(etapas)
+    resueltas: set = set()
+    orden: List[Etapa] = []
+
+    while pendientes:
+        listas = [
+            etapa for etapa in pendientes
+            if all(e in resueltas or e not in seleccionadas for e in etapa.entradas)
+        ]
+        if not listas:
+            ciclo = ', '.join(etapa.nombre for etapa in pendientes)
+            raise ValueError(f"Dependencias circulares entre las etapas: {ciclo}")
+        for etapa in listas:
+            orden.append(etapa)
+            resueltas.add(etapa.nombre)
+            pendientes.remove(etapa)
+
+    return orden
+
+
+# ==============================================================================
+#                      LECTURA Y EXPORTACIÓN DE SALIDAS
+# ==============================================================================
+
+def leer_salida(nombre: str, columnas: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Lee del almacén la salida de una etapa que no se ejecutó en esta corrida
+    (o de su Excel/CSV en Descargas, si se editó fuera del flujo; ver ETL_Almacen.ruta_vigente).
+    Con 'columnas' solo se leen esas columnas.
+    """
+    etapa = ETAPAS_POR_NOMBRE.get(nombre)
+    if etapa is None:
+        raise KeyError(f"No hay una etapa registrada que produzca la tabla '{nombre}'.")
+    return ETL_Almacen.leer_tabla(nombre, etapa.ruta_salida, columnas=columnas)
+
+
+def proyectar(df: pd.DataFrame, columnas: Optional[List[str]]) -> pd.DataFrame:
+    """Vista de la tabla con solo las columnas que usa la etapa (las que no existen se omiten)."""
+    if columnas is None:
+        return df
+    return df[[col for col in columnas if col in df.columns]]
+
+
+def columnas_consumidores(nombre: str, consumidores: List[Etapa]) -> Optional[List[str]]:
+    """
+    Unión de las columnas que usan de 'nombre' las etapas que la consumen. None si alguna
+    necesita la tabla completa. Así una sola lectura proyectada sirve a todas (ej. las
+    tres dimensiones que salen de 'Ext_Atencion a clientes').
+    """
+    columnas: Dict[str, None] = {}
+    for etapa in consumidores:
+        if nombre not in etapa.entradas:
+            continue
+        propias = etapa.columnas_de(nombre)
+        if propias is None:
+            return None
+        columnas.update(dict.fromkeys(propias))
+    return list(columnas)
+
+
+def exportar_salida(etapa: Etapa, df: pd.DataFrame) -> None:
+    """
+    Escribe la salida de la etapa en Descargas (CSV o Excel según la extensión) y la
+    registra como exportación del flujo: al leer la tabla no reemplaza a la del almacén.
+    """
+    os.makedirs(os.path.dirname(etapa.ruta_salida), exist_ok=True)
+
+    if etapa.ruta_salida.lower().endswith('.csv'):
+        # 'utf-8-sig' para que Excel reconozca Ñ y acentos
+        df.to_csv(etapa.ruta_salida, index=False, encoding='utf-8-sig')
+    else:
+        opciones = dict(etapa.opciones_excel)
+        datetime_format = opciones.pop('datetime_format', None)
+        with pd.ExcelWriter(etapa.ruta_salida, engine='openpyxl', datetime_format=datetime_format) as writer:
+            df.to_excel(writer, index=False, **opciones)
+    ETL_Metricas.sumar_bytes_archivo(etapa.ruta_salida, leido=False)
+    ETL_Almacen.registrar_exportacion(etapa.nombre, etapa.ruta_salida)
+
+
+# ==============================================================================
+#                      EJECUCIÓN DEL DAG
+# ==============================================================================
+
+@dataclass
+class ResultadoEtapa:
+    """Resultado de ejecutar una etapa (viaja de vuelta desde el proceso trabajador)."""
+    df: Optional[pd.DataFrame] = None
+    filas: int = 0
+    salida_consola: str = ''
+    segundos: float = 0.0
+    error: Optional[str] = None
+    mensaje_exportacion: Optional[str] = None
+    exportado: bool = False
+    almacenado: bool = False
+    hash_salida: Optional[str] = None
+    metricas: Dict[str, Any] = field(default_factory=dict)  # Medición de la etapa y de sus pasos
+
+
+def ejecutar_etapa(
+    etapa: Etapa,
+    entradas: List[pd.DataFrame],
+    exportar: bool = True,
+    devolver_df: bool = True,
+    calcular_hash: bool = False
+) -> ResultadoEtapa:
+    """
+    Ejecuta la función de la etapa capturando su salida estándar, guarda su salida en el
+    almacén intermedio y, si corresponde, la exporta a Excel/CSV.
+    Se ejecuta igual en el proceso principal o en un trabajador del pool; la medición
+    (tiempo, CPU, memoria, filas, bytes y pasos) viaja de vuelta en resultado.metricas.
+    """
+    ETL_Metricas.tomar_pasos()  # Descarta pasos que hayan quedado de otra etapa en este proceso
+    with ETL_Metricas.Medicion(etapa.nombre, sum(len(df) for df in entradas)) as medicion:
+        resultado = _ejecutar_etapa(etapa, entradas, exportar, devolver_df, calcular_hash)
+        if resultado.error is None:
+            medicion.filas_salida = resultado.filas
+
+    resultado.metricas = dict(medicion.como_registro(), pid=os.getpid(), pasos=ETL_Metricas.tomar_pasos())
+    return resultado
+
+
+def _ejecutar_etapa(
+    etapa: Etapa,
+    entradas: List[pd.DataFrame],
+    exportar: bool,
+    devolver_df: bool,
+    calcular_hash: bool
+) -> ResultadoEtapa:
+    resultado = ResultadoEtapa()
+    salida_consola = io.StringIO()
+    inicio = time.perf_counter()
+
+    try:
+        with contextlib.redirect_stdout(salida_consola), \
+                ETL_Metricas.paso('ejecucion', sum(len(df) for df in entradas)) as medicion:
+            if ETL_Perfil.etapa_perfilada(etapa.nombre):
+                df = ETL_Perfil.ejecutar_perfilado(etapa.nombre, etapa.funcion, *entradas)
+            else:
+                df = etapa.funcion(*entradas)
+            medicion.filas_salida = len(df) if df is not None else None
+    except Exception as e:
+        resultado.error = f"lanzó una excepción: {e}"
+        df = None
+
+    resultado.segundos = time.perf_counter() - inicio
+    resultado.salida_consola = salida_consola.getvalue()
+
+    if resultado.error is None and (df is None or df.empty):
+        resultado.error = "devolvió un DataFrame vacío"
+
+    if resultado.error is not None:
+        return resultado
+
+    resultado.filas = len(df)
+    mensajes = []
+
+    # El almacén es la entrega entre etapas: se guarda siempre, con los tipos del esquema
+    try:
+        with ETL_Metricas.paso('almacen', len(df)) as medicion:
+            df = ETL_Almacen.guardar_tabla(etapa.nombre, df)
+            medicion.filas_salida = len(df)
+        resultado.almacenado = True
+        mensajes.append(f"   Guardado en el almacén: {etapa.ruta_almacen}")
+    except Exception as e:
+        mensajes.append(f"   ⚠️ No se pudo guardar {etapa.nombre} en el almacén ({etapa.ruta_almacen}): {e}")
+
+    if calcular_hash:
+        resultado.hash_salida = ETL_Cache.hash_dataframe(df)
+
+    if exportar and etapa.ruta_salida:
+        try:
+            with ETL_Metricas.paso('exportacion', len(df)) as medicion:
+                exportar_salida(etapa, df)
+                medicion.filas_salida = len(df)
+            resultado.exportado = True
+            mensajes.append(f"   Exportado a: {etapa.ruta_salida}")
+        except Exception as e:
+            mensajes.append(f"   ⚠️ No se pudo exportar {etapa.nombre} a {etapa.ruta_salida}: {e}")
+
+    resultado.mensaje_exportacion = '\n'.join(mensajes) or None
+
+    # Solo se devuelve el DataFrame si alguna etapa posterior lo consume (evita serializarlo de más)
+    resultado.df = df if devolver_df else None
+    return resultado
+
+
+def ejecutar_dag(
+    etapas: List[Etapa],
+    log: Callable[[str], None],
+    exportar_intermedios: bool = EXPORTAR_INTERMEDIOS,
+    max_workers: int = 1,
+    manifiesto: Optional[ETL_Cache.ManifiestoCache] = None,
+    metricas: Optional[ETL_Metricas.RegistroMetricas] = None
+) -> List[str]:
+    """
+    Ejecuta las etapas en orden de dependencias pasando los DataFrames en memoria.
+    Con max_workers > 1, las etapas listas (dependencias resueltas) corren en paralelo
+    en un pool de procesos acotado; el log se escribe siempre desde el proceso principal.
+    Con un manifiesto de caché, las etapas sin cambios en código, entradas ni parámetros
+    no se ejecutan: su salida se toma del almacén, tal como quedó en la corrida anterior.
+    Con un registro de métricas, cada etapa (ejecutada, en caché, fallida u omitida) deja
+    su registro JSON con su medición y la de sus pasos.
+    Devuelve la lista de etapas fallidas (incluye las omitidas por una dependencia fallida).
+    """
+    pendientes = ordenar_etapas(etapas)
+    seleccionadas = {etapa.nombre for etapa in pendientes}
+
+    # Cuántas etapas consumen cada tabla, para liberar memoria cuando ya no se necesita
+    consumidores: Dict[str, int] = {}
+    for etapa in pendientes:
+        for entrada in etapa.entradas:
+            consumidores[entrada] = consumidores.get(entrada, 0) + 1
+
+    contexto: Dict[str, pd.DataFrame] = {}
+    hashes: Dict[str, Optional[str]] = {}   # Hash del contenido de cada tabla (para la caché)
+    firmas: Dict[str, str] = {}
+    completadas: set = set()
+    fallidas: List[str] = []
+    en_curso: Dict[Future, Etapa] = {}
+    extracciones: Dict[str, Dict[str, Any]] = {}   # Lectura de entradas del almacén (proceso principal)
+
+    def registrar_metricas(etapa: Etapa, estado: str, medidas: Optional[Dict[str, Any]] = None) -> None:
+        if metricas is None:
+            return
+        medidas = dict(medidas or {})
+        lectura = extracciones.pop(etapa.nombre, None)
+        if lectura is not None:
+            # La lectura de entradas ocurre en el proceso principal: se suma a la etapa como primer paso
+            medidas['pasos'] = [lectura] + list(medidas.get('pasos') or [])
+            for campo in ('segundos', 'cpu_segundos', 'bytes_leidos', 'bytes_escritos'):
+                if medidas.get(campo) is not None and lectura[campo] is not None:
+                    medidas[campo] = round(medidas[campo] + lectura[campo], 4)
+        metricas.registrar(etapa=etapa.nombre, script=etapa.script, estado=estado, **medidas)
+
+    def liberar_entradas(etapa: Etapa) -> None:
+        for nombre in etapa.entradas:
+            consumidores[nombre] -= 1
+            if consumidores[nombre] == 0:
+                contexto.pop(nombre, None)
+
+    def tomar_de_cache(etapa: Etapa) -> bool:
+        """Calcula la firma de la etapa y, si coincide con el manifiesto, reutiliza su salida."""
+        if manifiesto is None or not etapa.cacheable:
+            return False
+        try:
+            hashes_entradas = {}
+            for nombre in etapa.entradas:
+                if nombre not in hashes:
+                    # Entrada producida fuera de esta corrida: se identifica por su archivo
+                    hashes[nombre] = ETL_Cache.hash_archivo(ruta_vigente(nombre))
+                hashes_entradas[nombre] = hashes[nombre]
+            parametros = etapa.parametros() if etapa.parametros else None
+            firmas[etapa.nombre] = ETL_Cache.firma_etapa(etapa.script, hashes_entradas, etapa.archivos_fuente, parametros)
+
+            clave = f"EN_PROCESO|{etapa.nombre}"
+            if not manifiesto.vigente(clave, firmas[etapa.nombre], etapa.ruta_almacen):
+                return False
+
+            if consumidores.get(etapa.nombre, 0) > 0:
+                contexto[etapa.nombre] = leer_salida(etapa.nombre)
+            hashes[etapa.nombre] = manifiesto.hash_salida(clave)
+        except Exception as e:
+            log(f"   ⚠️ Caché no disponible para {etapa.nombre}: {e}")
+            firmas.pop(etapa.nombre, None)
+            return False
+
+        log(f" EN CACHÉ: {etapa.nombre} sin cambios en código, entradas ni parámetros; se reutiliza {etapa.ruta_almacen}.")
+        registrar_metricas(etapa, 'cache')
+        return True
+
+    def registrar_resultado(etapa: Etapa, resultado: ResultadoEtapa) -> None:
+        if resultado.salida_consola.strip():
+            log(f"   Salida Estándar (stdout) de {etapa.nombre}:\n{resultado.salida_consola.strip()}")
+
+        if resultado.error is not None:
+            log(f" FALLO: {etapa.nombre} {resultado.error} ({resultado.segundos:.2f} s).")
+            registrar_metricas(etapa, 'fallo', resultado.metricas)
+            fallidas.append(etapa.nombre)
+            if manifiesto is not None:
+                manifiesto.invalidar(f"EN_PROCESO|{etapa.nombre}")
+            return
+
+        log(f" ÉXITO: {etapa.nombre} completada en {resultado.segundos:.2f} s ({resultado.filas} filas).")
+        if resultado.mensaje_exportacion:
+            log(resultado.mensaje_exportacion)
+        registrar_metricas(etapa, 'exito', resultado.metricas)
+
+        completadas.add(etapa.nombre)
+        hashes[etapa.nombre] = resultado.hash_salida
+        if resultado.df is not None:
+            contexto[etapa.nombre] = resultado.df
+
+        # Solo se puede reutilizar después lo que quedó guardado en el almacén
+        if manifiesto is not None and etapa.nombre in firmas and resultado.almacenado:
+            manifiesto.registrar(f"EN_PROCESO|{etapa.nombre}", firmas[etapa.nombre], resultado.hash_salida, etapa.ruta_almacen)
+
+    pool = ProcessPoolExecutor(max_workers=max_workers) if max_workers > 1 else None
+    if pool is not None:
+        log(f"Ejecución en paralelo con hasta {max_workers} procesos.")
+
+    try:
+        while pendientes or en_curso:
+            # 1. Lanzar todas las etapas cuyas dependencias ya se resolvieron
+            for etapa in list(pendientes):
+                dependencias_fallidas = [e for e in etapa.entradas if e in fallidas]
+                if dependencias_fallidas:
+                    pendientes.remove(etapa)
+                    log(f" OMITIDA: {etapa.nombre} depende de etapas fallidas: {', '.join(dependencias_fallidas)}.")
+                    registrar_metricas(etapa, 'omitida')
+                    fallidas.append(etapa.nombre)
+                    continue
+
+                if any(e in seleccionadas and e not in completadas for e in etapa.entradas):
+                    continue
+
+                pendientes.remove(etapa)
+                log(f"--- INICIANDO ETAPA: {etapa.nombre} ({etapa.script}) ---")
+
+                if tomar_de_cache(etapa):
+                    completadas.add(etapa.nombre)
+                    liberar_entradas(etapa)
+                    continue
+
+                try:
+                    # Lectura de las entradas que no están en memoria y copia/proyección de todas
+                    with ETL_Metricas.Medicion('extraccion') as extraccion:
+                        entradas = []
+                        for nombre in etapa.entradas:
+                            if nombre not in contexto:
+                                columnas = columnas_consumidores(nombre, [etapa] + pendientes)
+                                detalle = f" (columnas: {', '.join(columnas)})" if columnas is not None else ''
+                                log(f"   Entrada '{nombre}' no está en memoria; se lee del almacén{detalle}.")
+                                contexto[nombre] = leer_salida(nombre, columnas)
+                            # Cada etapa recibe solo las columnas que usa. En serie se pasa una copia
+                            # (varias transformaciones modifican sus entradas in situ); hacia el pool
+                            # la serialización ya es una copia.
+                            entrada = proyectar(contexto[nombre], etapa.columnas_de(nombre))
+                            entradas.append(entrada if pool is not None else entrada.copy())
+                        extraccion.filas_salida = sum(len(df) for df in entradas)
+                    if etapa.entradas:
+                        extracciones[etapa.nombre] = dict(paso='extraccion', **extraccion.como_registro())
+                except Exception as e:
+                    log(f" FALLO: {etapa.nombre} no pudo leer sus entradas: {e}")
+                    registrar_metricas(etapa, 'fallo')
+                    fallidas.append(etapa.nombre)
+                    continue
+                finally:
+                    liberar_entradas(etapa)
+
+                argumentos = (
+                    etapa,
+                    entradas,
+                    etapa.final or exportar_intermedios,        # exportar
+                    consumidores.get(etapa.nombre, 0) > 0,      # devolver_df
+                    manifiesto is not None,                     # calcular_hash
+                )
+
+                if pool is None:
+                    registrar_resultado(etapa, ejecutar_etapa(*argumentos))
+                else:
+                    en_curso[pool.submit(ejecutar_etapa, *argumentos)] = etapa
+
+            if not en_curso:
+                if pendientes:
+                    raise RuntimeError("No hay etapas listas ni en curso; revise las dependencias declaradas.")
+                break
+
+            # 2. Esperar a que termine al menos una etapa en curso
+            terminadas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                etapa = en_curso.pop(futuro)
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    # Ej. el proceso trabajador murió o el resultado no se pudo serializar
+                    resultado = ResultadoEtapa(error=f"falló en el proceso trabajador: {e}")
+                registrar_resultado(etapa, resultado)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    return fallidas
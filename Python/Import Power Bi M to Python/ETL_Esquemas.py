@@ -0,0 +1,120 @@
+from typing import Dict, Optional
+
+import pandas as pd
+
+# ==============================================================================
+#                      ESQUEMAS TIPADOS DE LAS TABLAS INTERMEDIAS
+# ==============================================================================
+# Tipos con los que cada tabla se guarda en el almacén intermedio (Parquet/Arrow).
+# Así cada etapa recibe siempre los mismos tipos, venga la tabla de memoria,
+# del almacén o de un Excel anterior.
+#   'texto'     -> cadenas (los nulos se conservan como nulos, no como 'nan');
+#                  las columnas categóricas se conservan como categóricas
+#   'categoria' -> categórica de cadenas: para columnas con pocos valores distintos
+#                  (planta, Division, Reporte, Concepto...). Cada fila guarda solo
+#                  un código entero, y los joins / groupby trabajan sobre los códigos
+#   'fecha'     -> datetime64[ns]
+#   'dia'       -> fecha sin hora (datetime64[s] normalizada al día)
+#   'decimal'   -> float64
+#   'entero'    -> Int64 (entero que admite nulos, ej. claves de un LEFT JOIN)
+#   'entero32'  -> Int32 (claves sustitutas y órdenes: caben de sobra en 32 bits)
+# Los saldos (Real, Meta, Valor...) se quedan en float64: son importes y float32
+# solo conserva ~7 dígitos significativos. Los días laborados son enteros (Int32).
+
+_TEXTO_TR = {
+    'planta': 'categoria', 'Division': 'categoria', 'Reporte': 'categoria', 'Concepto': 'categoria',
+    'Unidad': 'categoria', 'Orden': 'entero32', 'Concepto2': 'categoria', 'Concepto Capacidad': 'categoria',
+}
+_SALDOS_TR = {
+    'Real': 'decimal', 'Meta': 'decimal', 'Valor Tope': 'decimal', 'Valor Planta': 'decimal',
+    'Valor Transito': 'decimal', 'Valor Capacidad': 'decimal', 'Valor Capacidad 91': 'decimal',
+}
+
+ESQUEMAS: Dict[str, Dict[str, str]] = {
+    'Ext_Datos': {
+        'Fecha': 'dia', 'planta': 'categoria', 'Division': 'categoria',
+        'Concepto Reporte': 'categoria', 'Valor': 'decimal', 'Reporte': 'categoria',
+    },
+    'Ext_DiasLaborados': {
+        'date': 'dia', 'planta': 'categoria', 'Conceptos_DiasLaborados': 'categoria', 'Dias_Laborados': 'entero32',
+    },
+    'TR_Real': {'Fecha': 'dia', **_TEXTO_TR, **_SALDOS_TR},
+    'TR_Datos': {'Fecha': 'dia', **_TEXTO_TR, **_SALDOS_TR},
+    'DimConcepto': {
+        'Concepto': 'texto', 'Reporte': 'texto', 'Orden': 'entero32', 'Unidad': 'texto',
+        'Concepto2': 'texto', 'IdConcepto': 'texto', 'Key_Conceptos': 'entero32',
+    },
+    'DimPlanta': {'planta': 'texto', 'Division': 'texto', 'IdPlanta': 'texto', 'Key_Plantas': 'entero32'},
+    'fctFinanzasDiario': {
+        'fctIndice': 'entero', 'Key_Conceptos': 'entero32', 'Key_Plantas': 'entero32',
+        'Fecha': 'dia', 'Unidad': 'categoria', 'Orden': 'entero32', 'Concepto2': 'categoria',
+        'Concepto Capacidad': 'categoria', 'Real': 'decimal', 'Proyectado': 'decimal',
+        'Valor Tope': 'decimal', 'Valor Planta': 'decimal', 'Valor Transito': 'decimal',
+        'Valor Capacidad': 'decimal', 'Valor Capacidad 91': 'decimal',
+    },
+}
+
+
+# ==============================================================================
+#                      APLICACIÓN DE ESQUEMAS
+# ==============================================================================
+
+def a_texto(serie: pd.Series) -> pd.Series:
+    """Convierte a cadena conservando los nulos (astype(str) los volvería 'nan')."""
+    return serie.where(serie.isna(), serie.astype(str))
+
+
+def a_categoria(serie: pd.Series) -> pd.Series:
+    """Categórica de cadenas (los nulos quedan como nulos, sin categoría)."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        if serie.cat.categories.inferred_type in ('string', 'empty'):
+            return serie
+        return serie.cat.rename_categories(serie.cat.categories.astype(str))
+    return a_texto(serie.astype(object)).astype('category')
+
+
+def convertir_columna(serie: pd.Series, tipo: str) -> pd.Series:
+    if tipo == 'texto':
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            return serie
+        return a_texto(serie) if serie.dtype == 'object' else a_texto(serie.astype(object))
+    if tipo == 'categoria':
+        return a_categoria(serie)
+    if tipo == 'fecha':
+        return pd.to_datetime(serie, errors='coerce')
+    if tipo == 'dia':
+        return pd.to_datetime(serie, errors='coerce').dt.normalize().astype('datetime64[s]')
+    if tipo == 'decimal':
+        return pd.to_numeric(serie, errors='coerce').astype('float64')
+    if tipo == 'entero':
+        return pd.to_numeric(serie, errors='coerce').astype('Int64')
+    if tipo == 'entero32':
+        return pd.to_numeric(serie, errors='coerce').astype('Int32')
+    raise ValueError(f"Tipo de esquema no reconocido: '{tipo}'")
+
+
+def aplicar_esquema(df: pd.DataFrame, nombre: str) -> pd.DataFrame:
+    """
+    Devuelve el DataFrame con los tipos del esquema de la tabla.
+    Las columnas que no están en el esquema se dejan como vienen.
+    """
+    esquema: Optional[Dict[str, str]] = ESQUEMAS.get(nombre)
+    if not esquema:
+        return df
+
+    df = df.copy()
+    for columna, tipo in esquema.items():
+        if columna in df.columns:
+            df[columna] = convertir_columna(df[columna], tipo)
+    return df
+
+
+def textos_homogeneos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte a texto las columnas 'object' que mezclan tipos (ej. números y cadenas
+    leídos de Google Sheets), que Parquet/Arrow no pueden guardar en una sola columna.
+    """
+    df = df.copy()
+    for columna in df.columns[df.dtypes == 'object']:
+        df[columna] = a_texto(df[columna])
+    return df
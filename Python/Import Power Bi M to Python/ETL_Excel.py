@@ -0,0 +1,182 @@
+import hashlib
+import os
+import pickle
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+import ETL_Cache
+import ETL_Metricas
+
+# python-calamine es opcional: lector nativo (Rust) de Excel, varias veces más rápido
+# que openpyxl. Sin él se usa openpyxl, como antes.
+try:
+    import python_calamine  # noqa: F401
+    CALAMINE_DISPONIBLE = True
+except ImportError:
+    CALAMINE_DISPONIBLE = False
+
+# ==============================================================================
+#                      LECTURA DE LIBROS DE EXCEL
+# ==============================================================================
+# Cada hoja se lee completa una sola vez (sin encabezado, tal cual está en el
+# libro) y la cuadrícula se guarda en memoria y en disco, identificada por la
+# ruta, la fecha de modificación y el tamaño del archivo. Las lecturas
+# siguientes (otro script del mismo flujo, otro proceso del pool u otra corrida)
+# toman la cuadrícula guardada y solo recortan las filas y columnas que piden.
+# Si el libro cambia, cambian su fecha y su tamaño y la hoja se vuelve a leer.
+
+MOTOR_EXCEL = 'calamine' if CALAMINE_DISPONIBLE else 'openpyxl'
+
+CACHE_EXCEL_DIR = os.path.join(ETL_Cache.CACHE_DIR, 'excel')
+
+# '0' desactiva la caché en disco (la de memoria se conserva durante el proceso)
+CACHE_EXCEL_EN_DISCO: bool = os.environ.get('ETL_CACHE_EXCEL', '1') == '1'
+
+# Cambiar si cambia la forma de leer las hojas (invalida las cuadrículas en disco)
+VERSION_CACHE_EXCEL = 1
+
+Columnas = Union[None, List[Any], Callable[[Any], bool]]
+
+# Cuadrículas leídas en este proceso: (ruta, hoja) -> (fecha de modificación, tamaño, cuadrícula)
+_HOJAS: Dict[Tuple[str, Any], Tuple[float, int, pd.DataFrame]] = {}
+
+
+def _firma_archivo(ruta: str) -> Tuple[float, int]:
+    estado = os.stat(ruta)
+    return estado.st_mtime, estado.st_size
+
+
+def _ruta_cache(ruta: str, hoja: Any) -> str:
+    nombre = hashlib.sha256(f"{ruta}|{hoja!r}".encode('utf-8')).hexdigest()[:32]
+    return os.path.join(CACHE_EXCEL_DIR, nombre + '.pkl')
+
+
+def _leer_cache_disco(ruta: str, hoja: Any, firma: Tuple[float, int]) -> Optional[pd.DataFrame]:
+    try:
+        with open(_ruta_cache(ruta, hoja), 'rb') as f:
+            contenido = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Advertencia: Caché de Excel ilegible para '{os.path.basename(ruta)}' ({e}). Se volverá a leer.")
+        return None
+    if contenido.get('version') != VERSION_CACHE_EXCEL or tuple(contenido.get('firma', ())) != firma:
+        return None
+    return contenido['cuadricula']
+
+
+def _guardar_cache_disco(ruta: str, hoja: Any, firma: Tuple[float, int], cuadricula: pd.DataFrame) -> None:
+    """Escritura atómica (temporal + reemplazo): otro proceso nunca lee un archivo a medias."""
+    try:
+        os.makedirs(CACHE_EXCEL_DIR, exist_ok=True)
+        ruta_cache = _ruta_cache(ruta, hoja)
+        ruta_temporal = f"{ruta_cache}.{os.getpid()}.tmp"
+        with open(ruta_temporal, 'wb') as f:
+            pickle.dump({'version': VERSION_CACHE_EXCEL, 'firma': firma, 'cuadricula': cuadricula}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(ruta_temporal, ruta_cache)
+    except OSError as e:
+        print(f"⚠️ Advertencia: No se pudo guardar la caché de Excel de '{os.path.basename(ruta)}': {e}")
+
+
+def leer_cuadricula(ruta: str, hoja: Union[str, int] = 0) -> pd.DataFrame:
+    """
+    Hoja completa sin encabezado (columnas 0..n-1), leída una sola vez por versión del
+    archivo. Lanza FileNotFoundError si no existe el libro y ValueError si no existe la hoja.
+    No modificar el resultado: se comparte entre lecturas (leer_excel devuelve copias).
+    """
+    ruta = os.path.abspath(ruta)
+    firma = _firma_archivo(ruta)  # FileNotFoundError si el libro no existe
+
+    guardada = _HOJAS.get((ruta, hoja))
+    if guardada is not None and guardada[:2] == firma:
+        return guardada[2]
+
+    cuadricula = _leer_cache_disco(ruta, hoja, firma) if CACHE_EXCEL_EN_DISCO else None
+    if cuadricula is None:
+        with pd.ExcelFile(ruta, engine=MOTOR_EXCEL) as libro:
+            if isinstance(hoja, str) and hoja not in libro.sheet_names:
+                raise ValueError(f"Worksheet named '{hoja}' not found")
+            cuadricula = libro.parse(sheet_name=hoja, header=None)
+        ETL_Metricas.sumar_bytes(leidos=firma[1])
+        if CACHE_EXCEL_EN_DISCO:
+            _guardar_cache_disco(ruta, hoja, firma, cuadricula)
+
+    _HOJAS[(ruta, hoja)] = (firma[0], firma[1], cuadricula)
+    return cuadricula
+
+
+def _nombres_encabezado(valores: List[Any]) -> List[Any]:
+    """Encabezados como los deja pd.read_excel: vacíos -> 'Unnamed: i', repetidos -> 'X.1', 'X.2'..."""
+    nombres: List[Any] = []
+    vistos: Dict[Any, int] = {}
+    for i, valor in enumerate(valores):
+        nombre = f"Unnamed: {i}" if pd.isna(valor) else valor
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        else:
+            vistos[nombre] = 0
+        nombres.append(nombre)
+    return nombres
+
+
+def _inferir_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tipos por columna como los deja pd.read_excel. La cuadrícula mezcla encabezados y
+    datos en cada columna, así que sus columnas llegan como texto/object: se vuelven a
+    inferir y una columna cuyas celdas no nulas son todas números (o texto numérico,
+    ej. [1, None, 3, '4'], o booleanos con nulos) pasa a numérica, igual que en pd.read_excel.
+    """
+    df = df.infer_objects()
+    for i in range(df.shape[1]):
+        columna = df.iloc[:, i]
+        if pd.api.types.is_numeric_dtype(columna) or pd.api.types.is_datetime64_any_dtype(columna):
+            continue
+        try:
+            df.isetitem(i, pd.to_numeric(columna))
+        except (ValueError, TypeError):
+            pass
+    return df
+
+
+def leer_excel(
+    ruta: str,
+    hoja: Union[str, int] = 0,
+    header: Optional[int] = 0,
+    skiprows: int = 0,
+    nrows: Optional[int] = None,
+    usecols: Columnas = None
+) -> pd.DataFrame:
+    """
+    Equivalente a pd.read_excel(ruta, sheet_name=hoja, header=..., skiprows=..., nrows=...,
+    usecols=...) sobre la cuadrícula guardada de la hoja: solo se copian las filas y
+    columnas pedidas, con los mismos tipos por columna (ver _inferir_tipos). 'usecols' admite posiciones, nombres (con encabezado) o una función.
+    """
+    cuadricula = leer_cuadricula(ruta, hoja)
+    filas = cuadricula.iloc[skiprows:]
+
+    if header is None:
+        nombres = list(range(filas.shape[1]))
+        datos = filas
+    else:
+        nombres = _nombres_encabezado(list(filas.iloc[header])) if len(filas) > header else list(range(filas.shape[1]))
+        datos = filas.iloc[header + 1:]
+    if nrows is not None:
+        datos = datos.iloc[:nrows]
+
+    posiciones = list(range(len(nombres)))
+    if callable(usecols):
+        posiciones = [i for i in posiciones if usecols(nombres[i])]
+    elif usecols is not None:
+        # Como en pandas: una lista de enteros son posiciones; si no, nombres de columna
+        pedidas = set(usecols)
+        if all(isinstance(col, int) for col in pedidas):
+            posiciones = [i for i in posiciones if i in pedidas]
+        else:
+            posiciones = [i for i in posiciones if nombres[i] in pedidas]
+
+    df = datos.iloc[:, posiciones].copy()
+    df.columns = [nombres[i] for i in posiciones]
+    return _inferir_tipos(df.reset_index(drop=True))
@@ -1,9 +1,14 @@
+import argparse
 import subprocess
 import sys
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 from datetime import datetime
 
+import ETL_Cache
+import ETL_DAG
+import ETL_Metricas
+
 # ==============================================================================
 #                      CONFIGURACIÓN PRINCIPAL
 # ==============================================================================
@@ -63,24 +68,65 @@ SEGMENTOS_DISPONIBLES: Dict[str, List[str]] = {
 # -----------------------------------------------------------------------------
 SEGMENTO_A_EJECUTAR: str = "TODOS" 
 
-# Lógica para determinar la lista final de ejecución y el prefijo del log
-if SEGMENTO_A_EJECUTAR in SEGMENTOS_DISPONIBLES:
-    SCRIPTS_TO_RUN = SEGMENTOS_DISPONIBLES[SEGMENTO_A_EJECUTAR]
-    LOG_FILE_PREFIX = f'Proceso_{SEGMENTO_A_EJECUTAR}'
-elif SEGMENTO_A_EJECUTAR == "TODOS":
-    # 🚨 Flujo completo: Financiero -> Dimensiones -> Hechos
-    SCRIPTS_TO_RUN = FINANCIERO_SCRIPTS + MODELADO_DIMENSIONES + MODELADO_HECHOS
-    LOG_FILE_PREFIX = 'Proceso_Completo'
-else:
-    print(f"ERROR: Segmento '{SEGMENTO_A_EJECUTAR}' no reconocido. Ejecutando lista vacía.")
-    SCRIPTS_TO_RUN = []
-    LOG_FILE_PREFIX = 'ERROR'
+# -----------------------------------------------------------------------------
+# ✅ MODO DE EJECUCIÓN
+# "EN_PROCESO": las etapas se importan y se pasan los DataFrames en memoria (ETL_DAG.py).
+# "SUBPROCESO": un intérprete por script, intercambiando tablas por el almacén intermedio (modo anterior).
+# -----------------------------------------------------------------------------
+MODO_EJECUCION: str = "EN_PROCESO"
+
+# -----------------------------------------------------------------------------
+# ✅ PARALELISMO (solo modo EN_PROCESO)
+# Número máximo de procesos para correr a la vez las etapas independientes
+# (ej. los catálogos de Google Sheets, que pasan casi todo el tiempo esperando la red).
+# 1 = ejecución en serie.
+# Se puede cambiar al ejecutar: python ETL_Flujo_Financieron.py --max-workers 4
+# -----------------------------------------------------------------------------
+MAX_WORKERS: int = 4
+
+# -----------------------------------------------------------------------------
+# ✅ CACHÉ DE ETAPAS
+# Si está activa, una etapa cuyo código, entradas y parámetros no cambiaron desde
+# la última corrida no se vuelve a ejecutar (se reutiliza su tabla del almacén intermedio).
+# Las etapas que leen de una API o de Google Sheets siempre se ejecutan.
+# Para forzar la reconstrucción completa: python ETL_Flujo_Financieron.py --sin-cache
+# -----------------------------------------------------------------------------
+USAR_CACHE: bool = True
+
+
+def resolver_segmento(segmento: str):
+    """Devuelve la lista final de ejecución y el prefijo del log para el segmento."""
+    if segmento in SEGMENTOS_DISPONIBLES:
+        return SEGMENTOS_DISPONIBLES[segmento], f'Proceso_{segmento}'
+    if segmento == "TODOS":
+        # 🚨 Flujo completo: Financiero -> Dimensiones -> Hechos
+        return FINANCIERO_SCRIPTS + MODELADO_DIMENSIONES + MODELADO_HECHOS, 'Proceso_Completo'
+
+    print(f"ERROR: Segmento '{segmento}' no reconocido. Ejecutando lista vacía.")
     sys.exit(1)
 
 
+def leer_argumentos() -> argparse.Namespace:
+    """Permite sobrescribir desde la línea de comandos la configuración de arriba."""
+    parser = argparse.ArgumentParser(description="Orquestador del flujo ETL financiero y de modelado.")
+    parser.add_argument('--segmento', default=SEGMENTO_A_EJECUTAR,
+                        help="FINANCIERO, MODELADO o TODOS (por defecto: %(default)s).")
+    parser.add_argument('--modo', default=MODO_EJECUCION, choices=["EN_PROCESO", "SUBPROCESO"],
+                        help="Modo de ejecución (por defecto: %(default)s).")
+    parser.add_argument('--max-workers', type=int, default=MAX_WORKERS,
+                        help="Procesos en paralelo para etapas independientes (por defecto: %(default)s).")
+    parser.add_argument('--sin-cache', action='store_true', default=not USAR_CACHE,
+                        help="Ejecuta todas las etapas aunque sus entradas no hayan cambiado.")
+    return parser.parse_args()
+
+
 #  3. CONFIGURACIÓN DEL ARCHIVO DE LOG
 LOG_BASE_DIR = r'C:\Users\USUARIO\Documents\Juan Manuel Cortes Benitez\Python\Procesamiento_Scripts'
 
+# Log de métricas de todas las corridas (una línea JSON por etapa): tiempo, CPU, memoria,
+# filas y bytes de cada etapa y de sus pasos. Se lee con ETL_Metricas.leer_metricas().
+RUTA_METRICAS = os.path.join(LOG_BASE_DIR, ETL_Metricas.ARCHIVO_METRICAS)
+
 
 # ==============================================================================
 #                      FUNCIÓN DE LOGGING
@@ -113,8 +159,19 @@ def log_message(message: str, log_path: str):
 #                      FUNCIÓN DE EJECUCIÓN
 # ==============================================================================
 
-def execute_python_script(script_path: str, python_exe: str, log_path: str) -> bool:
-    """Ejecuta un script Python usando subprocess y registra el resultado."""
+def execute_python_script(
+    script_path: str,
+    python_exe: str,
+    log_path: str,
+    metricas: Optional[ETL_Metricas.RegistroMetricas] = None
+) -> bool:
+    """
+    Ejecuta un script Python usando subprocess y registra el resultado.
+    Con 'metricas' deja el registro JSON del script (con el nombre de su etapa, como en
+    EN_PROCESO): tiempo, CPU y memoria del subproceso (el pico muestreado requiere psutil;
+    ver ETL_Metricas) y los bytes de su tabla del almacén si se reescribió. Las filas y los pasos
+    solo se miden en el modo EN_PROCESO.
+    """
     
     script_name = os.path.basename(script_path)
     
@@ -126,17 +183,29 @@ def execute_python_script(script_path: str, python_exe: str, log_path: str) -> b
     
     try:
         # Ejecutar el proceso y capturar la salida
-        resultado = subprocess.run(
-            comando, 
-            capture_output=True, 
-            text=True, 
-            check=False, # Permite manejar el código de retorno manualmente
-            encoding='utf-8',       
-            errors='replace',
-            env=dict(os.environ, PYTHONIOENCODING='utf-8')      
-        )
+        inicio = datetime.now().timestamp()
+        with ETL_Metricas.Medicion(script_name, hijos=True) as medicion:
+            resultado = subprocess.run(
+                comando, 
+                capture_output=True, 
+                text=True, 
+                check=False, # Permite manejar el código de retorno manualmente
+                encoding='utf-8',       
+                errors='replace',
+                env=dict(os.environ, PYTHONIOENCODING='utf-8')      
+            )
         
         return_code = resultado.returncode
+
+        if metricas is not None:
+            etapa = ETL_DAG.etapa_de_script(script_path)
+            ruta_salida = etapa.ruta_almacen if etapa is not None else None
+            if ruta_salida and os.path.exists(ruta_salida) and os.path.getmtime(ruta_salida) >= inicio:
+                medicion.bytes_escritos = os.path.getsize(ruta_salida)
+            metricas.registrar(
+                etapa=etapa.nombre if etapa is not None else os.path.splitext(script_name)[0],
+                script=script_name, estado='exito' if return_code == 0 else 'fallo', **medicion.como_registro()
+            )
         
         if return_code == 0:
             # 2. Registrar Éxito
@@ -176,32 +245,89 @@ def execute_python_script(script_path: str, python_exe: str, log_path: str) -> b
 
 if __name__ == '__main__':
     
+    args = leer_argumentos()
+    SEGMENTO_A_EJECUTAR = args.segmento
+    MODO_EJECUCION = args.modo
+    SCRIPTS_TO_RUN, LOG_FILE_PREFIX = resolver_segmento(SEGMENTO_A_EJECUTAR)
+    manifiesto = None if args.sin_cache else ETL_Cache.ManifiestoCache()
+    
     # 0. Generar el nombre de archivo de log dinámico
     timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
     LOG_FILE_PATH = os.path.join(LOG_BASE_DIR, f"{LOG_FILE_PREFIX}_{timestamp_str}.log")
+    metricas = ETL_Metricas.RegistroMetricas(
+        RUTA_METRICAS, corrida=timestamp_str, segmento=SEGMENTO_A_EJECUTAR, modo=MODO_EJECUCION
+    )
     
     # 1. Configuración inicial del log
     log_message(f"\n########################################################", LOG_FILE_PATH)
     log_message(f"####### INICIO DE PROCESAMIENTO SEGMENTADO ###########", LOG_FILE_PATH)
     log_message(f"Log de salida en: {LOG_FILE_PATH}", LOG_FILE_PATH)
     log_message(f"Segmento a ejecutar: {SEGMENTO_A_EJECUTAR} ({len(SCRIPTS_TO_RUN)} scripts)", LOG_FILE_PATH)
+    log_message(f"Modo de ejecución: {MODO_EJECUCION} (max. procesos: {args.max_workers})", LOG_FILE_PATH)
+    log_message(f"Caché de etapas: {'DESACTIVADA' if manifiesto is None else ETL_Cache.RUTA_MANIFIESTO}", LOG_FILE_PATH)
+    log_message(f"Métricas por etapa en: {RUTA_METRICAS} (corrida {metricas.corrida})", LOG_FILE_PATH)
+    if ETL_Metricas.PSUTIL_DISPONIBLE:
+        log_message(f"Memoria por etapa: pico muestreado cada {ETL_Metricas.INTERVALO_MEMORIA} s (memoria_pico_mb).", LOG_FILE_PATH)
+    else:
+        log_message("Memoria por etapa: sin psutil no se muestrea (memoria_pico_mb vacío); "
+                    "memoria_maxima_proceso_mb es el máximo del proceso desde su inicio, no el de la etapa.", LOG_FILE_PATH)
     log_message(f"Python Executable: {PYTHON_EXECUTABLE}", LOG_FILE_PATH)
     log_message(f"########################################################\n", LOG_FILE_PATH)
     
     scripts_fallidos = []
     
     # 2. Recorre y ejecuta cada script
-    for script_file in SCRIPTS_TO_RUN:
-        exito = execute_python_script(script_file, PYTHON_EXECUTABLE, LOG_FILE_PATH)
-        
-        if not exito:
-            scripts_fallidos.append(script_file)
-            # break # Descomentar para detener la ejecución inmediatamente después de un fallo.
+    with ETL_Metricas.Medicion(LOG_FILE_PREFIX) as medicion_corrida:
+        if MODO_EJECUCION == "EN_PROCESO":
+            # Las etapas se ordenan por dependencias y se pasan los DataFrames en memoria;
+            # las que no dependen entre sí corren en paralelo hasta args.max_workers procesos
+            etapas = ETL_DAG.seleccionar_etapas(SCRIPTS_TO_RUN)
+            scripts_fallidos = ETL_DAG.ejecutar_dag(
+                etapas,
+                lambda mensaje: log_message(mensaje, LOG_FILE_PATH),
+                max_workers=args.max_workers,
+                manifiesto=manifiesto,
+                metricas=metricas
+            )
+        else:
+            for script_file in SCRIPTS_TO_RUN:
+                etapa = ETL_DAG.etapa_de_script(script_file)
+                if manifiesto is None or etapa is None:
+                    exito = execute_python_script(script_file, PYTHON_EXECUTABLE, LOG_FILE_PATH, metricas)
+                else:
+                    exito = ETL_Cache.ejecutar_script_con_cache(
+                        script_file,
+                        lambda: execute_python_script(script_file, PYTHON_EXECUTABLE, LOG_FILE_PATH, metricas),
+                        lambda mensaje: log_message(mensaje, LOG_FILE_PATH),
+                        manifiesto,
+                        ETL_DAG.rutas_entradas(etapa),
+                        etapa.ruta_almacen,
+                        etapa.archivos_fuente,
+                        cacheable=etapa.cacheable and etapa.parametros is None
+                    )
+            
+                if not exito:
+                    scripts_fallidos.append(script_file)
+                    # break # Descomentar para detener la ejecución inmediatamente después de un fallo.
     
     # 3. Resumen Final
     log_message("\n========================================================", LOG_FILE_PATH)
     log_message("               RESUMEN DE PROCESAMIENTO                 ", LOG_FILE_PATH)
     log_message("========================================================", LOG_FILE_PATH)
+
+    metricas.registrar(
+        tipo='corrida', estado='exito' if not scripts_fallidos else 'fallo',
+        scripts=len(SCRIPTS_TO_RUN), fallidos=scripts_fallidos, **medicion_corrida.como_registro()
+    )
+    log_message(f" Duración total: {medicion_corrida.segundos:.1f} s "
+                f"(CPU del proceso principal: {medicion_corrida.cpu_segundos:.1f} s).", LOG_FILE_PATH)
+    if medicion_corrida.memoria_maxima_proceso_mb is not None:
+        log_message(f" Memoria máxima del proceso principal: {medicion_corrida.memoria_maxima_proceso_mb:.0f} MB.", LOG_FILE_PATH)
+
+    # Etapas que tardaron bastante más que en las corridas anteriores
+    for _, fila in ETL_Metricas.regresiones(ETL_Metricas.leer_metricas(RUTA_METRICAS), corrida=metricas.corrida).iterrows():
+        log_message(f"⚠️ REGRESIÓN: {fila['etapa']} tardó {fila['segundos']:.2f} s "
+                    f"(mediana de corridas previas: {fila['mediana_previa']:.2f} s, x{fila['factor']:.1f}).", LOG_FILE_PATH)
     
     if not scripts_fallidos:
         log_message(" Todos los scripts se ejecutaron con éxito.", LOG_FILE_PATH)
@@ -0,0 +1,141 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import ETL_HTTP
+
+# ==============================================================================
+#                      LIBRO DE CATÁLOGOS (GOOGLE SHEETS)
+# ==============================================================================
+# ConceptosInventario, ConceptosMaquinas y ConceptosProdFlag son pestañas del
+# mismo libro de Google Sheets. Antes cada script hacía su propia petición y su
+# propio parseo (uno con el motor 'python' de read_csv). Aquí la primera pestaña
+# que se pide descarga todas a la vez (hilos sobre la sesión compartida de
+# ETL_HTTP, que deja cada respuesta en su caché en disco para los demás
+# procesos) y cada una se parsea con el motor C.
+# Cada descarga correcta se copia a un espejo local; si no hay red (o se pide
+# trabajar sin ella) se leen las copias del espejo.
+
+ID_LIBRO_CATALOGOS = '1EK96qUKEW2dfnRBT7NfeVouAFouUXDOvHRVVGJ8gs34'
+
+RUTA_ESPEJO_CATALOGOS = os.environ.get(
+    'ETL_RUTA_ESPEJO_CATALOGOS', str(Path.home() / 'Downloads' / 'ETL_EspejoCatalogos')
+)
+
+# '1' no consulta Google Sheets: todas las pestañas salen del espejo local
+SOLO_ESPEJO: bool = os.environ.get('ETL_CATALOGOS_SIN_RED', '0') == '1'
+
+HILOS_DESCARGA = 4
+
+
+@dataclass(frozen=True)
+class Pestana:
+    """Pestaña del libro: gid y exportación que usa ('export' o 'gviz')."""
+    nombre: str
+    gid: str
+    formato: str = 'export'
+
+    @property
+    def url(self) -> str:
+        base = f"https://docs.google.com/spreadsheets/d/{ID_LIBRO_CATALOGOS}"
+        if self.formato == 'gviz':
+            # La consulta gviz infiere los tipos de cada columna (ConceptosMaquinas depende de ello)
+            return f"{base}/gviz/tq?tqx=out:csv&gid={self.gid}"
+        return f"{base}/export?format=csv&gid={self.gid}"
+
+
+PESTANAS: Dict[str, Pestana] = {
+    'ConceptosInventario': Pestana('ConceptosInventario', '966198883'),
+    'ConceptosMaquinas': Pestana('ConceptosMaquinas', '700246857', formato='gviz'),
+    'ConceptosProdFlag': Pestana('ConceptosProdFlag', '1118832498'),
+}
+
+# CSV ya obtenidos en este proceso: nombre de la pestaña -> contenido
+_CONTENIDOS: Dict[str, bytes] = {}
+
+
+def ruta_espejo(nombre: str) -> str:
+    """Copia local de la pestaña (ej. Downloads/ETL_EspejoCatalogos/ConceptosMaquinas.csv)."""
+    return os.path.join(RUTA_ESPEJO_CATALOGOS, nombre + '.csv')
+
+
+def _guardar_espejo(nombre: str, contenido: bytes) -> None:
+    try:
+        os.makedirs(RUTA_ESPEJO_CATALOGOS, exist_ok=True)
+        ruta = ruta_espejo(nombre)
+        ruta_temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(ruta_temporal, 'wb') as f:
+            f.write(contenido)
+        os.replace(ruta_temporal, ruta)
+    except OSError as e:
+        print(f"⚠️ Advertencia: No se pudo actualizar el espejo local de '{nombre}': {e}")
+
+
+def _leer_espejo(nombre: str) -> bytes:
+    with open(ruta_espejo(nombre), 'rb') as f:
+        return f.read()
+
+
+def _descargar(pestana: Pestana) -> bytes:
+    """CSV de la pestaña desde Google Sheets (vía ETL_HTTP); actualiza el espejo local."""
+    ruta_cuerpo, _ = ETL_HTTP.descargar(pestana.url)
+    with open(ruta_cuerpo, 'rb') as f:
+        contenido = f.read()
+    _guardar_espejo(pestana.nombre, contenido)
+    return contenido
+
+
+def precargar(nombres: Optional[List[str]] = None) -> Dict[str, Exception]:
+    """
+    Obtiene a la vez las pestañas indicadas (todas por defecto) que aún no están en memoria.
+    Devuelve los errores por pestaña (vacío si todas se obtuvieron).
+    """
+    pendientes = [PESTANAS[nombre] for nombre in (nombres or list(PESTANAS)) if nombre not in _CONTENIDOS]
+    errores: Dict[str, Exception] = {}
+    if not pendientes:
+        return errores
+
+    if SOLO_ESPEJO:
+        futuros = {}
+    else:
+        with ThreadPoolExecutor(max_workers=min(HILOS_DESCARGA, len(pendientes))) as hilos:
+            futuros = {pestana.nombre: hilos.submit(_descargar, pestana) for pestana in pendientes}
+
+    for pestana in pendientes:
+        nombre = pestana.nombre
+        try:
+            if nombre in futuros:
+                _CONTENIDOS[nombre] = futuros[nombre].result()
+                continue
+            _CONTENIDOS[nombre] = _leer_espejo(nombre)
+        except FileNotFoundError as e:
+            errores[nombre] = e
+        except Exception as e:
+            # Sin red (o Google Sheets no responde): se usa la última copia descargada
+            if not os.path.exists(ruta_espejo(nombre)):
+                errores[nombre] = e
+                continue
+            print(f"⚠️ Advertencia: No se pudo descargar '{nombre}' ({e}). Se usa el espejo local.")
+            _CONTENIDOS[nombre] = _leer_espejo(nombre)
+    return errores
+
+
+def leer_pestana(nombre: str, **opciones) -> pd.DataFrame:
+    """
+    Equivalente a pd.read_csv sobre el CSV de la pestaña (motor C), con las 'opciones'
+    de read_csv que necesite cada script. La primera llamada del proceso obtiene todas
+    las pestañas del libro. Lanza KeyError si la pestaña no está en PESTANAS y la
+    excepción de la descarga si no se pudo obtener ni hay copia en el espejo.
+    """
+    if nombre not in PESTANAS:
+        raise KeyError(f"Pestaña de catálogo no registrada: '{nombre}'. Opciones: {list(PESTANAS)}")
+    if nombre not in _CONTENIDOS:
+        error = precargar().get(nombre)
+        if error is not None:
+            raise error
+    return pd.read_csv(io.BytesIO(_CONTENIDOS[nombre]), encoding='utf-8', engine='c', **opciones)
@@ -0,0 +1,291 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+import ETL_Metricas
+
+# psutil es opcional (pip install psutil): sin él, si el dueño de un bloqueo sigue
+# vivo se revisa con os.kill(pid, 0) (POSIX) o OpenProcess (Windows)
+try:
+    import psutil
+    PSUTIL_DISPONIBLE = True
+except ImportError:
+    PSUTIL_DISPONIBLE = False
+
+# ==============================================================================
+#                      CONFIGURACIÓN DEL CLIENTE HTTP COMPARTIDO
+# ==============================================================================
+# Todas las extracciones (API de KPIs, Google Sheets, API de atención a clientes)
+# pasan por una sola sesión con conexiones reutilizables, reintentos con espera
+# exponencial y una caché en disco de las respuestas. Así, en una corrida cada
+# endpoint se descarga una sola vez aunque lo lean varios scripts o procesos.
+
+CACHE_HTTP_DIR = os.environ.get('ETL_CACHE_HTTP', str(Path.home() / 'Downloads' / '.etl_cache' / 'http'))
+
+# Segundos que una respuesta en disco se da por vigente sin preguntar al servidor.
+# Vencido el plazo se revalida con ETag / Last-Modified (304 = se reutiliza).
+# 0 = revalidar siempre.
+TTL_SEGUNDOS: int = int(os.environ.get('ETL_HTTP_TTL', '900'))
+
+# (conexión, lectura) en segundos, para las llamadas que no indican su propio timeout
+TIMEOUT_POR_DEFECTO: Tuple[int, int] = (10, 120)
+
+REINTENTOS = 4
+FACTOR_ESPERA = 1.0  # Esperas de 1, 2, 4, 8 s entre reintentos
+ESTADOS_REINTENTABLES = (429, 500, 502, 503, 504)
+
+# Si otro proceso está descargando la misma URL, se espera a que termine. El bloqueo
+# solo se toma si el proceso que lo creó ya no existe; pasado este límite se avisa
+# (y se toma un bloqueo que quedó sin dueño legible, ej. un proceso que murió al crearlo).
+ESPERA_MAXIMA_BLOQUEO = 300
+
+TAMANO_BLOQUE = 1024 * 1024
+
+_SESION: Optional[requests.Session] = None
+
+
+def obtener_sesion() -> requests.Session:
+    """Sesión compartida del proceso (pool de conexiones + reintentos)."""
+    global _SESION
+    if _SESION is None:
+        reintentos = Retry(
+            total=REINTENTOS,
+            backoff_factor=FACTOR_ESPERA,
+            status_forcelist=ESTADOS_REINTENTABLES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+        )
+        adaptador = HTTPAdapter(pool_connections=10, pool_maxsize=10, max_retries=reintentos)
+        sesion = requests.Session()
+        sesion.mount('https://', adaptador)
+        sesion.mount('http://', adaptador)
+        _SESION = sesion
+    return _SESION
+
+
+# ==============================================================================
+#                      CACHÉ EN DISCO
+# ==============================================================================
+
+def clave_peticion(url: str, params: Optional[Dict[str, str]] = None, headers: Optional[Dict[str, str]] = None) -> str:
+    """Clave de caché: URL + parámetros + encabezados (ordenados)."""
+    partes = json.dumps([url, sorted((params or {}).items()), sorted((headers or {}).items())], default=str)
+    return hashlib.sha256(partes.encode('utf-8')).hexdigest()
+
+
+def _rutas(clave: str) -> Tuple[str, str]:
+    base = os.path.join(CACHE_HTTP_DIR, clave)
+    return base + '.body', base + '.json'
+
+
+def _leer_meta(clave: str) -> Optional[Dict]:
+    ruta_cuerpo, ruta_meta = _rutas(clave)
+    if not os.path.exists(ruta_cuerpo):
+        return None
+    try:
+        with open(ruta_meta, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _guardar_meta(clave: str, meta: Dict) -> None:
+    _, ruta_meta = _rutas(clave)
+    ruta_temporal = ruta_meta + '.tmp'
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    os.replace(ruta_temporal, ruta_meta)
+
+
+def proceso_activo(pid: int) -> bool:
+    """True si existe un proceso con ese PID en esta máquina."""
+    if PSUTIL_DISPONIBLE:
+        return psutil.pid_exists(pid)
+    if os.name == 'nt':
+        # En Windows os.kill(pid, 0) termina el proceso: se consulta con OpenProcess
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        manejador = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not manejador:
+            return kernel32.GetLastError() == 5  # ERROR_ACCESS_DENIED: existe, pero es de otro usuario
+        codigo = ctypes.c_ulong()
+        try:
+            kernel32.GetExitCodeProcess(manejador, ctypes.byref(codigo))
+        finally:
+            kernel32.CloseHandle(manejador)
+        return codigo.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _leer_dueno(ruta: str) -> Optional[str]:
+    """Contenido del archivo de bloqueo ('<pid> <token>'); None si ya no existe."""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _bloqueo_abandonado(ruta: str, dueno: str) -> bool:
+    """
+    True si el dueño del bloqueo ya no existe. Un archivo sin dueño legible (el proceso
+    murió entre crearlo y escribirlo) se da por abandonado después de ESPERA_MAXIMA_BLOQUEO.
+    """
+    try:
+        pid = int(dueno.split()[0])
+    except (IndexError, ValueError):
+        try:
+            return time.time() - os.path.getmtime(ruta) > ESPERA_MAXIMA_BLOQUEO
+        except OSError:
+            return False
+    return pid != os.getpid() and not proceso_activo(pid)
+
+
+@contextlib.contextmanager
+def bloqueo(clave: str) -> Iterator[None]:
+    """
+    Bloqueo entre procesos (archivo .lock creado en exclusiva), para que dos etapas
+    en paralelo no descarguen (o procesen) a la vez el mismo endpoint.
+    El archivo guarda el PID y un token del dueño: solo se toma si ese proceso ya no
+    existe, y al salir solo se borra si sigue siendo propio.
+    """
+    os.makedirs(CACHE_HTTP_DIR, exist_ok=True)
+    ruta = os.path.join(CACHE_HTTP_DIR, clave + '.lock')
+    propio = f"{os.getpid()} {uuid.uuid4().hex}"
+    inicio = time.monotonic()
+    avisado = False
+    while True:
+        try:
+            descriptor = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            dueno = _leer_dueno(ruta)
+            if dueno is None:
+                continue  # El otro proceso acaba de liberar el bloqueo
+            if _bloqueo_abandonado(ruta, dueno):
+                # Bloqueo de un proceso que murió: se borra solo si nadie lo tomó entretanto
+                if _leer_dueno(ruta) == dueno:
+                    with contextlib.suppress(OSError):
+                        os.remove(ruta)
+                continue
+            if not avisado and time.monotonic() - inicio > ESPERA_MAXIMA_BLOQUEO:
+                print(f"   ⏳ Esperando el bloqueo '{clave}' (dueño: proceso {dueno.split()[0]}, sigue activo)...")
+                avisado = True
+            time.sleep(0.2)
+            continue
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            f.write(propio)
+        break
+    try:
+        yield
+    finally:
+        # Si otro proceso lo tomó (ej. se borró a mano), su bloqueo no se toca
+        if _leer_dueno(ruta) == propio:
+            with contextlib.suppress(OSError):
+                os.remove(ruta)
+
+
+# ==============================================================================
+#                      DESCARGA
+# ==============================================================================
+
+def descargar(
+    url: str,
+    params: Optional[Dict[str, str]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Union[float, Tuple[float, float], None] = None,
+    ttl: Optional[int] = None
+) -> Tuple[str, Dict]:
+    """
+    Descarga la respuesta al disco (por bloques, sin cargarla completa en memoria) o
+    reutiliza la que ya está en caché. Devuelve (ruta del cuerpo, metadatos).
+    Lanza requests.exceptions.RequestException si la petición falla.
+    """
+    ttl = TTL_SEGUNDOS if ttl is None else ttl
+    clave = clave_peticion(url, params, headers)
+    ruta_cuerpo, _ = _rutas(clave)
+
+    with bloqueo(clave):
+        meta = _leer_meta(clave)
+
+        # 1. En caché y vigente: no se consulta al servidor
+        if meta is not None and time.time() - meta['fecha'] < ttl:
+            print(f"   ↺ Respuesta en caché (HTTP): {url}")
+            return ruta_cuerpo, meta
+
+        # 2. Revalidación condicional con ETag / Last-Modified
+        encabezados = dict(headers or {})
+        if meta is not None:
+            if meta.get('etag'):
+                encabezados['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                encabezados['If-Modified-Since'] = meta['last_modified']
+
+        with obtener_sesion().get(
+            url, params=params, headers=encabezados, timeout=timeout or TIMEOUT_POR_DEFECTO, stream=True
+        ) as respuesta:
+            if respuesta.status_code == 304 and meta is not None:
+                print(f"   ↺ Sin cambios en el servidor (304): {url}")
+                meta['fecha'] = time.time()
+                _guardar_meta(clave, meta)
+                return ruta_cuerpo, meta
+
+            respuesta.raise_for_status()
+
+            ruta_temporal = ruta_cuerpo + '.tmp'
+            respuesta.raw.decode_content = True  # Descomprime gzip/deflate al vuelo
+            with open(ruta_temporal, 'wb') as f:
+                shutil.copyfileobj(respuesta.raw, f, TAMANO_BLOQUE)
+            os.replace(ruta_temporal, ruta_cuerpo)
+            ETL_Metricas.sumar_bytes_archivo(ruta_cuerpo)  # Bytes recibidos del servidor
+
+            meta = {
+                'url': respuesta.url,
+                'status_code': respuesta.status_code,
+                'headers': dict(respuesta.headers),
+                'encoding': respuesta.encoding,
+                'etag': respuesta.headers.get('ETag'),
+                'last_modified': respuesta.headers.get('Last-Modified'),
+                'fecha': time.time(),
+            }
+        _guardar_meta(clave, meta)
+        return ruta_cuerpo, meta
+
+
+def get(
+    url: str,
+    params: Optional[Dict[str, str]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Union[float, Tuple[float, float], None] = None,
+    ttl: Optional[int] = None
+) -> requests.Response:
+    """
+    Equivalente a requests.get (misma interfaz de la respuesta: .text, .json(),
+    .content, .raise_for_status()) pero con la sesión compartida y la caché en disco.
+    """
+    ruta_cuerpo, meta = descargar(url, params, headers, timeout, ttl)
+
+    respuesta = requests.Response()
+    with open(ruta_cuerpo, 'rb') as f:
+        respuesta._content = f.read()
+    respuesta.status_code = meta['status_code']
+    respuesta.headers = CaseInsensitiveDict(meta['headers'])
+    respuesta.url = meta['url']
+    respuesta.encoding = meta['encoding']
+    return respuesta
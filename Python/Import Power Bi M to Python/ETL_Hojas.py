@@ -0,0 +1,132 @@
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+#                      SEGMENTACIÓN DE HOJAS CON VARIAS TABLAS
+# ==============================================================================
+# Las hojas de catálogos (NUEVO DESEMPEÑO en Google Sheets o en Excel) traen
+# varias tablas una debajo de otra, cada una con su fila de encabezado
+# ('CONCEPTO', 'REAL', 'META'...). En lugar de saltar un número fijo de filas o
+# de recorrer la hoja buscando el encabezado y limpiar todas las columnas con
+# .apply, aquí:
+# - las filas de encabezado se encuentran en una sola pasada de NumPy sobre las
+#   primeras columnas (cada valor distinto se normaliza una sola vez),
+# - cada tabla (bloque) es un corte por filas de la cuadrícula, sin copiarla,
+# - solo se limpian las columnas que el script va a usar.
+
+TEXTO_ENCABEZADO = 'CONCEPTO'
+
+# Textos que se tratan como celda vacía al limpiar
+TEXTOS_VACIOS = ['', 'nan', 'None', '<NA>']
+
+
+@dataclass
+class Bloque:
+    """Tabla de la hoja: fila de su encabezado, filas de datos [inicio, fin) y columnas con nombre."""
+    fila_encabezado: int
+    inicio: int
+    fin: int
+    datos: pd.DataFrame
+
+    @property
+    def columnas(self) -> List[str]:
+        return list(self.datos.columns)
+
+
+def _normalizar(valores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Códigos de cada celda y texto normalizado (sin espacios extremos, mayúsculas) de cada valor distinto."""
+    codigos, unicos = pd.factorize(valores.ravel(), use_na_sentinel=False)
+    textos = pd.Series(unicos, dtype=object).astype(str).str.strip().str.upper().to_numpy(dtype=object)
+    return codigos.reshape(valores.shape), textos
+
+
+def filas_encabezado(
+    cuadricula: pd.DataFrame,
+    texto: str = TEXTO_ENCABEZADO,
+    columnas_busqueda: int = 3
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Filas (posiciones) cuyo valor en alguna de las primeras 'columnas_busqueda' columnas
+    es 'texto' (sin distinguir mayúsculas ni espacios extremos), y la columna en que aparece.
+    """
+    ancho = min(columnas_busqueda, cuadricula.shape[1])
+    if ancho == 0 or cuadricula.empty:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    codigos, textos = _normalizar(cuadricula.iloc[:, :ancho].to_numpy(dtype=object))
+    coincide = (textos == texto.strip().upper())[codigos]  # (filas, ancho)
+    filas = np.flatnonzero(coincide.any(axis=1))
+    return filas, coincide[filas].argmax(axis=1)
+
+
+def _nombres_columnas(valores: np.ndarray) -> List[str]:
+    """Encabezados del bloque: texto sin espacios extremos; vacíos -> 'Unnamed_i'."""
+    nombres = []
+    for i, valor in enumerate(valores):
+        nombre = '' if pd.isna(valor) else str(valor).strip()
+        nombres.append(nombre if nombre else f'Unnamed_{i}')
+    return nombres
+
+
+def segmentar(
+    cuadricula: pd.DataFrame,
+    texto: str = TEXTO_ENCABEZADO,
+    columnas_busqueda: int = 3,
+    nombrar_columnas: bool = True
+) -> List[Bloque]:
+    """
+    Divide la hoja (sin encabezado, tal como se leyó) en un bloque por fila de encabezado.
+    Cada bloque va de la fila siguiente a su encabezado hasta el siguiente encabezado (o
+    el final de la hoja) y nombra sus columnas con su propio encabezado (o conserva las
+    de la cuadrícula con nombrar_columnas=False, para scripts que leen por posición).
+    Los datos son cortes de la cuadrícula (no se copian); las filas previas al primer
+    encabezado se omiten.
+    """
+    filas, _ = filas_encabezado(cuadricula, texto, columnas_busqueda)
+    limites = list(filas[1:]) + [len(cuadricula)]
+
+    bloques = []
+    for fila, fin in zip(filas, limites):
+        datos = cuadricula.iloc[fila + 1:fin]
+        if nombrar_columnas:
+            datos = datos.set_axis(_nombres_columnas(cuadricula.iloc[fila].to_numpy(dtype=object)), axis=1)
+        bloques.append(Bloque(int(fila), int(fila) + 1, int(fin), datos))
+    return bloques
+
+
+def limpiar_textos(df: pd.DataFrame, columnas: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Texto sin espacios extremos en las 'columnas' indicadas (todas por defecto), con los
+    nulos y sus representaciones ('nan', 'None', '<NA>') como ''. Cada valor distinto de
+    cada columna se convierte una sola vez.
+    """
+    df = df.copy()
+    for col in (df.columns if columnas is None else columnas):
+        codigos, unicos = pd.factorize(df[col], use_na_sentinel=False)
+        textos = pd.Series(unicos, dtype=object).astype(str).str.strip()
+        textos = textos.where(~textos.isin(TEXTOS_VACIOS) & textos.notna(), '')
+        df[col] = textos.to_numpy(dtype=object)[codigos]
+    return df
+
+
+def unir_bloques(
+    bloques: List[Bloque],
+    columnas: Optional[List[str]] = None,
+    limpiar: bool = False
+) -> pd.DataFrame:
+    """
+    Filas de datos de todos los bloques en una sola tabla. Con 'columnas' solo se toman
+    esas (las que existan en cada bloque, en ese orden) y solo esas se limpian.
+    """
+    partes = []
+    for bloque in bloques:
+        presentes = bloque.columnas if columnas is None else [col for col in columnas if col in bloque.columnas]
+        partes.append(bloque.datos[presentes])
+    if not partes:
+        return pd.DataFrame(columns=columnas or [])
+
+    df = pd.concat(partes, ignore_index=True)
+    return limpiar_textos(df) if limpiar else df
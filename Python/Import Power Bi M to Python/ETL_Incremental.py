@@ -0,0 +1,188 @@
+import glob
+import json
+import os
+import re
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+import ETL_Almacen
+
+# ==============================================================================
+#                      CONFIGURACIÓN DE LA CARGA INCREMENTAL
+# ==============================================================================
+# Modo opcional (apagado por defecto): SOLO ES UN ALMACÉN DE HISTÓRICO, NO AHORRA
+# EXTRACCIÓN. Se guarda por endpoint una marca de agua (la fecha más reciente
+# cargada) y un histórico local particionado por mes; en cada corrida la ventana
+# nueva (con unos días de traslape para las correcciones tardías) se integra
+# (upsert) al histórico.
+# La API no acepta un filtro por fecha: cada corrida descarga, aplana y
+# desdinamiza igual el histórico completo, y además se escriben las particiones
+# de la ventana y se releen todas, así que cuesta más E/S que la carga completa.
+# Las filas borradas en la API, o corregidas antes del traslape, se quedan en el
+# histórico local. Activar solo si se necesita conservar el histórico aunque la
+# API deje de devolverlo; retomar la ventana en la petición cuando la API
+# acepte un parámetro de fecha.
+
+RUTA_HISTORICO = os.environ.get('ETL_RUTA_HISTORICO', str(Path.home() / 'Downloads' / 'ETL_Historico'))
+
+# '1' activa el histórico incremental; por defecto cada corrida toma la respuesta completa
+CARGA_INCREMENTAL: bool = os.environ.get('ETL_CARGA_INCREMENTAL', '0') == '1'
+
+# Días que se vuelven a pedir antes de la marca de agua (correcciones tardías en la API)
+DIAS_TRASLAPE: int = int(os.environ.get('ETL_DIAS_TRASLAPE', '7'))
+
+PARTICION_SIN_FECHA = 'sin_fecha'
+
+
+# ==============================================================================
+#                      MARCAS DE AGUA
+# ==============================================================================
+
+def carpeta_endpoint(endpoint: str) -> str:
+    """Carpeta del histórico de un endpoint (una por endpoint, así no comparten archivos)."""
+    return os.path.join(RUTA_HISTORICO, re.sub(r'[^\w\-]', '_', endpoint))
+
+
+def _ruta_marca(endpoint: str) -> str:
+    return os.path.join(carpeta_endpoint(endpoint), 'marca_de_agua.json')
+
+
+def leer_marca_de_agua(endpoint: str) -> Optional[pd.Timestamp]:
+    """Fecha más reciente cargada del endpoint. None si nunca se ha cargado."""
+    try:
+        with open(_ruta_marca(endpoint), 'r', encoding='utf-8') as f:
+            return pd.Timestamp(json.load(f)['fecha_max'])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"⚠️ Advertencia: Marca de agua ilegible para '{endpoint}' ({e}). Se hará la carga completa.")
+        return None
+
+
+def guardar_marca_de_agua(endpoint: str, fecha_max: pd.Timestamp, filas: int) -> None:
+    ruta = _ruta_marca(endpoint)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    ruta_temporal = ruta + '.tmp'
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        json.dump({
+            'fecha_max': fecha_max.isoformat(),
+            'filas_historico': filas,
+            'actualizado': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }, f, indent=2)
+    os.replace(ruta_temporal, ruta)
+
+
+def fecha_desde(endpoint: str, dias_traslape: int = DIAS_TRASLAPE) -> Optional[pd.Timestamp]:
+    """
+    Inicio de la ventana que se integra al histórico: la marca de agua menos el traslape.
+    None significa carga completa (modo incremental apagado o histórico inexistente).
+    """
+    if not CARGA_INCREMENTAL:
+        return None
+    marca = leer_marca_de_agua(endpoint)
+    if marca is None or not _particiones(endpoint):
+        return None
+    return marca.normalize() - pd.Timedelta(days=dias_traslape)
+
+
+# ==============================================================================
+#                      HISTÓRICO PARTICIONADO (UPSERT)
+# ==============================================================================
+
+def _particiones(endpoint: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(carpeta_endpoint(endpoint), '*' + ETL_Almacen.extension())))
+
+
+def _ruta_particion(endpoint: str, particion: str) -> str:
+    return os.path.join(carpeta_endpoint(endpoint), particion + ETL_Almacen.extension())
+
+
+def _nombre_particion(fechas: pd.Series) -> pd.Series:
+    """Partición mensual (AAAA-MM) de cada fila; las fechas inválidas van a 'sin_fecha'."""
+    return fechas.dt.strftime('%Y-%m').fillna(PARTICION_SIN_FECHA)
+
+
+def _unificar_categorias(df: pd.DataFrame, referencia: pd.DataFrame) -> pd.DataFrame:
+    """Al concatenar categóricas con categorías distintas pandas las vuelve 'object'."""
+    categoricas = [col for col in referencia.columns if isinstance(referencia[col].dtype, pd.CategoricalDtype)]
+    return df.astype({col: 'category' for col in categoricas}) if categoricas else df
+
+
+def reiniciar_historico(endpoint: str) -> None:
+    """Borra el histórico y la marca de agua del endpoint (la siguiente carga será completa)."""
+    shutil.rmtree(carpeta_endpoint(endpoint), ignore_errors=True)
+
+
+def upsert_historico(endpoint: str, df_nuevos: pd.DataFrame, claves: List[str], columna_fecha: str) -> int:
+    """
+    Inserta las filas nuevas en el histórico. Las filas del histórico con las mismas
+    claves se reemplazan completas. Solo se reescriben las particiones (meses) afectadas.
+    Devuelve el número de particiones escritas.
+    """
+    fechas = pd.to_datetime(df_nuevos[columna_fecha], errors='coerce')
+    escritas = 0
+
+    for particion, df_particion in df_nuevos.groupby(_nombre_particion(fechas), sort=True):
+        ruta = _ruta_particion(endpoint, particion)
+        if os.path.exists(ruta):
+            df_anterior = ETL_Almacen.leer_archivo(ruta)
+            reemplazadas = pd.MultiIndex.from_frame(df_anterior[claves]).isin(
+                pd.MultiIndex.from_frame(df_particion[claves])
+            )
+            df_particion = pd.concat([df_anterior[~reemplazadas], df_particion], ignore_index=True)
+            df_particion = _unificar_categorias(df_particion, df_nuevos)
+
+        ETL_Almacen.escribir_archivo(df_particion.reset_index(drop=True), ruta)
+        escritas += 1
+
+    return escritas
+
+
+def leer_historico(endpoint: str, columnas: Optional[List[str]] = None) -> pd.DataFrame:
+    """Histórico completo del endpoint (todas las particiones)."""
+    partes = [ETL_Almacen.leer_archivo(ruta, columnas) for ruta in _particiones(endpoint)]
+    if not partes:
+        return pd.DataFrame()
+    return _unificar_categorias(pd.concat(partes, ignore_index=True), partes[-1])
+
+
+def cargar_incremental(
+    endpoint: str,
+    df_nuevos: pd.DataFrame,
+    claves: List[str],
+    columna_fecha: str,
+    desde: Optional[pd.Timestamp]
+) -> pd.DataFrame:
+    """
+    Integra lo que devolvió la API al histórico local y devuelve el histórico completo.
+    - desde=None (carga completa): el histórico se reconstruye con lo recibido.
+    - desde=fecha: de la respuesta completa de la API solo se toman las filas de
+      la ventana (y las sin fecha, que van a la partición 'sin_fecha') y se hace
+      upsert por 'claves'.
+    """
+    fechas = pd.to_datetime(df_nuevos[columna_fecha], errors='coerce')
+    if desde is None:
+        reiniciar_historico(endpoint)
+    else:
+        en_ventana = (fechas >= desde) | fechas.isna()
+        df_nuevos, fechas = df_nuevos[en_ventana], fechas[en_ventana]
+
+    particiones = upsert_historico(endpoint, df_nuevos, claves, columna_fecha) if not df_nuevos.empty else 0
+    df_historico = leer_historico(endpoint)
+    if df_historico.empty:
+        return df_historico
+
+    # La marca de agua nunca retrocede (la ventana puede venir vacía)
+    candidatas = [fechas.max(), leer_marca_de_agua(endpoint) if desde is not None else None]
+    candidatas = [fecha for fecha in candidatas if fecha is not None and not pd.isna(fecha)]
+    if candidatas:
+        guardar_marca_de_agua(endpoint, max(candidatas), len(df_historico))
+
+    modo = "completa" if desde is None else f"incremental desde {desde:%Y-%m-%d}"
+    print(f"✔️ Carga {modo} de '{endpoint}': {len(df_nuevos)} filas nuevas/actualizadas "
+          f"en {particiones} particiones. Histórico: {len(df_historico)} filas.")
+    return df_historico
@@ -0,0 +1,185 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+import ETL_Metricas
+
+# ==============================================================================
+#                      BÚSQUEDAS EN CATÁLOGOS CON CLAVES ENTERAS
+# ==============================================================================
+# Los "Consultas combinadas" de M contra catálogos (ConceptosMaquinas,
+# DiasFestivos, Ext_DiasLaborados...) solo traen una columna o filtran filas.
+# En lugar de un pd.merge por catálogo (cada uno copia la tabla completa), las
+# claves de la tabla de hechos (planta, Concepto, Fecha...) se codifican una
+# sola vez como enteros (diccionario valor -> código) y cada catálogo se
+# resuelve como un arreglo de posiciones: -1 = sin coincidencia.
+# resolver_estrella aplica lo mismo a las tablas de hechos del modelo: todas
+# sus claves sustitutas (Key_*) se resuelven en una pasada.
+
+
+def normalizar_texto(serie: pd.Series) -> pd.Series:
+    """
+    Igual que serie.astype(str).str.upper().str.strip(), pero aplicado una sola vez
+    por valor distinto (los nulos quedan como 'NAN', como con astype(str)).
+    Las columnas categóricas siguen siendo categóricas.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    normalizados = pd.Series(unicos, dtype=object).astype(str).str.upper().str.strip()
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Se conserva categórica (categorías ordenadas): dos categorías pueden coincidir ya normalizadas
+        codigos_normalizados, categorias = pd.factorize(normalizados, sort=True)
+        return pd.Series(
+            pd.Categorical.from_codes(codigos_normalizados[codigos], categories=categorias), index=serie.index
+        )
+    return normalizados.take(codigos).set_axis(serie.index)
+
+
+class DiccionarioClaves:
+    """Diccionarios de claves de la tabla de hechos: dimensión -> valores distintos (código = posición)."""
+
+    def __init__(self):
+        self.valores: Dict[str, pd.Index] = {}
+
+    def agregar(self, dimension: str, *series: pd.Series) -> None:
+        """Registra los valores distintos de una o varias columnas (que comparten diccionario)."""
+        self.valores[dimension] = pd.Index(pd.unique(pd.concat(series, ignore_index=True)))
+
+    def codificar_columna(self, dimension: str, serie: pd.Series) -> np.ndarray:
+        """
+        Registra los valores distintos de la columna como diccionario de 'dimension' y
+        devuelve el código de cada fila. Las categóricas usan sus propias categorías y
+        códigos (las filas no se vuelven a hashear). El nulo cuenta como un valor más.
+        """
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            categorias = pd.Index(serie.cat.categories, dtype=object)
+            codigos = serie.cat.codes.to_numpy(dtype=np.int64)
+            if (codigos < 0).any():
+                codigos = np.where(codigos < 0, len(categorias), codigos)
+                categorias = categorias.append(pd.Index([np.nan], dtype=object))
+            self.valores[dimension] = categorias
+            return codigos
+        codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+        self.valores[dimension] = pd.Index(unicos)
+        return codigos.astype(np.int64)
+
+    def codificar(self, dimension: str, valores: pd.Series) -> np.ndarray:
+        """Código entero de cada valor; -1 si el valor no existe en el diccionario."""
+        return self.valores[dimension].get_indexer(valores)
+
+    def clave_compuesta(self, codigos: Dict[str, np.ndarray]) -> np.ndarray:
+        """Un solo entero por fila a partir de los códigos de varias dimensiones (-1 si falta alguno)."""
+        dimensiones = list(codigos)
+        tamanos = tuple(max(len(self.valores[dimension]), 1) for dimension in dimensiones)
+        validos = np.logical_and.reduce([codigos[dimension] >= 0 for dimension in dimensiones])
+        compuesta = np.full(len(validos), -1, dtype=np.int64)
+        compuesta[validos] = np.ravel_multi_index([codigos[dimension][validos] for dimension in dimensiones], tamanos)
+        return compuesta
+
+
+# Filas del paso 'union' de resolver (ETL_Metricas): filas de hechos y filas con coincidencia
+def _filas_hechos(diccionario: 'DiccionarioClaves', codigos_hechos: Dict[str, np.ndarray], *args, **kwargs) -> int:
+    return len(next(iter(codigos_hechos.values())))
+
+
+def _coincidencias(posiciones: np.ndarray) -> int:
+    return int((posiciones >= 0).sum())
+
+
+@ETL_Metricas.medido('union', filas_entrada=_filas_hechos, filas_salida=_coincidencias)
+def resolver(
+    diccionario: DiccionarioClaves,
+    codigos_hechos: Dict[str, np.ndarray],
+    catalogo: pd.DataFrame,
+    columnas_catalogo: Dict[str, str]
+) -> np.ndarray:
+    """
+    Posición en 'catalogo' de la fila que coincide con cada fila de hechos (-1 = sin
+    coincidencia). 'codigos_hechos' y 'columnas_catalogo' van por dimensión
+    (ej. {'planta': ..., 'concepto': ...} y {'planta': 'PLANTA', 'concepto': 'CONCEPTO'}).
+    Si el catálogo repite una clave, se toma su primera fila.
+    """
+    if catalogo is None or catalogo.empty:
+        return np.full(len(next(iter(codigos_hechos.values()))), -1, dtype=np.int64)
+
+    codigos_catalogo = {
+        dimension: diccionario.codificar(dimension, catalogo[columnas_catalogo[dimension]])
+        for dimension in codigos_hechos
+    }
+    clave_catalogo = diccionario.clave_compuesta(codigos_catalogo)
+    clave_hechos = diccionario.clave_compuesta(codigos_hechos)
+
+    # Solo las filas del catálogo cuya clave existe en los hechos (primera ocurrencia)
+    claves_unicas, primera_fila = np.unique(clave_catalogo, return_index=True)
+    con_clave = claves_unicas >= 0
+    claves_unicas, primera_fila = claves_unicas[con_clave], primera_fila[con_clave]
+    if not len(claves_unicas):
+        return np.full(len(clave_hechos), -1, dtype=np.int64)
+
+    # Las claves -1 de los hechos (valor sin código) nunca coinciden: el catálogo solo tiene claves >= 0
+    posiciones = pd.Index(claves_unicas).get_indexer(clave_hechos)
+    return np.where(posiciones >= 0, primera_fila[posiciones], -1)
+
+
+def tomar(serie: pd.Series, posiciones: np.ndarray, relleno: Any = np.nan) -> pd.Series:
+    """Valores de 'serie' en las posiciones resueltas; 'relleno' donde no hubo coincidencia."""
+    encontrados = posiciones >= 0
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        # Numéricas (incluidas Int32/Int64 con nulos) -> float64, los faltantes como NaN
+        origen = serie.to_numpy(dtype='float64', na_value=np.nan)
+        valores = np.full(len(posiciones), relleno, dtype='float64')
+    else:
+        origen = serie.to_numpy(dtype=object)
+        valores = np.full(len(posiciones), relleno, dtype=object)
+    if encontrados.any():
+        valores[encontrados] = origen[posiciones[encontrados]]
+    return pd.Series(valores).infer_objects()
+
+
+# ==============================================================================
+#                      CLAVES SUSTITUTAS DE UNA TABLA DE HECHOS (ESTRELLA)
+# ==============================================================================
+
+@dataclass
+class EspecDimension:
+    """Una dimensión de la estrella: de qué columnas de hechos sale su clave natural y qué clave se trae."""
+    nombre: str                  # Nombre de la dimensión (para el reporte de claves sin coincidencia)
+    tabla: pd.DataFrame          # Tabla de la dimensión
+    columnas: Dict[str, str]     # Columna de hechos -> columna de la dimensión (clave natural)
+    columna_clave: str           # Clave sustituta que se agrega a los hechos (ej. 'Key_Cliente')
+
+
+@ETL_Metricas.medido('union')
+def resolver_estrella(
+    df_hechos: pd.DataFrame,
+    dimensiones: List[EspecDimension]
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Equivale a un LEFT JOIN por dimensión que solo trae su clave sustituta, pero sin
+    copiar la tabla de hechos en cada join: cada columna de hechos se codifica una
+    sola vez (aunque la usen varias dimensiones) y cada dimensión se resuelve con un
+    índice hash sobre la clave entera. Las claves quedan como Int32 (nulas si no
+    hubo coincidencia; si la dimensión repite una clave natural, se toma su primera fila).
+    Devuelve los hechos con las columnas de clave y las filas sin coincidencia por dimensión.
+    """
+    diccionario = DiccionarioClaves()
+    codigos: Dict[str, np.ndarray] = {}
+    for espec in dimensiones:
+        for col in espec.columnas:
+            if col not in codigos:
+                codigos[col] = diccionario.codificar_columna(col, df_hechos[col])
+
+    df_hechos = df_hechos.copy()
+    sin_coincidencia: Dict[str, int] = {}
+    for espec in dimensiones:
+        posiciones = resolver(
+            diccionario, {col: codigos[col] for col in espec.columnas}, espec.tabla, espec.columnas
+        )
+        df_hechos[espec.columna_clave] = tomar(espec.tabla[espec.columna_clave], posiciones).astype('Int32').array
+        sin_coincidencia[espec.nombre] = int((posiciones < 0).sum())
+
+    for nombre, filas in sin_coincidencia.items():
+        if filas:
+            print(f"⚠️ Advertencia: {filas} de {len(df_hechos)} filas sin coincidencia en {nombre} (clave nula).")
+    return df_hechos, sin_coincidencia
@@ -0,0 +1,346 @@
+import io
+import json
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import ETL_Almacen
+import ETL_HTTP
+import ETL_Incremental
+
+# ijson es opcional (pip install ijson): recorre la respuesta de la API por eventos.
+# Sin él, los registros se decodifican uno a uno con json.JSONDecoder.raw_decode
+# sobre bloques del archivo; en ambos casos la respuesta no se carga completa.
+try:
+    import ijson
+    IJSON_DISPONIBLE = True
+except ImportError:
+    IJSON_DISPONIBLE = False
+
+# ==============================================================================
+#                      EXTRACCIÓN CRUDA COMPARTIDA DE LA API DE KPIs
+# ==============================================================================
+# Ext_data (reportes *360) y Ext_DiasLaborados (columnas DIAS_*) leen la misma
+# respuesta de apiController.php?op=api. Se recorre una sola vez por lotes de
+# registros y cada lote se desdinamiza en cuanto se aplana: la tabla cruda
+# (KPI_Crudo) ya viene en formato largo (date, planta, SEGMENTO, Campo, Valor),
+# con una fila por valor numérico, y cada script toma de ella solo los campos
+# que necesita. Así la memoria crece con los valores recibidos, no con
+# registros x campos (la tabla ancha con todas las columnas ya no se arma).
+
+API_URL = "https://kpis.grupo-ortiz.site/Controllers/apiController.php?op=api"
+HEADERS = {'Accept': 'application/json'}
+
+NOMBRE_TABLA = 'KPI_Crudo'
+
+# Cambiar si cambia la forma de la tabla cruda (invalida la guardada en el almacén)
+VERSION_TABLA = 2
+
+# Columnas de identificación de cada registro (en la raíz o bajo 'GENERAL')
+COLUMNAS_ID = ['date', 'planta', 'SEGMENTO']
+
+# Históricos incrementales que se alimentan de esta extracción (ver ETL_Incremental)
+ENDPOINTS_CONSUMIDORES = ['Ext_Datos', 'Ext_DiasLaborados']
+
+# Registros por lote al desdinamizar la respuesta
+TAMANO_LOTE_REGISTROS = 5000
+
+# Caracteres que se leen del archivo por vez sin ijson
+TAMANO_BLOQUE_LECTURA = 1 << 20
+
+
+def _ruta_meta() -> str:
+    return os.path.join(ETL_Almacen.RUTA_ALMACEN, NOMBRE_TABLA + '.json')
+
+
+# ==============================================================================
+#                      LECTURA DE LA RESPUESTA
+# ==============================================================================
+
+def iterar_registros_json(flujo) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre con ijson los registros de la primera lista no vacía del objeto raíz,
+    sin cargar la respuesta completa en memoria.
+    """
+    prefijo_items = None
+    constructor = None
+    hubo_registros = False
+
+    for prefijo, evento, valor in ijson.parse(flujo, use_float=True):
+        if prefijo_items is None:
+            # Lista directamente bajo el objeto raíz (ej. {"data": [...]})
+            if evento == 'start_array' and prefijo and '.' not in prefijo:
+                prefijo_items = f"{prefijo}.item"
+            continue
+
+        if constructor is None:
+            if prefijo == prefijo_items and evento == 'start_map':
+                constructor = ijson.ObjectBuilder()
+                constructor.event(evento, valor)
+            elif evento == 'end_array' and prefijo + '.item' == prefijo_items:
+                if hubo_registros:
+                    return
+                prefijo_items = None  # Lista vacía: se busca la siguiente
+            continue
+
+        constructor.event(evento, valor)
+        if prefijo == prefijo_items and evento == 'end_map':
+            hubo_registros = True
+            yield constructor.value
+            constructor = None
+
+
+class _LectorJSON:
+    """Texto JSON leído por bloques: decodifica un valor a la vez desde la posición actual."""
+
+    def __init__(self, flujo):
+        self._flujo = io.TextIOWrapper(flujo, encoding='utf-8-sig')
+        self._decodificador = json.JSONDecoder()
+        self._texto = ''
+        self._pos = 0
+        self._fin = False
+
+    def _leer_bloque(self) -> None:
+        bloque = self._flujo.read(TAMANO_BLOQUE_LECTURA)
+        if not bloque:
+            self._fin = True
+        # Se descarta lo ya consumido para que el texto en memoria no crezca
+        self._texto = self._texto[self._pos:] + bloque
+        self._pos = 0
+
+    def siguiente(self) -> str:
+        """Siguiente carácter no vacío (sin consumirlo); '' al final del archivo."""
+        while True:
+            while self._pos < len(self._texto) and self._texto[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._texto) or self._fin:
+                return self._texto[self._pos:self._pos + 1]
+            self._leer_bloque()
+
+    def consumir(self) -> None:
+        self._pos += 1
+
+    def valor(self) -> Any:
+        """Decodifica el valor completo que empieza en la posición actual."""
+        self.siguiente()
+        while True:
+            try:
+                valor, fin = self._decodificador.raw_decode(self._texto, self._pos)
+            except json.JSONDecodeError:
+                if self._fin:
+                    raise
+                self._leer_bloque()
+                continue
+            # Un número al final del bloque puede seguir en el siguiente
+            if fin == len(self._texto) and not self._fin:
+                self._leer_bloque()
+                continue
+            self._pos = fin
+            return valor
+
+
+def iterar_registros_texto(flujo) -> Iterator[Dict[str, Any]]:
+    """
+    Sin ijson: registros de la primera lista no vacía del objeto raíz, decodificados
+    uno a uno sobre bloques del archivo (como ijson, sin cargar la respuesta completa).
+    """
+    lector = _LectorJSON(flujo)
+    if lector.siguiente() != '{':
+        print("Fallo: La respuesta JSON no es un diccionario (Record) como se esperaba.")
+        return
+    lector.consumir()
+
+    while True:
+        caracter = lector.siguiente()
+        if caracter in ('}', ''):
+            return
+        if caracter == ',':
+            lector.consumir()
+            continue
+        lector.valor()  # Clave
+        if lector.siguiente() != ':':
+            raise ValueError("Respuesta JSON mal formada: se esperaba ':' después de la clave.")
+        lector.consumir()
+
+        if lector.siguiente() != '[':
+            lector.valor()  # Valor que no es lista: se salta
+            continue
+        lector.consumir()
+        hubo_registros = False
+        while True:
+            caracter = lector.siguiente()
+            if caracter == ']':
+                lector.consumir()
+                break
+            if caracter == ',':
+                lector.consumir()
+                continue
+            if caracter == '':
+                raise ValueError("Respuesta JSON incompleta: la lista de registros no termina.")
+            hubo_registros = True
+            yield lector.valor()
+        if hubo_registros:
+            return
+
+
+def iterar_registros(ruta_respuesta: str) -> Iterator[Dict[str, Any]]:
+    """Registros de la respuesta guardada en disco, leída en streaming."""
+    with open(ruta_respuesta, 'rb') as flujo:
+        if IJSON_DISPONIBLE:
+            yield from iterar_registros_json(flujo)
+        else:
+            yield from iterar_registros_texto(flujo)
+
+
+def aplanar(valor: Dict[str, Any], prefijo: str = '') -> Iterator[Tuple[str, Any]]:
+    """Pares (columna, valor) de un registro anidado, con los mismos nombres que json_normalize(sep='.')."""
+    for clave, contenido in valor.items():
+        nombre = f"{prefijo}{clave}"
+        if isinstance(contenido, dict):
+            yield from aplanar(contenido, nombre + '.')
+        else:
+            yield nombre, contenido
+
+
+# ==============================================================================
+#                      DESDINAMIZACIÓN POR LOTES
+# ==============================================================================
+
+def nombre_id(campo: str) -> Optional[str]:
+    """Columna de identificación de un campo aplanado ('GENERAL.date' -> 'date'); None si es un valor."""
+    nombre = campo[len('GENERAL.'):] if campo.startswith('GENERAL.') else campo
+    return nombre if nombre in COLUMNAS_ID else None
+
+
+def desdinamizar_lote(filas: List[Dict[str, Any]], codigos_campos: Dict[str, int]) -> pd.DataFrame:
+    """
+    Lote de registros aplanados -> una fila por valor numérico no nulo:
+    (date, planta, SEGMENTO, código del campo, Valor), en el orden de melt (por campo).
+    Los campos nuevos se agregan a 'codigos_campos' (nombre -> código).
+    """
+    df = pd.DataFrame.from_records(filas)
+    ids: Dict[str, str] = {}
+    campos_valor: List[str] = []
+    for campo in df.columns:
+        nombre = nombre_id(campo)
+        if nombre is None:
+            campos_valor.append(campo)
+        else:
+            ids.setdefault(nombre, campo)
+
+    # Los consumidores convierten los valores a número: el texto no numérico no se guarda
+    valores = df[campos_valor].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float).T
+    pos_campo, pos_fila = np.nonzero(~np.isnan(valores))
+
+    codigos = np.array([codigos_campos.setdefault(campo, len(codigos_campos)) for campo in campos_valor], dtype=np.int32)
+    lote = pd.DataFrame({
+        nombre: df[ids[nombre]].to_numpy(dtype=object)[pos_fila] if nombre in ids else np.full(len(pos_fila), None)
+        for nombre in COLUMNAS_ID
+    })
+    lote['Campo'] = codigos[pos_campo] if len(codigos) else np.empty(0, dtype=np.int32)
+    lote['Valor'] = valores[pos_campo, pos_fila]
+    return lote
+
+
+def construir_tabla_cruda(registros: Iterator[Dict[str, Any]], tamano_lote: int = TAMANO_LOTE_REGISTROS) -> pd.DataFrame:
+    """
+    Tabla cruda en formato largo: (date, planta, SEGMENTO, Campo, Valor). Cada lote de
+    registros se aplana y se desdinamiza antes de leer el siguiente. 'Campo' es el nombre
+    aplanado (ej. 'VENTAS 360.Toneladas', 'GENERAL.DIAS_HABILES') como categórica.
+    """
+    lotes: List[pd.DataFrame] = []
+    codigos_campos: Dict[str, int] = {}
+    filas: List[Dict[str, Any]] = []
+    for registro in registros:
+        if not isinstance(registro, dict):
+            continue
+        filas.append(dict(aplanar(registro)))
+        if len(filas) >= tamano_lote:
+            lotes.append(desdinamizar_lote(filas, codigos_campos))
+            filas = []
+    if filas:
+        lotes.append(desdinamizar_lote(filas, codigos_campos))
+
+    if not lotes:
+        return pd.DataFrame()
+    df = pd.concat(lotes, ignore_index=True)
+    df['Campo'] = pd.Categorical.from_codes(df['Campo'].to_numpy(), categories=list(codigos_campos))
+    return df.astype({col: 'category' for col in COLUMNAS_ID})
+
+
+def proyectar_campos(df: pd.DataFrame, filtro_campos: Callable[[str], bool]) -> pd.DataFrame:
+    """Filas de la tabla cruda cuyos campos cumplen 'filtro_campos'."""
+    campos = [campo for campo in df['Campo'].cat.categories if filtro_campos(campo)]
+    df = df[df['Campo'].isin(campos)].reset_index(drop=True)
+    return df.assign(Campo=df['Campo'].cat.set_categories(campos))
+
+
+# ==============================================================================
+#                      TABLA CRUDA COMPARTIDA
+# ==============================================================================
+
+def ventana_comun() -> Optional[pd.Timestamp]:
+    """
+    Ventana que integran al histórico todos los consumidores: la más antigua de sus ventanas.
+    Basta con que uno necesite la carga completa (None) para reconstruir desde la respuesta completa.
+    """
+    ventanas = [ETL_Incremental.fecha_desde(endpoint) for endpoint in ENDPOINTS_CONSUMIDORES]
+    if any(desde is None for desde in ventanas):
+        return None
+    return min(ventanas)
+
+
+def _leer_meta() -> Optional[Dict[str, Any]]:
+    try:
+        with open(_ruta_meta(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _guardar_meta(meta: Dict[str, Any]) -> None:
+    ruta = _ruta_meta()
+    ruta_temporal = ruta + '.tmp'
+    with open(ruta_temporal, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    os.replace(ruta_temporal, ruta)
+
+
+def obtener_tabla_cruda(filtro_campos: Callable[[str], bool]) -> Tuple[pd.DataFrame, Optional[pd.Timestamp]]:
+    """
+    Filas de la tabla cruda (formato largo) cuyos campos cumplen 'filtro_campos', y la
+    ventana (desde) que se integra a los históricos. La respuesta se descarga y se
+    desdinamiza una sola vez por corrida: si la tabla cruda ya corresponde a la misma
+    respuesta, solo se lee del almacén.
+    Lanza requests.exceptions.RequestException si la API falla.
+    """
+    desde = ventana_comun()
+    if desde is not None:
+        print(f"Carga incremental: se integran al histórico los datos desde {desde:%Y-%m-%d}.")
+
+    # La API no filtra por fecha: se pide siempre la misma URL (y la misma clave de caché)
+    ruta_respuesta, _ = ETL_HTTP.descargar(API_URL, headers=HEADERS)
+    # Identidad de la respuesta: cambia solo cuando se descarga un cuerpo nuevo
+    origen = f"{ETL_HTTP.clave_peticion(API_URL, headers=HEADERS)}|{os.path.getmtime(ruta_respuesta)}|{os.path.getsize(ruta_respuesta)}"
+
+    with ETL_HTTP.bloqueo(NOMBRE_TABLA):
+        meta = _leer_meta()
+        if (meta is not None and meta.get('version') == VERSION_TABLA and meta.get('origen') == origen
+                and os.path.exists(ETL_Almacen.ruta_tabla(NOMBRE_TABLA))):
+            df_crudo = proyectar_campos(ETL_Almacen.leer_tabla(NOMBRE_TABLA), filtro_campos)
+            print(f"   ↺ Tabla cruda de KPIs reutilizada ({df_crudo['Campo'].nunique()} de {len(meta['campos'])} campos).")
+            return df_crudo, desde
+
+        df_crudo = construir_tabla_cruda(iterar_registros(ruta_respuesta))
+        if df_crudo.empty:
+            print("Fallo: No se encontró la lista de registros anidada o está vacía.")
+            return df_crudo, desde
+
+        df_crudo = ETL_Almacen.guardar_tabla(NOMBRE_TABLA, df_crudo)
+        campos = list(df_crudo['Campo'].cat.categories)
+        _guardar_meta({'version': VERSION_TABLA, 'origen': origen, 'campos': campos, 'filas': len(df_crudo)})
+        print(f"✔️ Respuesta de la API desdinamizada a la tabla cruda: {len(df_crudo)} valores de {len(campos)} campos.")
+
+    return proyectar_campos(df_crudo, filtro_campos), desde
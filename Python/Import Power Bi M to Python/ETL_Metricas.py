@@ -0,0 +1,366 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# resource (Linux/macOS) da el máximo de memoria y el CPU de los subprocesos; no existe en Windows
+try:
+    import resource
+    RESOURCE_DISPONIBLE = True
+except ImportError:
+    RESOURCE_DISPONIBLE = False
+
+# psutil es opcional (pip install psutil): permite muestrear la memoria residente
+# durante cada etapa; sin él solo queda el máximo del proceso (ver abajo)
+try:
+    import psutil
+    PSUTIL_DISPONIBLE = True
+except ImportError:
+    PSUTIL_DISPONIBLE = False
+
+# ==============================================================================
+#                      MÉTRICAS DE EJECUCIÓN POR ETAPA Y POR PASO
+# ==============================================================================
+# El log del orquestador solo tenía la hora de inicio y fin de cada script y las
+# filas como texto libre ("Filas resultantes"). Aquí cada etapa se mide (tiempo
+# de reloj, tiempo de CPU, pico de memoria, filas de entrada y salida, bytes
+# leídos y escritos) junto con sus pasos (extracción, uniones, pivote, almacén,
+# exportación), y el orquestador agrega un registro JSON por etapa a un log de
+# corridas (una línea por registro) para comparar las corridas entre sí.
+# Los bytes son los de los archivos y descargas que pasan por los helpers
+# (almacén, Excel, HTTP, exportaciones), no la E/S total del sistema operativo.
+# Memoria:
+# - memoria_pico_mb: pico de memoria residente DURANTE la etapa o el paso (con
+#   hijos=True, la suma de sus subprocesos). Un hilo la muestrea cada
+#   INTERVALO_MEMORIA segundos mientras dura el bloque; requiere psutil (None sin él).
+#   Un pico (o un subproceso) más corto que el intervalo puede no quedar registrado.
+# - memoria_maxima_proceso_mb: máximo del proceso desde que inició (ru_maxrss, o
+#   peak_wset en Windows). No se reinicia por etapa: en el proceso principal
+#   arrastra el de las etapas anteriores y sirve para el total de la corrida.
+
+ARCHIVO_METRICAS = 'metricas_etl.jsonl'
+
+# Una etapa "regresa" si tarda más que este factor sobre la mediana de sus corridas previas
+UMBRAL_REGRESION = 1.25
+CORRIDAS_PREVIAS = 5
+
+# Segundos entre lecturas de la memoria residente durante una medición
+INTERVALO_MEMORIA = 0.1
+
+# Bytes que pasaron por los helpers en este proceso (los hilos de descarga también suman)
+_BYTES = {'leidos': 0, 'escritos': 0}
+_CANDADO_BYTES = threading.Lock()
+
+# Pasos medidos en este proceso desde la última llamada a tomar_pasos()
+_PASOS: List['Medicion'] = []
+
+
+def sumar_bytes(leidos: int = 0, escritos: int = 0) -> None:
+    """Acumula bytes leídos/escritos (los helpers de E/S lo llaman con el tamaño del archivo)."""
+    with _CANDADO_BYTES:
+        _BYTES['leidos'] += int(leidos)
+        _BYTES['escritos'] += int(escritos)
+
+
+def sumar_bytes_archivo(ruta: str, leido: bool = True) -> None:
+    """Suma el tamaño del archivo como leído o escrito (si no existe, no suma nada)."""
+    try:
+        tamano = os.path.getsize(ruta)
+    except OSError:
+        return
+    if leido:
+        sumar_bytes(leidos=tamano)
+    else:
+        sumar_bytes(escritos=tamano)
+
+
+def memoria_residente_mb(hijos: bool = False) -> Optional[float]:
+    """
+    Memoria residente actual (MB) del proceso, o la suma de sus subprocesos vivos con
+    hijos=True. None sin psutil.
+    """
+    if not PSUTIL_DISPONIBLE:
+        return None
+    proceso = psutil.Process()
+    total = 0
+    for actual in (proceso.children(recursive=True) if hijos else [proceso]):
+        try:
+            total += actual.memory_info().rss
+        except psutil.Error:
+            pass  # El subproceso terminó entre la lista y la lectura
+    return total / 1024 ** 2
+
+
+def memoria_maxima_proceso_mb(hijos: bool = False) -> Optional[float]:
+    """
+    Máximo de memoria residente (MB) del proceso desde que inició, o del mayor de sus
+    subprocesos ya terminados con hijos=True. No es el pico de una etapa: no se reinicia.
+    None si la plataforma no lo expone.
+    """
+    if RESOURCE_DISPONIBLE:
+        pico = resource.getrusage(resource.RUSAGE_CHILDREN if hijos else resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss: KB en Linux, bytes en macOS
+        return round(pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024, 1)
+    if PSUTIL_DISPONIBLE and not hijos:
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / 1024 ** 2, 1)
+    return None
+
+
+def _cpu(hijos: bool) -> Optional[float]:
+    """Segundos de CPU (usuario + sistema) del proceso o de sus subprocesos terminados."""
+    if not hijos:
+        return time.process_time()
+    if RESOURCE_DISPONIBLE:
+        uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return uso.ru_utime + uso.ru_stime
+    return None
+
+
+# ==============================================================================
+#                      MEDICIÓN
+# ==============================================================================
+
+class _MuestreoMemoria:
+    """Pico de memoria residente de un bloque: un hilo la lee cada INTERVALO_MEMORIA segundos."""
+
+    def __init__(self, hijos: bool):
+        self.hijos = hijos
+        self.pico = 0.0
+        self._tomar()
+        self._fin = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, name='ETL_Metricas.memoria', daemon=True)
+        self._hilo.start()
+
+    def _tomar(self) -> None:
+        actual = memoria_residente_mb(self.hijos)
+        if actual is not None:
+            self.pico = max(self.pico, actual)
+
+    def _muestrear(self) -> None:
+        while not self._fin.wait(INTERVALO_MEMORIA):
+            self._tomar()
+
+    def detener(self) -> Optional[float]:
+        """Pico del bloque; None si ninguna lectura vio memoria (ej. un subproceso más corto que el intervalo)."""
+        self._fin.set()
+        self._hilo.join()
+        self._tomar()
+        return round(self.pico, 1) if self.pico > 0 else None
+
+
+class Medicion:
+    """
+    Mide un bloque de código como contexto ('with'): reloj, CPU, bytes y memoria.
+    Las filas se indican al crearla (entrada) y al terminar el bloque (medicion.filas_salida).
+    Con hijos=True el CPU y la memoria son los de los subprocesos que terminen dentro del bloque.
+    """
+
+    def __init__(self, nombre: str, filas_entrada: Optional[int] = None, hijos: bool = False):
+        self.nombre = nombre
+        self.filas_entrada = filas_entrada
+        self.filas_salida: Optional[int] = None
+        self.hijos = hijos
+        self.segundos: Optional[float] = None
+        self.cpu_segundos: Optional[float] = None
+        self.bytes_leidos = 0
+        self.bytes_escritos = 0
+        self.memoria_pico_mb: Optional[float] = None
+        self.memoria_maxima_proceso_mb: Optional[float] = None
+
+    def __enter__(self) -> 'Medicion':
+        self._muestreo = _MuestreoMemoria(self.hijos) if PSUTIL_DISPONIBLE else None
+        self._reloj = time.perf_counter()
+        self._cpu = _cpu(self.hijos)
+        self._bytes = dict(_BYTES)
+        return self
+
+    def __exit__(self, *excepcion) -> bool:
+        self.segundos = round(time.perf_counter() - self._reloj, 4)
+        cpu = _cpu(self.hijos)
+        self.cpu_segundos = round(cpu - self._cpu, 4) if cpu is not None and self._cpu is not None else None
+        self.bytes_leidos = _BYTES['leidos'] - self._bytes['leidos']
+        self.bytes_escritos = _BYTES['escritos'] - self._bytes['escritos']
+        self.memoria_pico_mb = self._muestreo.detener() if self._muestreo is not None else None
+        self.memoria_maxima_proceso_mb = memoria_maxima_proceso_mb(self.hijos)
+        return False
+
+    def como_registro(self) -> Dict[str, Any]:
+        return {
+            'segundos': self.segundos,
+            'cpu_segundos': self.cpu_segundos,
+            'memoria_pico_mb': self.memoria_pico_mb,
+            'memoria_maxima_proceso_mb': self.memoria_maxima_proceso_mb,
+            'filas_entrada': self.filas_entrada,
+            'filas_salida': self.filas_salida,
+            'bytes_leidos': self.bytes_leidos,
+            'bytes_escritos': self.bytes_escritos,
+        }
+
+
+def registrar_paso(medicion: Medicion) -> Medicion:
+    """
+    Agrega la medición a los pasos de la etapa en curso. Los pasos quedan en el orden
+    en que empiezan (un paso dentro de otro va después de él).
+    """
+    _PASOS.append(medicion)
+    return medicion
+
+
+def paso(nombre: str, filas_entrada: Optional[int] = None) -> Medicion:
+    """Medición de un paso de la etapa en curso (ej. 'union', 'pivote', 'exportacion')."""
+    return registrar_paso(Medicion(nombre, filas_entrada))
+
+
+def tomar_pasos() -> List[Dict[str, Any]]:
+    """Registros de los pasos medidos desde la última llamada (y los olvida)."""
+    pasos = [dict(paso=medicion.nombre, **medicion.como_registro()) for medicion in _PASOS]
+    _PASOS.clear()
+    return pasos
+
+
+def _filas(objeto: Any) -> Optional[int]:
+    """Filas de un DataFrame/Series/arreglo (o del primer elemento de una tupla devuelta)."""
+    if isinstance(objeto, tuple) and objeto:
+        objeto = objeto[0]
+    if isinstance(objeto, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(objeto)
+    return None
+
+
+def medido(
+    nombre: str,
+    filas_entrada: Optional[Callable[..., Optional[int]]] = None,
+    filas_salida: Optional[Callable[[Any], Optional[int]]] = None
+) -> Callable:
+    """
+    Decorador para los helpers compartidos: cada llamada se registra como paso 'nombre'.
+    Por defecto las filas de entrada son las del primer DataFrame de los argumentos y las
+    de salida las del resultado; 'filas_entrada' (recibe los mismos argumentos) y
+    'filas_salida' (recibe el resultado) permiten contarlas de otra forma.
+    """
+    def decorador(funcion: Callable) -> Callable:
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if filas_entrada is not None:
+                entrada = filas_entrada(*args, **kwargs)
+            else:
+                entrada = next((len(a) for a in list(args) + list(kwargs.values()) if isinstance(a, pd.DataFrame)), None)
+            with paso(nombre, entrada) as medicion:
+                resultado = funcion(*args, **kwargs)
+                medicion.filas_salida = filas_salida(resultado) if filas_salida is not None else _filas(resultado)
+            return resultado
+        return envoltura
+    return decorador
+
+
+# ==============================================================================
+#                      LOG DE CORRIDAS (JSON POR LÍNEA)
+# ==============================================================================
+
+class RegistroMetricas:
+    """
+    Log de métricas de una corrida: cada registro es una línea JSON con la corrida,
+    la fecha y el 'contexto' (segmento, modo...). Solo escribe el proceso principal.
+    """
+
+    def __init__(self, ruta: str, corrida: Optional[str] = None, **contexto: Any):
+        self.ruta = ruta
+        self.corrida = corrida or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.contexto = contexto
+
+    def registrar(self, tipo: str = 'etapa', **campos: Any) -> None:
+        registro = {
+            'corrida': self.corrida,
+            'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'tipo': tipo,
+            **self.contexto,
+            **campos,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.ruta) or '.', exist_ok=True)
+            # Una sola escritura por línea: una corrida interrumpida deja sus registros completos
+            with open(self.ruta, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
+        except OSError as e:
+            print(f"⚠️ Advertencia: No se pudo escribir el log de métricas en {self.ruta}: {e}")
+
+
+def leer_metricas(ruta: str, pasos: bool = False) -> pd.DataFrame:
+    """
+    Registros de etapa del log de métricas como tabla (una fila por etapa y corrida).
+    Con pasos=True, una fila por paso (con las columnas de su etapa como prefijo 'etapa_').
+    Las líneas ilegibles (ej. de una corrida cortada a media escritura) se omiten.
+    """
+    registros = []
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            for linea in f:
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue
+                if registro.get('tipo') == 'etapa':
+                    registros.append(registro)
+    except FileNotFoundError:
+        return pd.DataFrame()
+
+    if not pasos:
+        return pd.DataFrame([{k: v for k, v in r.items() if k != 'pasos'} for r in registros])
+
+    filas = []
+    for registro in registros:
+        for medicion in registro.get('pasos') or []:
+            filas.append({
+                'corrida': registro['corrida'],
+                'etapa': registro.get('etapa'),
+                'etapa_estado': registro.get('estado'),
+                **medicion,
+            })
+    return pd.DataFrame(filas)
+
+
+def tendencia(df: pd.DataFrame, metrica: str = 'segundos', por: str = 'etapa') -> pd.DataFrame:
+    """
+    Tabla corrida x etapa (o x paso, con por='paso' y la tabla de leer_metricas(pasos=True))
+    con la métrica sumada; lista para graficar con .plot().
+    """
+    if df.empty:
+        return pd.DataFrame()
+    return df.pivot_table(index='corrida', columns=por, values=metrica, aggfunc='sum').sort_index()
+
+
+def regresiones(
+    df: pd.DataFrame,
+    metrica: str = 'segundos',
+    corrida: Optional[str] = None,
+    umbral: float = UMBRAL_REGRESION,
+    corridas_previas: int = CORRIDAS_PREVIAS
+) -> pd.DataFrame:
+    """
+    Etapas cuya métrica en la 'corrida' (la última por defecto) supera 'umbral' veces la
+    mediana de sus 'corridas_previas' corridas anteriores. Solo cuenta las etapas
+    ejecutadas con éxito (las tomadas de la caché no se comparan).
+    """
+    vacio = pd.DataFrame(columns=['etapa', metrica, 'mediana_previa', 'factor'])
+    if df.empty or metrica not in df.columns:
+        return vacio
+
+    tabla = tendencia(df[df['estado'] == 'exito'], metrica)
+    corrida = corrida if corrida is not None else (tabla.index[-1] if len(tabla) else None)
+    if corrida not in tabla.index:
+        return vacio
+
+    actual = tabla.loc[corrida]
+    mediana = tabla[tabla.index < corrida].tail(corridas_previas).median()
+    factor = actual / mediana.where(mediana > 0)
+    resultado = pd.DataFrame({metrica: actual, 'mediana_previa': mediana, 'factor': factor}).dropna()
+    resultado = resultado[resultado['factor'] > umbral].sort_values('factor', ascending=False)
+    return resultado.rename_axis('etapa').reset_index()
@@ -0,0 +1,127 @@
+import json
+import os
+import unicodedata
+from typing import Callable, Dict
+
+import numpy as np
+import pandas as pd
+
+import ETL_Cache
+
+# unidecode es opcional: sin él, los acentos se quitan con unicodedata (NFKD)
+try:
+    from unidecode import unidecode
+    UNIDECODE_DISPONIBLE = True
+except ImportError:
+    UNIDECODE_DISPONIBLE = False
+
+# ==============================================================================
+#                      NORMALIZACIÓN DE CLAVES DE MERGE
+# ==============================================================================
+# Las claves de texto (Reporte, Concepto Reporte, SECCION...) se repiten miles de
+# veces pero tienen pocos valores distintos. En lugar de normalizar fila por fila
+# con .apply, se normaliza cada valor distinto una sola vez (factorize) y el
+# resultado se reparte a las filas con sus códigos. Lo ya normalizado se guarda
+# en disco y se reutiliza en las corridas siguientes.
+
+CACHE_NORMALIZACION_DIR = os.path.join(ETL_Cache.CACHE_DIR, 'normalizacion')
+
+# Cambiar si cambian las reglas de normalización (invalida las cachés en disco)
+VERSION_NORMALIZACION = 1
+
+# Caracteres que varían entre la API y el catálogo y se eliminan de la clave
+_CARACTERES_A_QUITAR = str.maketrans('', '', '$💵📉💰💸:-')
+
+# Cachés cargadas en este proceso: nombre -> {valor original: clave normalizada}
+_CACHES: Dict[str, Dict[str, str]] = {}
+
+
+def quitar_acentos(texto: str) -> str:
+    """Transliteración a ASCII (unidecode si está instalado)."""
+    if UNIDECODE_DISPONIBLE:
+        return unidecode(texto)
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii')
+
+
+def normalizar_texto_clave(valores: pd.Series) -> pd.Series:
+    """
+    Reglas de la clave de merge entre la API y el catálogo, vectorizadas sobre una
+    serie de textos: sin espacios, sin acentos, en mayúsculas, sin '360' y sin los
+    símbolos que varían entre fuentes ($, emojis, ':' y '-').
+    """
+    return (
+        valores.astype(str).str.strip()
+        .map(quitar_acentos).str.upper()
+        .str.replace(' ', '', regex=False)
+        .str.replace('360', '', regex=False)
+        .str.translate(_CARACTERES_A_QUITAR)
+    )
+
+
+# ==============================================================================
+#                      CACHÉ PERSISTENTE
+# ==============================================================================
+
+def _ruta_cache(nombre: str) -> str:
+    return os.path.join(CACHE_NORMALIZACION_DIR, f"{nombre}.json")
+
+
+def cache_normalizacion(nombre: str) -> Dict[str, str]:
+    """Caché {valor original: clave} del normalizador 'nombre' (se carga del disco una vez por proceso)."""
+    if nombre not in _CACHES:
+        cache: Dict[str, str] = {}
+        try:
+            with open(_ruta_cache(nombre), 'r', encoding='utf-8') as f:
+                contenido = json.load(f)
+            if contenido.get('version') == VERSION_NORMALIZACION:
+                cache = contenido.get('valores', {})
+        except FileNotFoundError:
+            pass
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Advertencia: Caché de normalización '{nombre}' ilegible ({e}). Se reconstruirá.")
+        _CACHES[nombre] = cache
+    return _CACHES[nombre]
+
+
+def guardar_cache_normalizacion(nombre: str) -> None:
+    """Escritura atómica de la caché en disco."""
+    try:
+        os.makedirs(CACHE_NORMALIZACION_DIR, exist_ok=True)
+        ruta = _ruta_cache(nombre)
+        ruta_temporal = ruta + '.tmp'
+        with open(ruta_temporal, 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION_NORMALIZACION, 'valores': _CACHES.get(nombre, {})}, f, ensure_ascii=False)
+        os.replace(ruta_temporal, ruta)
+    except OSError as e:
+        print(f"⚠️ Advertencia: No se pudo guardar la caché de normalización '{nombre}': {e}")
+
+
+# ==============================================================================
+#                      NORMALIZACIÓN POR VALORES ÚNICOS
+# ==============================================================================
+
+def normalizar_claves(
+    serie: pd.Series,
+    normalizador: Callable[[pd.Series], pd.Series] = normalizar_texto_clave,
+    nombre_cache: str = 'claves_merge'
+) -> pd.Series:
+    """
+    Aplica 'normalizador' a cada valor distinto de la serie (una sola vez) y reparte
+    el resultado a todas las filas. Los nulos quedan como ''.
+    Los valores ya vistos (en esta u otras corridas) se toman de la caché 'nombre_cache'.
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    textos = pd.Series(unicos, dtype=object).astype(str)
+
+    cache = cache_normalizacion(nombre_cache)
+    claves = np.array([cache.get(texto) for texto in textos], dtype=object)  # Un acceso por valor distinto
+    faltantes = np.array([clave is None for clave in claves], dtype=bool)
+    if faltantes.any():
+        nuevas = normalizador(textos[faltantes]).to_numpy(dtype=object)
+        claves[faltantes] = nuevas
+        cache.update(zip(textos[faltantes], nuevas))
+        guardar_cache_normalizacion(nombre_cache)
+
+    # Código -1 (nulo) -> '' (la clave vacía del .apply original)
+    claves_por_codigo = np.append(claves, '')
+    return pd.Series(claves_por_codigo[codigos], index=serie.index, dtype=object)
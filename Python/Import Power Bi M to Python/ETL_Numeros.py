@@ -0,0 +1,126 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+#                      CONVERSIÓN DE TEXTOS NUMÉRICOS / MONEDA
+# ==============================================================================
+# Columnas como 'Valor' pueden llegar como número (del almacén, ya tipadas) o
+# como texto con formato de moneda ("$ 1,234.50", "1.234,50", "(300.00)").
+# - Si la columna ya es numérica no se toca (sin pasar por cadenas).
+# - Si es texto, el formato (punto o coma decimal) se detecta una vez por
+#   columna y cada valor distinto se convierte una sola vez: convertidor
+#   nativo, luego reemplazos con métodos de str y, solo para lo que aún falla, una expresión
+#   regular compilada.
+# Se informa cuántas celdas con contenido no se pudieron convertir.
+
+FORMATO_PUNTO_DECIMAL = 'punto_decimal'  # 1,234.50
+FORMATO_COMA_DECIMAL = 'coma_decimal'    # 1.234,50
+
+# Valores distintos que se revisan para detectar el formato de la columna
+TAMANO_MUESTRA_FORMATO = 5000
+
+# Símbolos que se quitan sin expresión regular (moneda y espacios, incluido el espacio duro)
+_SIMBOLOS_COMUNES = ('$', ' ', '\u00a0', '\t')
+# Todo lo que no forma parte del número (letras de moneda como MXN, %, etc.): solo
+# se usa con los valores que siguen sin convertirse después de la limpieza rápida
+_NO_NUMERICO = re.compile(r'[^0-9,.\-+()eE]')
+_SEPARADOR_MILES_PUNTO = re.compile(r'^-?\d{1,3}(\.\d{3}){2,}$')
+_COMA_DECIMAL = re.compile(r'^[-(]?\d+,\d{1,2}\)?$')
+_COMA_MILES = re.compile(r',\d{3}(?!\d)')
+_COMA_DESPUES_DEL_PUNTO = re.compile(r'\.\d*,')
+
+
+def detectar_formato(textos: pd.Series) -> str:
+    """
+    Formato decimal de la columna a partir de sus textos (ya sin símbolos).
+    Punto decimal salvo evidencia sin ambigüedad de coma decimal:
+    - algún valor tiene la coma después del punto (1.234,50) o usa el punto como
+      separador de miles dos o más veces (1.234.567), o
+    - todos los valores con coma tienen 1-2 decimales (12,5) y en la muestra no hay
+      ningún punto ni ninguna coma seguida de tres dígitos (1,234 / 3,000).
+    """
+    if textos.empty:
+        return FORMATO_PUNTO_DECIMAL
+    if textos.str.contains(_COMA_DESPUES_DEL_PUNTO).any() or textos.str.match(_SEPARADOR_MILES_PUNTO).any():
+        return FORMATO_COMA_DECIMAL
+    if textos.str.contains('.', regex=False).any() or textos.str.contains(_COMA_MILES).any():
+        return FORMATO_PUNTO_DECIMAL
+    con_coma = textos[textos.str.contains(',', regex=False)]
+    if not con_coma.empty and con_coma.str.match(_COMA_DECIMAL).all():
+        return FORMATO_COMA_DECIMAL
+    return FORMATO_PUNTO_DECIMAL
+
+
+def _limpiar_texto(texto: str, formato: str) -> str:
+    """Quita símbolos y separadores de miles; (123) -> -123."""
+    for simbolo in _SIMBOLOS_COMUNES:
+        texto = texto.replace(simbolo, '')
+    if formato == FORMATO_COMA_DECIMAL:
+        texto = texto.replace('.', '').replace(',', '.')
+    else:
+        texto = texto.replace(',', '')
+    if texto.startswith('(') and texto.endswith(')'):
+        texto = '-' + texto[1:-1]
+    return texto
+
+
+def _convertir_textos(textos: pd.Series, formato: str) -> pd.Series:
+    """Limpia cada texto en una sola pasada (métodos de str, sin regex) y convierte."""
+    limpios = [_limpiar_texto(texto, formato) for texto in textos.to_numpy(dtype=object)]
+    return pd.Series(pd.to_numeric(pd.Series(limpios, dtype=object), errors='coerce').to_numpy(), index=textos.index)
+
+
+def a_numero(serie: pd.Series, nombre: str = '') -> pd.Series:
+    """
+    Convierte la columna a float64. Las celdas que no se pueden convertir quedan
+    como NaN y se informa cuántas fueron (sin contar las vacías).
+    """
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        return serie.astype('float64')
+
+    # Cada valor distinto se convierte una sola vez. Primero con el convertidor nativo
+    # (números y textos simples como "12.5"); solo lo que falla pasa por la limpieza.
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    unicos = pd.Series(unicos, dtype=object)
+
+    # Si en la muestra casi todo trae formato, no vale la pena el intento nativo completo
+    muestra_nativa = pd.to_numeric(unicos.iloc[:TAMANO_MUESTRA_FORMATO], errors='coerce')
+    if muestra_nativa.notna().mean() >= 0.5:
+        convertidos = pd.to_numeric(unicos, errors='coerce').astype('float64')
+    else:
+        convertidos = pd.Series(np.nan, index=unicos.index, dtype='float64')
+
+    pendientes = convertidos.isna().to_numpy()
+    textos = pd.Series([str(valor).strip() for valor in unicos.to_numpy()[pendientes]], dtype=object)
+    muestra = textos.iloc[:TAMANO_MUESTRA_FORMATO]
+    formato = detectar_formato(muestra.str.replace(_NO_NUMERICO, '', regex=True))
+
+    if formato == FORMATO_COMA_DECIMAL:
+        # "1.234" se leyó como 1.234 pero en esta columna el punto es de miles
+        con_punto = np.array([isinstance(valor, str) and '.' in valor for valor in unicos], dtype=bool)
+        pendientes = pendientes | con_punto
+        textos = pd.Series([str(valor).strip() for valor in unicos.to_numpy()[pendientes]], dtype=object)
+
+    if pendientes.any():
+        resultado = _convertir_textos(textos, formato)
+        # Lo que aún falla puede traer letras u otros símbolos (ej. "MXN 7.25")
+        restantes = resultado.isna() & (textos != '')
+        if restantes.any():
+            resultado[restantes] = _convertir_textos(
+                textos[restantes].str.replace(_NO_NUMERICO, '', regex=True), formato
+            )
+        convertidos[pendientes] = resultado.to_numpy()
+
+    valores = np.append(convertidos.to_numpy(), np.nan)[codigos]  # Código -1 (nulo) -> NaN
+
+    # Celdas con contenido que no se pudieron convertir
+    sin_convertir = np.flatnonzero(pendientes)[convertidos[pendientes].isna().to_numpy() & (textos != '').to_numpy()]
+    fallidos = int(np.isin(codigos, sin_convertir).sum()) if len(sin_convertir) else 0
+    if fallidos:
+        etiqueta = f" '{nombre}'" if nombre else ''
+        print(f"⚠️ Advertencia: {fallidos} celdas de la columna{etiqueta} no se pudieron convertir a número "
+              f"(formato detectado: {formato}).")
+
+    return pd.Series(valores, index=serie.index, name=serie.name)
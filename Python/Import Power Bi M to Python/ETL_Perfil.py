@@ -0,0 +1,175 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import ETL_Metricas
+
+# ==============================================================================
+#                      PERFIL DE LOS PASOS M DENTRO DE UNA ETAPA
+# ==============================================================================
+# Las transformaciones traducidas de M (TR_Datos, TR_Real, api_python) son
+# secuencias largas de pasos numerados ("2.2. Join DíasFestivos",
+# "3.3. Multiplicación"). Con ETL_PERFIL_PASOS=1 cada paso marcado con
+# ETL_Perfil.paso(...) imprime y registra (en el log de métricas, dentro de su
+# etapa) su duración, las filas que entran y salen y la memoria que asigna
+# (tracemalloc: neta al terminar y pico durante el paso). tracemalloc hace más
+# lenta la etapa mientras está activo: las duraciones sirven para comparar pasos
+# entre sí, no con las corridas sin perfil.
+# Desactivado (por defecto) paso() devuelve siempre el mismo objeto vacío y
+# @perfilado deja la función sin envolver: no mide nada ni asigna memoria.
+# Con ETL_PERFIL_ETAPA=TR_Datos (o varias separadas por coma) la etapa se ejecuta
+# bajo cProfile y deja un .prof (ver con snakeviz o flameprof como gráfica de
+# llamas) y un resumen en texto en RUTA_PERFILES.
+
+PERFIL_PASOS: bool = os.environ.get('ETL_PERFIL_PASOS', '0') == '1'
+
+ETAPAS_PERFILADAS: List[str] = [
+    nombre.strip() for nombre in os.environ.get('ETL_PERFIL_ETAPA', '').split(',') if nombre.strip()
+]
+
+RUTA_PERFILES = os.environ.get('ETL_RUTA_PERFILES', str(Path.home() / 'Downloads' / 'ETL_Perfiles'))
+
+# Funciones que se listan en el resumen en texto del perfil (por tiempo acumulado)
+FUNCIONES_RESUMEN = 40
+
+# Picos de memoria de los pasos abiertos (pasos anidados: el pico del interno cuenta para el externo)
+_PICOS: List[int] = []
+
+
+def _filas(df: Any) -> Optional[int]:
+    return len(df) if df is not None and hasattr(df, '__len__') else None
+
+
+class _PasoInactivo:
+    """Paso sin medición (perfil desactivado): un único objeto compartido que no hace nada."""
+
+    def __enter__(self) -> '_PasoInactivo':
+        return self
+
+    def __exit__(self, *excepcion) -> bool:
+        return False
+
+    def salida(self, df: Any) -> None:
+        pass
+
+
+_INACTIVO = _PasoInactivo()
+
+
+class PasoPerfilado(ETL_Metricas.Medicion):
+    """Medición de un paso M: la de ETL_Metricas más la memoria asignada (tracemalloc) y el cambio de filas."""
+
+    def __init__(self, nombre: str, filas_entrada: Optional[int] = None):
+        super().__init__(nombre, filas_entrada)
+        self.memoria_neta_mb: Optional[float] = None
+        self.memoria_paso_mb: Optional[float] = None
+
+    def salida(self, df: Any) -> None:
+        """Filas con que termina el paso."""
+        self.filas_salida = _filas(df)
+
+    def __enter__(self) -> 'PasoPerfilado':
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        actual, pico = tracemalloc.get_traced_memory()
+        if _PICOS:
+            _PICOS[-1] = max(_PICOS[-1], pico)
+        tracemalloc.reset_peak()
+        self._memoria = actual
+        _PICOS.append(actual)
+        return super().__enter__()
+
+    def __exit__(self, *excepcion) -> bool:
+        super().__exit__(*excepcion)
+        actual, pico = tracemalloc.get_traced_memory()
+        pico = max(_PICOS.pop(), pico)
+        if _PICOS:
+            _PICOS[-1] = max(_PICOS[-1], pico)
+        self.memoria_neta_mb = round((actual - self._memoria) / 1024 ** 2, 2)
+        self.memoria_paso_mb = round((pico - self._memoria) / 1024 ** 2, 2)
+
+        cambio = ''
+        if self.filas_entrada is not None and self.filas_salida is not None:
+            cambio = f", filas {self.filas_entrada} -> {self.filas_salida} ({self.filas_salida - self.filas_entrada:+d})"
+        print(f"   ⏱️ {self.nombre}: {self.segundos:.3f} s{cambio}, "
+              f"memoria {self.memoria_neta_mb:+.1f} MB (pico del paso {self.memoria_paso_mb:.1f} MB)")
+        return False
+
+    def como_registro(self) -> Dict[str, Any]:
+        registro = super().como_registro()
+        registro['memoria_neta_mb'] = self.memoria_neta_mb
+        registro['memoria_paso_mb'] = self.memoria_paso_mb
+        return registro
+
+
+def paso(nombre: str, df: Any = None):
+    """
+    Contexto para un paso M: with ETL_Perfil.paso('2.3. Join ConceptosProdFlag', df) as p: ...;
+    p.salida(df_resultado). 'df' son las filas con que empieza el paso (opcional).
+    Sin ETL_PERFIL_PASOS=1 no mide nada.
+    """
+    if not PERFIL_PASOS:
+        return _INACTIVO
+    medicion = PasoPerfilado(nombre, _filas(df))
+    ETL_Metricas.registrar_paso(medicion)
+    return medicion
+
+
+def perfilado(nombre: str) -> Callable:
+    """
+    Decorador: cada llamada a la función es un paso (filas del primer argumento y del resultado).
+    Sin ETL_PERFIL_PASOS=1 devuelve la función original.
+    """
+    def decorador(funcion: Callable) -> Callable:
+        if not PERFIL_PASOS:
+            return funcion
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with paso(nombre, args[0] if args else None) as medicion:
+                resultado = funcion(*args, **kwargs)
+                medicion.salida(resultado)
+            return resultado
+        return envoltura
+    return decorador
+
+
+# ==============================================================================
+#                      cProfile DE UNA ETAPA
+# ==============================================================================
+
+def etapa_perfilada(nombre: str) -> bool:
+    return nombre in ETAPAS_PERFILADAS
+
+
+def ejecutar_perfilado(nombre: str, funcion: Callable, *args, **kwargs) -> Any:
+    """
+    Ejecuta la función bajo cProfile y deja en RUTA_PERFILES el perfil binario
+    (<nombre>_<fecha>.prof) y el resumen de las funciones más costosas (.txt).
+    """
+    perfil = cProfile.Profile()
+    try:
+        return perfil.runcall(funcion, *args, **kwargs)
+    finally:
+        _guardar_perfil(nombre, perfil)
+
+
+def _guardar_perfil(nombre: str, perfil: cProfile.Profile) -> None:
+    try:
+        os.makedirs(RUTA_PERFILES, exist_ok=True)
+        base = os.path.join(RUTA_PERFILES, f"{nombre}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        perfil.dump_stats(base + '.prof')
+
+        resumen = io.StringIO()
+        pstats.Stats(perfil, stream=resumen).sort_stats('cumulative').print_stats(FUNCIONES_RESUMEN)
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(resumen.getvalue())
+        print(f"   🔬 Perfil de {nombre}: {base}.prof")
+    except OSError as e:
+        print(f"⚠️ Advertencia: No se pudo guardar el perfil de {nombre} en {RUTA_PERFILES}: {e}")
@@ -0,0 +1,90 @@
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import ETL_Metricas
+
+# ==============================================================================
+#                      PIVOTE DE SALDOS (FCN_TipoSaldoAColumnas)
+# ==============================================================================
+# Power Query separa los saldos por TipoSaldo (REAL, META, CAPACIDAD...), los
+# vuelve a unir con joins externos sobre todas las claves y después agrupa.
+# Aquí se hace en una sola pasada: cada clave se convierte en códigos enteros
+# (factorize), se agrupa una vez por (claves, TipoSaldo) y el TipoSaldo se pasa
+# a columnas con unstack. Las claves de texto solo se comparan al factorizar.
+
+# Mapeo TipoSaldo -> columna final (mismo orden que las columnas de salida)
+MAPA_TIPO_SALDO: Dict[str, str] = {
+    "REAL": "Real",
+    "META": "Meta",
+    "VALOR TOPE": "Valor Tope",
+    "VALOR PLANTA": "Valor Planta",
+    "VALOR TRANSITO": "Valor Transito",
+    "CAPACIDAD": "Valor Capacidad",
+    "CAPACIDAD 91": "Valor Capacidad 91",
+}
+
+
+@ETL_Metricas.medido('pivote')
+def pivotar_saldos(
+    df: pd.DataFrame,
+    claves: List[str],
+    columna_tipo: str = 'TipoSaldo',
+    columna_valor: str = 'Valor',
+    mapa_columnas: Dict[str, str] = MAPA_TIPO_SALDO,
+    conservar_nulos: bool = True
+) -> pd.DataFrame:
+    """
+    Suma 'columna_valor' por 'claves' con una columna por tipo de saldo (las de
+    'mapa_columnas' que aparecen en los datos, en el orden del mapa; vacías = 0).
+    Los tipos fuera del mapa se ignoran. Filas ordenadas por las claves.
+    - conservar_nulos=True: las claves nulas forman su propio grupo (groupby dropna=False).
+    - conservar_nulos=False: se descartan las filas con alguna clave nula (como pivot_table).
+    """
+    tipos = df[columna_tipo].map(mapa_columnas)
+    filtro = tipos.notna().to_numpy()
+    if not conservar_nulos:
+        for col in claves:
+            filtro = filtro & df[col].notna().to_numpy()
+
+    presentes = set(tipos[filtro].unique())
+    columnas_saldo = [col for col in dict.fromkeys(mapa_columnas.values()) if col in presentes]
+    if not columnas_saldo:
+        return pd.DataFrame(columns=claves)
+
+    # Claves -> códigos enteros (ordenados; el nulo, si se conserva, queda al final)
+    codigos: List[np.ndarray] = []
+    valores_unicos: List[Any] = []
+    for col in claves:
+        codigos_col, unicos_col = pd.factorize(df[col][filtro], sort=True, use_na_sentinel=False)
+        codigos.append(codigos_col)
+        valores_unicos.append(unicos_col)
+
+    # Todas las claves en un solo entero por fila (conserva el orden lexicográfico)
+    dimensiones = tuple(max(len(unicos), 1) for unicos in valores_unicos)
+    if claves and np.prod(dimensiones, dtype=float) < 2 ** 62:
+        grupo = np.ravel_multi_index(codigos, dimensiones)
+    else:
+        grupo = pd.DataFrame(dict(enumerate(codigos))).groupby(list(range(len(codigos))), sort=True).ngroup().to_numpy()
+
+    df_codigos = pd.DataFrame({
+        'grupo': grupo,
+        columna_tipo: pd.Categorical(tipos[filtro], categories=columnas_saldo),
+        columna_valor: pd.to_numeric(df[columna_valor][filtro], errors='coerce').fillna(0).to_numpy(),
+    })
+    df_pivote = (
+        df_codigos.groupby(['grupo', columna_tipo], sort=True, observed=True)[columna_valor].sum()
+        .unstack(columna_tipo, fill_value=0)
+        .reindex(columns=columnas_saldo, fill_value=0)
+    )
+
+    # Grupo -> fila representativa -> valores originales de las claves
+    _, primera_fila = np.unique(grupo, return_index=True)
+    df_final = pd.DataFrame({
+        col: valores_unicos[i].take(codigos[i][primera_fila])
+        for i, col in enumerate(claves)
+    })
+    for col in columnas_saldo:
+        df_final[col] = df_pivote[col].to_numpy(dtype=float)
+    return df_final
@@ -0,0 +1,174 @@
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+import ETL_Almacen
+
+# ==============================================================================
+#                      REGISTRO DE CLAVES SUSTITUTAS DE LAS DIMENSIONES
+# ==============================================================================
+# Antes cada dimensión numeraba sus filas desde 1 en cada corrida (Key_* = índice
+# + 1): una planta o un concepto nuevo podía recorrer todas las claves y obligaba
+# a reconstruir las tablas de hechos y el modelo de Power BI.
+# Aquí cada dimensión guarda su mapeo clave natural -> clave sustituta. Los
+# miembros ya registrados conservan su clave para siempre y los nuevos reciben
+# la siguiente disponible (las claves nunca se reutilizan). En la primera corrida
+# las claves salen en el mismo orden de aparición que el índice anterior.
+
+RUTA_REGISTRO_CLAVES = os.environ.get(
+    'ETL_RUTA_REGISTRO_CLAVES', str(Path.home() / 'Downloads' / 'ETL_RegistroClaves')
+)
+
+# Columna con la fecha en que se dio de alta cada miembro
+COLUMNA_ALTA = 'Alta'
+
+# Marcas internas para formar la clave natural en texto (no aparecen en los datos)
+_NULO = '\x00'
+_SEPARADOR = '\x1f'
+
+
+def _ruta_registro(dimension: str) -> str:
+    return os.path.join(RUTA_REGISTRO_CLAVES, dimension + ETL_Almacen.extension())
+
+
+def reiniciar_registro(dimension: str) -> None:
+    """Borra el registro de la dimensión (la siguiente corrida numera desde 1)."""
+    ruta = _ruta_registro(dimension)
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+
+def reiniciar_todos() -> None:
+    """Borra los registros de todas las dimensiones."""
+    shutil.rmtree(RUTA_REGISTRO_CLAVES, ignore_errors=True)
+
+
+def _texto_componente(serie: pd.Series) -> np.ndarray:
+    """
+    Texto estable de una columna de la clave natural, calculado una vez por valor
+    distinto: 12.0 y 12 dan '12' (Excel a veces entrega enteros como float) y los
+    nulos quedan como una marca propia (distinta de '').
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=True)
+    textos = []
+    for valor in unicos:
+        if isinstance(valor, (float, np.floating)) and float(valor).is_integer():
+            valor = int(valor)
+        textos.append(str(valor).strip())
+    return np.append(np.array(textos, dtype=object), _NULO)[codigos]
+
+
+def clave_natural(df: pd.DataFrame, columnas: List[str]) -> pd.Index:
+    """Clave natural de cada fila como un solo texto (columnas unidas con un separador interno)."""
+    componentes = [_texto_componente(df[col]) for col in columnas]
+    if len(componentes) == 1:
+        return pd.Index(componentes[0], dtype=object)
+    unidas = componentes[0]
+    for componente in componentes[1:]:
+        unidas = unidas + _SEPARADOR + componente
+    return pd.Index(unidas, dtype=object)
+
+
+class RegistroClaves:
+    """Clave natural (una o varias columnas) -> clave sustituta de una dimensión, persistido en disco."""
+
+    def __init__(self, dimension: str, columnas: List[str], columna_clave: str):
+        self.dimension = dimension
+        self.columnas = list(columnas)
+        self.columna_clave = columna_clave
+        self.ruta = _ruta_registro(dimension)
+        self.nuevos = 0
+        self.tabla = self._cargar()
+        self._indice = clave_natural(self.tabla, self.columnas)
+
+    def _tabla_vacia(self) -> pd.DataFrame:
+        df = pd.DataFrame({col: pd.Series(dtype=object) for col in self.columnas})
+        df[self.columna_clave] = pd.Series(dtype='int32')
+        df[COLUMNA_ALTA] = pd.Series(dtype='datetime64[ns]')
+        return df
+
+    def _cargar(self) -> pd.DataFrame:
+        if not os.path.exists(self.ruta):
+            return self._tabla_vacia()
+        try:
+            df = ETL_Almacen.leer_archivo(self.ruta)
+        except Exception as e:
+            # Sin el registro no se puede garantizar que las claves se conserven: se detiene la etapa
+            raise RuntimeError(f"Registro de claves de '{self.dimension}' ilegible ({self.ruta}): {e}") from e
+
+        faltantes = [col for col in self.columnas + [self.columna_clave] if col not in df.columns]
+        if faltantes:
+            raise RuntimeError(
+                f"El registro de claves de '{self.dimension}' no tiene las columnas {faltantes}. "
+                f"Si cambió la clave natural, borre {self.ruta} (las claves se renumerarán)."
+            )
+        return df
+
+    @property
+    def ultima_clave(self) -> int:
+        return int(self.tabla[self.columna_clave].max()) if not self.tabla.empty else 0
+
+    def asignar(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Clave sustituta de cada fila de 'df' (int32). Los miembros nuevos se dan de
+        alta en orden de aparición con las claves siguientes a la última registrada.
+        Solo se buscan los valores distintos: el costo depende de los miembros, no de las filas.
+        """
+        naturales = clave_natural(df, self.columnas)
+        codigos, unicos = pd.factorize(naturales)
+        posiciones = self._indice.get_indexer(unicos)
+
+        nuevos = posiciones < 0
+        if nuevos.any():
+            # Fila representativa de cada miembro nuevo (primera aparición)
+            _, primera_fila = np.unique(codigos, return_index=True)
+            filas_nuevas = primera_fila[nuevos]
+
+            claves_nuevas = self.ultima_clave + 1 + np.arange(int(nuevos.sum()))
+            # Se guarda el mismo texto con el que se compara (nulos como nulos)
+            df_nuevos = pd.DataFrame({
+                col: pd.Series(_texto_componente(df[col].iloc[filas_nuevas]), dtype=object).replace(_NULO, None)
+                for col in self.columnas
+            })
+            df_nuevos[self.columna_clave] = claves_nuevas.astype(np.int32)
+            df_nuevos[COLUMNA_ALTA] = pd.Timestamp(datetime.now().replace(microsecond=0))
+
+            self.tabla = pd.concat([self.tabla, df_nuevos], ignore_index=True) if not self.tabla.empty else df_nuevos
+            self._indice = self._indice.append(pd.Index(unicos[nuevos], dtype=object))
+            posiciones[nuevos] = len(self._indice) - int(nuevos.sum()) + np.arange(int(nuevos.sum()))
+            self.nuevos += int(nuevos.sum())
+
+        claves = self.tabla[self.columna_clave].to_numpy(dtype=np.int32)
+        return claves[posiciones][codigos]
+
+    def guardar(self) -> None:
+        """Escribe el registro (solo si hubo altas)."""
+        if self.nuevos:
+            ETL_Almacen.escribir_archivo(self.tabla, self.ruta)
+
+
+def asignar_claves(
+    df: pd.DataFrame,
+    dimension: str,
+    columnas_naturales: List[str],
+    columna_clave: str
+) -> pd.DataFrame:
+    """
+    Agrega a la tabla de la dimensión (un renglón por miembro) la columna 'columna_clave'
+    con las claves del registro, dando de alta los miembros nuevos. Las filas quedan
+    ordenadas por clave.
+    """
+    registro = RegistroClaves(dimension, columnas_naturales, columna_clave)
+    df = df.copy()
+    df[columna_clave] = registro.asignar(df)
+    registro.guardar()
+
+    if registro.nuevos:
+        print(f"   🔑 {dimension}: {registro.nuevos} miembros nuevos (claves hasta {registro.ultima_clave}).")
+    return df.sort_values(columna_clave, kind='stable').reset_index(drop=True)
+
@@ -5,6 +5,9 @@ import numpy as np
 import os # Importar os para manejo de rutas
 from datetime import date, time 
 
+import ETL_Almacen
+import ETL_HTTP
+
 # ==============================================================================
 # CONFIGURACIÓN
 # ==============================================================================
@@ -47,7 +50,7 @@ def transformar_servicio_cliente():
 
     # --- 1. Obtener JSON desde la URL (Source) ---
     try:
-        response = requests.get(API_URL, params=API_PARAMS, headers=HEADERS, timeout=30)
+        response = ETL_HTTP.get(API_URL, params=API_PARAMS, headers=HEADERS, timeout=30)
         response.raise_for_status() 
         json_data = response.json()
     except requests.exceptions.RequestException as e:
@@ -139,12 +142,18 @@ if __name__ == '__main__':
         print("\nTipos de datos finales:")
         print(df_final.dtypes)
         
-        # --- EXPORTACIÓN A EXCEL ---
-        try:
-            # Exportar a Excel sin el índice de Pandas
-            df_final.to_excel(RUTA_EXPORTACION, index=False)
-            print(f"\n Exportación completada: Los datos se guardaron en: {RUTA_EXPORTACION}")
-        except Exception as e:
-            print(f"\n❌ ERROR al exportar a Excel. Asegúrate de que el archivo no esté abierto y la ruta sea válida. {e}")
+        # --- ALMACÉN INTERMEDIO (Parquet/Arrow): es lo que leen las dimensiones y fctAtencionClientes ---
+        df_final = ETL_Almacen.guardar_tabla('Ext_Atencion a clientes', df_final)
+        print(f"\n✅ Ext_Atencion a clientes guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('Ext_Atencion a clientes')}")
+
+        # --- EXPORTACIÓN OPCIONAL A EXCEL ---
+        if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+            try:
+                # Exportar a Excel sin el índice de Pandas
+                df_final.to_excel(RUTA_EXPORTACION, index=False)
+                ETL_Almacen.registrar_exportacion('Ext_Atencion a clientes', RUTA_EXPORTACION)
+                print(f"\n Exportación completada: Los datos se guardaron en: {RUTA_EXPORTACION}")
+            except Exception as e:
+                print(f"\n❌ ERROR al exportar a Excel. Asegúrate de que el archivo no esté abierto y la ruta sea válida. {e}")
     else:
         print("\n🛑 El DataFrame final está vacío. No se puede exportar.")
\ No newline at end of file
@@ -1,16 +1,24 @@
 import pandas as pd
 import requests
-from pandas import json_normalize
 import os
 from datetime import date 
+from typing import Optional
+
+import ETL_Almacen
+import ETL_Incremental
+import ETL_KPI
 
 # ==============================================================================
 # CONFIGURACIÓN
 # ==============================================================================
-API_URL = "https://kpis.grupo-ortiz.site/Controllers/apiController.php?op=api"
+# La API de KPIs se lee de la tabla cruda compartida con Ext_data (ETL_KPI.API_URL)
 # Columnas que actúan como identificadores en la tabla final
 COLUMNAS_IDENTIFICADORAS_UNPIVOT = ["date", "planta", "SEGMENTO"]
 
+# Histórico local para la carga incremental (se guarda antes del join con el catálogo,
+# así un cambio en el catálogo se aplica a todo el histórico)
+ENDPOINT_HISTORICO = 'Ext_DiasLaborados'
+
 # RUTAS DE ARCHIVOS
 RUTA_CATALOGO = r"C:\Users\USUARIO\Downloads\Cat_DiasLaborables.xlsx"
 RUTA_EXPORTACION = r"C:\Users\USUARIO\Downloads\Ext_DiasLaborados.xlsx" # Exportación a Excel
@@ -18,18 +26,26 @@ RUTA_EXPORTACION = r"C:\Users\USUARIO\Downloads\Ext_DiasLaborados.xlsx" # Export
 # ==============================================================================
 # TABLA DE CATÁLOGO (Carga desde Excel)
 # ==============================================================================
+def preparar_tabla_catalogo(df: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza la clave 'DIAS LABORABLES' y valida la columna 'CONCEPTO'."""
+    if 'DIAS LABORABLES' in df.columns:
+        df['DIAS LABORABLES'] = df['DIAS LABORABLES'].astype(str).str.strip().str.upper()
+    
+    if 'CONCEPTO' not in df.columns:
+        print("❌ ERROR: La columna 'CONCEPTO' no se encontró en el catálogo.")
+        return pd.DataFrame({'DIAS LABORABLES': [], 'CONCEPTO': []})
+    
+    return df
+
+
 def cargar_tabla_catalogo():
-    """Carga la tabla de catálogo desde el archivo Excel en RUTA_CATALOGO."""
-    print(f"Intentando cargar catálogo desde: {RUTA_CATALOGO}")
+    """Carga la tabla de catálogo desde el almacén intermedio (o el Excel en RUTA_CATALOGO)."""
+    print(f"Intentando cargar catálogo desde: {ETL_Almacen.ruta_vigente('Cat_DiasLaborables', RUTA_CATALOGO)}")
     try:
-        df = pd.read_excel(RUTA_CATALOGO)
+        df = preparar_tabla_catalogo(ETL_Almacen.leer_tabla('Cat_DiasLaborables', RUTA_CATALOGO))
         
-        if 'DIAS LABORABLES' in df.columns:
-            df['DIAS LABORABLES'] = df['DIAS LABORABLES'].astype(str).str.strip().str.upper()
-        
-        if 'CONCEPTO' not in df.columns:
-            print("❌ ERROR: La columna 'CONCEPTO' no se encontró en el archivo Excel.")
-            return pd.DataFrame({'DIAS LABORABLES': [], 'CONCEPTO': []})
+        if df.empty:
+            return df
         
         print(f"✅ Catálogo de días laborales cargado correctamente.")
         return df
@@ -42,110 +58,75 @@ def cargar_tabla_catalogo():
         return pd.DataFrame({'DIAS LABORABLES': [], 'CONCEPTO': []})
 
 
-def transformar_api_a_reporte():
+def concepto_dias(campo: str) -> str:
+    """Nombre del concepto de días de un campo aplanado (ej. 'GENERAL.DIAS_HABILES' -> 'DIAS_HABILES')."""
+    nombre = campo[len('GENERAL.'):] if campo.startswith('GENERAL.') else campo
+    return nombre.replace('.', '_')
+
+
+def es_columna_dias(campo: str) -> bool:
+    """Campos de la tabla cruda que usa este script: DIAS_* (también bajo 'GENERAL')."""
+    return concepto_dias(campo).startswith('DIAS')
+
+
+def transformar_api_a_reporte(df_catalogo: Optional[pd.DataFrame] = None):
+    """
+    Extrae la API, desdinamiza las columnas DIAS_* y las une con el catálogo
+    de días laborables. Si no se recibe el catálogo, se carga desde Excel.
+    """
     print("Iniciando extracción y transformación de la API...")
 
-    # --- PASO 1: Extracción de la API (Origen) ---
+    # --- PASO 1: Extracción de la API (tabla cruda compartida con Ext_data) ---
+    # Solo se leen los campos DIAS_*; la respuesta ya se descargó y desdinamizó
+    # una vez en esta corrida (ETL_KPI).
     try:
-        response = requests.get(API_URL, headers={"Accept": "application/json"}, timeout=15)
-        response.raise_for_status()
-        json_data = response.json()
+        df_crudo, desde = ETL_KPI.obtener_tabla_cruda(es_columna_dias)
     except requests.exceptions.RequestException as e:
         print(f"❌ ERROR: Falló la conexión o la API. {e}")
         return pd.DataFrame()
-
-    # ==========================================================================
-    # --- PASO 2: Aplanamiento DINÁMICO (Simula M: ConvertidoEnTabla/ExpandidoLista/ExpandidoRegistro) ---
-    # ==========================================================================
-    data_list = []
-    
-    if isinstance(json_data, list):
-        data_list = json_data
-    elif isinstance(json_data, dict):
-        # Intenta encontrar la lista de registros más relevante (la que contenía los datos)
-        for key, value in json_data.items():
-            if isinstance(value, list) and all(isinstance(i, dict) for i in value):
-                data_list = value
-                break
-        
-        if not data_list:
-            # Si no hay lista, trata el diccionario raíz como un solo registro
-            data_list = [json_data]
-             
-    if not data_list:
-        print("❌ ERROR: No se encontró una lista de registros válida en el JSON de la API.")
-        return pd.DataFrame()
-
-    try:
-        # Aplanar la lista de registros (esto crea columnas como 'GENERAL_date', 'GENERAL_DIAS_...')
-        df_registros_general = json_normalize(data_list, sep='_') 
-        print("✅ Estructura JSON aplanada dinámicamente.")
     except Exception as e:
         print(f"❌ ERROR: Falló el aplanamiento de los registros. {e}")
         return pd.DataFrame()
-            
-    # ==========================================================================
-    # --- PASO 3: Filtrado ESTRICTO de columnas (Simula M: ListaFiltradaCamposGeneral) ---
-    # ==========================================================================
-    
-    cols_a_mantener_fijos = COLUMNAS_IDENTIFICADORAS_UNPIVOT
-    cols_a_mantener_prefix = 'GENERAL_' 
-    
-    # 1. Definir las columnas necesarias
-    cols_requeridas = [
-        col for col in df_registros_general.columns
-        if col in cols_a_mantener_fijos or 
-           col.startswith('DIAS') or 
-           col.startswith(cols_a_mantener_prefix)
-    ]
-    
-    df_filtrado = df_registros_general[cols_requeridas].copy()
-    
-    # 2. Renombrar columnas si fueron prefijadas (e.g., 'GENERAL_date' -> 'date')
-    rename_map = {}
-    for col in df_filtrado.columns:
-        if col.startswith(cols_a_mantener_prefix):
-            new_col = col.replace(cols_a_mantener_prefix, '')
-            # Solo renombramos si el resultado es una columna que nos interesa (date, planta, SEGMENTO o DIAS_*)
-            if new_col in cols_a_mantener_fijos or new_col.startswith('DIAS'):
-                rename_map[col] = new_col
-                
-    df_filtrado.rename(columns=rename_map, inplace=True)
-    
-    # 3. Filtrar de nuevo para las columnas finales requeridas
-    required_cols = cols_a_mantener_fijos + [col for col in df_filtrado.columns if col.startswith('DIAS')]
-    required_cols = list(set([c for c in required_cols if c in df_filtrado.columns]))
-    df_filtrado = df_filtrado[required_cols]
 
-    if not any(col.startswith('DIAS') for col in df_filtrado.columns):
-        print("❌ ERROR: No se encontraron las columnas 'DIAS_...' después del aplanamiento y filtrado.")
+    if df_crudo.empty:
+        print("❌ ERROR: No se encontró una lista de registros válida en el JSON de la API.")
         return pd.DataFrame()
-        
-    
+
     # ==========================================================================
-    # --- PASO 4: Anulación de dinamización (Unpivot) ---
+    # --- PASO 2-4: Aplanado, filtrado y anulación de dinamización ---
+    # (Simula M: ExpandidoRegistro / ListaFiltradaCamposGeneral / Unpivot)
     # ==========================================================================
-    cols_identificadoras_unpivot = [col for col in COLUMNAS_IDENTIFICADORAS_UNPIVOT if col in df_filtrado.columns]
-    
-    # CRÍTICO: Solo dinamizar las columnas que empiecen con 'DIAS'
-    cols_a_dinamizar = [col for col in df_filtrado.columns if col.startswith('DIAS')]
-
-    df_unpivot = pd.melt(
-        df_filtrado,
-        id_vars=cols_identificadoras_unpivot,
-        value_vars=cols_a_dinamizar, # Solo DIAS_* entran aquí
-        var_name="Concepto_Dias",
-        value_name="Dias_Laborados"
-    )
+    # La tabla cruda ya viene desdinamizada (una fila por registro y campo) y solo
+    # con los campos DIAS_*: basta con nombrar el concepto. Como en el Unpivot de M,
+    # los días nulos no generan fila.
+    cols_identificadoras_unpivot = [col for col in COLUMNAS_IDENTIFICADORAS_UNPIVOT if col in df_crudo.columns]
+    conceptos = {campo: concepto_dias(campo) for campo in df_crudo['Campo'].cat.categories}
+
+    df_unpivot = df_crudo[cols_identificadoras_unpivot].copy()
+    df_unpivot['Concepto_Dias'] = df_crudo['Campo'].map(conceptos)
+    df_unpivot['Dias_Laborados'] = df_crudo['Valor']
+    print(f"✅ Columnas DIAS_* desdinamizadas: {len(conceptos)} conceptos, {len(df_unpivot)} filas.")
+
+    # Integración al histórico local (upsert por date, planta, SEGMENTO)
+    if ETL_Incremental.CARGA_INCREMENTAL and "date" in df_unpivot.columns:
+        df_unpivot = ETL_Incremental.cargar_incremental(
+            ENDPOINT_HISTORICO, df_unpivot, cols_identificadoras_unpivot, 'date', desde
+        )
+        if df_unpivot.empty:
+            print("❌ ERROR: El histórico de días laborados está vacío.")
+            return pd.DataFrame()
     
     # --- PASO 5: Join con Catálogo ---
-    df_catalogo = cargar_tabla_catalogo()
+    if df_catalogo is None:
+        df_catalogo = cargar_tabla_catalogo()
+    else:
+        df_catalogo = preparar_tabla_catalogo(df_catalogo)
     
     if df_catalogo.empty:
         print("🛑 Detenido: No se puede realizar el Join sin el catálogo.")
         return pd.DataFrame()
 
-    df_unpivot['Concepto_Dias'] = df_unpivot['Concepto_Dias'].str.upper()
+    df_unpivot['Concepto_Dias'] = df_unpivot['Concepto_Dias'].astype(str).str.upper()
 
     # El Inner Join asegura que solo quedan los conceptos de días que tienen coincidencia en el catálogo
     df_join = pd.merge(
@@ -191,11 +172,17 @@ if __name__ == '__main__':
         print("\nTipos de datos finales:")
         print(df_final.dtypes)
         
-        # --- EXPORTACIÓN A EXCEL ---
-        try:
-            df_final.to_excel(RUTA_EXPORTACION, index=False)
-            print(f"\n Exportación completada: Los datos se guardaron en: {RUTA_EXPORTACION}")
-        except Exception as e:
-            print(f"\n❌ ERROR al exportar a Excel. Asegúrate de que el archivo no esté abierto y la ruta sea válida. {e}")
+        # --- ALMACÉN INTERMEDIO (Parquet/Arrow): es lo que lee TR_Datos ---
+        df_final = ETL_Almacen.guardar_tabla('Ext_DiasLaborados', df_final)
+        print(f"\n✅ Ext_DiasLaborados guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('Ext_DiasLaborados')}")
+
+        # --- EXPORTACIÓN OPCIONAL A EXCEL ---
+        if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+            try:
+                df_final.to_excel(RUTA_EXPORTACION, index=False)
+                ETL_Almacen.registrar_exportacion('Ext_DiasLaborados', RUTA_EXPORTACION)
+                print(f"\n Exportación completada: Los datos se guardaron en: {RUTA_EXPORTACION}")
+            except Exception as e:
+                print(f"\n❌ ERROR al exportar a Excel. Asegúrate de que el archivo no esté abierto y la ruta sea válida. {e}")
     else:
         print("\n🛑 El DataFrame final está vacío. Verifica la estructura de la API o las rutas de archivos.")
\ No newline at end of file
@@ -1,151 +1,129 @@
 import pandas as pd
+import numpy as np
 import requests
-import json
-from typing import List, Dict, Any, Optional
 from pathlib import Path
 
+import ETL_Almacen
+import ETL_Esquemas
+import ETL_Incremental
+import ETL_KPI
+
 # --- 1. CONFIGURACIÓN ---
-API_URL = "https://kpis.grupo-ortiz.site/Controllers/apiController.php?op=api"
-HEADERS = {'Accept': 'application/json'}
+# La API se lee de la tabla cruda compartida (ETL_KPI.API_URL)
 
 # Columnas de identificación
 ID_VARS = ["date", "planta", "SEGMENTO"] 
 # Columnas de reportes (ESTOS SON LOS PREFIJOS ANIDADOS)
 REPORTE_COLS = ["VENTAS 360", "PRODUCCION 360", "INVENTARIOS 360", "DESEMPEÑO 360"]
 
+# Histórico local para la carga incremental: una fila por (date, planta, SEGMENTO) y concepto
+ENDPOINT_HISTORICO = 'Ext_Datos'
+CLAVES_HISTORICO = ['Fecha', 'planta', 'Division']
+
 
 # ----------------------------------------------------------------------------------
-# --- FUNCIONES AUXILIARES ---
+# --- CONSTRUCCIÓN DE LA TABLA FINAL (Ext_Datos) ---
 # ----------------------------------------------------------------------------------
 
-def safe_to_dict(value: Any) -> Any:
-    """Intenta convertir un valor a diccionario/lista si es una cadena que parece JSON."""
-    if isinstance(value, str) and (value.strip().startswith('{') or value.strip().startswith('[')):
-        try:
-            return json.loads(value)
-        except json.JSONDecodeError:
-            pass
-    return value
-
-def find_report_column_name(df: pd.DataFrame, target_name: str) -> Optional[str]:
-    """Busca el nombre de columna real en el DataFrame."""
-    normalized_target = target_name.lower().replace(' ', '') + '.'
-    
-    for col in df.columns:
-        normalized_col_prefix = col.split('.')[0].lower().replace(' ', '') + '.'
-        if normalized_col_prefix == normalized_target:
-            return target_name 
-    return None
+# Configuración de reportes: (prefijo anidado, nombre del reporte, columnas a quitar)
+REPORTES_CONFIG = [
+    ("DESEMPEÑO 360", "Desempeño 360", []),
+    ("VENTAS 360", "Ventas 360", []),
+    ("PRODUCCION 360", "Produccion 360", []),
+    ("INVENTARIOS 360", "Inventarios 360", []),
+]
 
-# ----------------------------------------------------------------------------------
-# --- FUNCIÓN DE EXTRACCIÓN (CORRECCIÓN APLICADA) ---
-# ----------------------------------------------------------------------------------
+PLANTAS_A_EXCLUIR = ["BRUCKNER", "DESCONOCIDO", "RECICLADORA"]
 
-def extraer_datos_api(url: str, headers: Dict[str, str]) -> pd.DataFrame:
+
+def construir_ext_datos(df_crudo: pd.DataFrame) -> pd.DataFrame:
     """
-    Extrae, aplana el DataFrame base. 
+    Arma la tabla Ext_Datos a partir de la tabla cruda desdinamizada (ETL_KPI, una fila
+    por registro y campo de reporte) y aplica las transformaciones finales (renombrado,
+    filtro de plantas y tipos). Las columnas de texto quedan como categóricas
+    (esquema 'Ext_Datos' de ETL_Esquemas).
     """
-    try:
-        respuesta = requests.get(url, headers=headers)
-        respuesta.raise_for_status()
-        datos_json = respuesta.json()
+    id_cols_present = [col for col in ID_VARS if col in df_crudo.columns]
+
+    # 1. Filtrar plantas excluidas y filas sin identificación
+    if 'planta' in df_crudo.columns:
+        df_crudo = df_crudo[~df_crudo['planta'].isin(PLANTAS_A_EXCLUIR)]
+    if id_cols_present:
+        df_crudo = df_crudo.dropna(subset=id_cols_present, how='all')
+    if df_crudo.empty:
+        return pd.DataFrame()
 
-        if not isinstance(datos_json, dict):
-            print("Fallo: La respuesta JSON no es un diccionario (Record) como se esperaba.")
-            return pd.DataFrame()
-        
-        # 1. Intentaremos asumir la lista más grande si no se encuentra inmediatamente.
-        list_data = None
-        for key, value in datos_json.items():
-            if isinstance(value, list) and value:
-                list_data = value
-                break
-            
-        if not list_data:
-            print("Fallo: No se encontró la lista de registros anidada o está vacía.")
-            return pd.DataFrame() 
-        
-        # 2. Aplanamiento inicial (con prefijos de reporte)
-        df_base = pd.json_normalize(list_data, sep='.')
-        
-        # 3. Lógica de Renombrado GENERAL (y otras claves aplanadas)
-        col_map = {}
-        for col in df_base.columns:
-            if col.startswith('GENERAL.'):
-                col_map[col] = col.split('.')[-1]
-        
-        # 4. Aplicamos el renombramiento
-        if col_map:
-            df_base.rename(columns=col_map, inplace=True)
-            print(f"Renombradas {len(col_map)} columnas anidadas (GENERAL, etc.) con éxito.")
-        
-        # 5. Verificamos que al menos un reporte exista como prefijo.
-        report_cols_present = [col for col in REPORTE_COLS if any(c.startswith(f"{col}.") for c in df_base.columns)]
-        
-        if not report_cols_present:
-            print("\n" + "="*50)
-            print("ERROR CRÍTICO: No se encontraron prefijos de las columnas de reporte en el DataFrame base.")
-            print("="*50 + "\n")
-            return pd.DataFrame()
+    # 2. Reporte y concepto de cada campo (ej. 'VENTAS 360.Toneladas' -> 'Ventas 360', 'Toneladas')
+    nombres_reporte = {col_expandir: nom_reporte for col_expandir, nom_reporte, _ in REPORTES_CONFIG}
+    orden_reporte = {col_expandir: i for i, (col_expandir, _, _) in enumerate(REPORTES_CONFIG)}
+    campos = list(df_crudo['Campo'].cat.categories)
+    prefijos, conceptos = zip(*(campo.split('.', 1) for campo in campos))
+    reporte_campo = pd.Categorical([nombres_reporte[prefijo] for prefijo in prefijos])
+    concepto_campo = pd.Categorical(conceptos)
+
+    # Orden del melt por reporte: reporte (REPORTES_CONFIG), concepto y registro.
+    # La tabla cruda viene por lotes de registros: el orden estable conserva el de los registros.
+    codigos_campo = df_crudo['Campo'].cat.codes.to_numpy()
+    rango_campo = np.array([orden_reporte[prefijo] for prefijo in prefijos]) * len(campos) + np.arange(len(campos))
+    orden = np.argsort(rango_campo[codigos_campo], kind='stable')
+    codigos_campo = codigos_campo[orden]
+
+    df_final = pd.DataFrame({col: df_crudo[col].to_numpy()[orden] for col in id_cols_present})
+    df_final['Concepto Reporte'] = pd.Categorical.from_codes(concepto_campo.codes[codigos_campo], categories=concepto_campo.categories)
+    df_final['Valor'] = df_crudo['Valor'].to_numpy()[orden]
+    df_final['Reporte'] = pd.Categorical.from_codes(reporte_campo.codes[codigos_campo], categories=reporte_campo.categories)
+
+    for nom_reporte, filas in df_final['Reporte'].value_counts(sort=False).items():
+        if filas:
+            print(f"   ✔️ Reporte '{nom_reporte}' generado ({filas} filas).")
+    print(f"    Reportes desdinamizados. Filas totales: {len(df_final)}")
 
-        return df_base
+    # 3. TRANSFORMACIONES FINALES
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error al extraer de la API: {e}")
-        return pd.DataFrame() 
-    except Exception as e:
-        print(f" Ocurrió un error inesperado durante la extracción: {e}")
-        return pd.DataFrame()
+    # Renombrar date a Fecha y SEGMENTO a Division (para compatibilidad con tu archivo final)
+    df_final.rename(columns={'date': 'Fecha', 'SEGMENTO': 'Division'}, inplace=True)
+
+    # Cambiar Tipos y limpiar: esquema declarado de Ext_Datos (categóricas, fecha al día)
+    return ETL_Esquemas.aplicar_esquema(df_final, 'Ext_Datos')
 
 # ----------------------------------------------------------------------------------
-# --- FUNCIÓN DE EXPANSIÓN DE REPORTES (ADAPTACIÓN) ---
+# --- EXTRACCIÓN DESDE LA TABLA CRUDA COMPARTIDA (ETL_KPI) ---
 # ----------------------------------------------------------------------------------
+# La respuesta de la API se desdinamiza una sola vez (ETL_KPI) y se comparte con
+# Ext_DiasLaborados; aquí solo se leen los campos de los reportes.
+# Las plantas excluidas se filtran aquí y no al desdinamizar: la tabla cruda es
+# compartida y Ext_DiasLaborados sí usa esas plantas.
+
+def es_columna_ext_datos(campo: str) -> bool:
+    """Campos de la tabla cruda que usa Ext_Datos: los de los reportes *360."""
+    return '.' in campo and campo.split('.', 1)[0] in REPORTE_COLS
+
 
-def expandir_y_unificar_reporte(
-    df_base: pd.DataFrame, 
-    columna_expandir: str, 
-    nombre_reporte: str, 
-    columnas_a_quitar: List[str]
-) -> pd.DataFrame:
+def extraer_ext_datos() -> pd.DataFrame:
     """
-    Procesa las columnas anidadas que ya fueron aplanadas por json_normalize, 
-    quitando el prefijo y realizando el unpivot (melt).
+    Tabla Ext_Datos completa: reportes desdinamizados a partir de la tabla cruda de la API.
+    En modo incremental la ventana recibida se integra al histórico local.
     """
-    
-    # 1. Búsqueda de todas las columnas que comienzan con el prefijo
-    prefix = f"{columna_expandir}."
-    report_data_cols = [col for col in df_base.columns if col.startswith(prefix)]
-
-    if not report_data_cols:
+    try:
+        df_crudo, desde = ETL_KPI.obtener_tabla_cruda(es_columna_ext_datos)
+    except requests.exceptions.RequestException as e:
+        print(f"Error al extraer de la API: {e}")
+        return pd.DataFrame()
+    except Exception as e:
+        print(f" Ocurrió un error inesperado durante la extracción: {e}")
         return pd.DataFrame()
 
-    # 2. Seleccionamos solo las columnas de ID y las columnas de reporte específicas
-    id_cols_present = [col for col in ID_VARS if col in df_base.columns]
-    
-    df_expand = df_base[id_cols_present + report_data_cols].copy()
-    
-    # 3. Quitamos el prefijo (Ej: 'VENTAS 360.') de los nombres de columna
-    new_report_data_cols = [col.replace(prefix, '') for col in report_data_cols]
-    col_map = dict(zip(report_data_cols, new_report_data_cols))
-    df_expand.rename(columns=col_map, inplace=True)
-    
-    # 4. Preparación y realización del Unpivot (Desdinamización)
-    unpivot_id_vars = id_cols_present
-    value_vars = new_report_data_cols 
-    
-    df_unpivot = df_expand.melt(
-        id_vars=unpivot_id_vars, 
-        value_vars=value_vars, 
-        var_name="Concepto Reporte", 
-        value_name="Valor" 
-    ).dropna(subset=['Valor'])
-    
-    # 5. Agregar Columna Reporte
-    df_unpivot['Reporte'] = nombre_reporte
-    
-    df_unpivot = df_unpivot.dropna(subset=id_cols_present, how='all')
+    if df_crudo.empty:
+        return df_crudo
 
-    return df_unpivot
+    df_ventana = construir_ext_datos(df_crudo)
+    if df_ventana.empty:
+        print("ERROR CRÍTICO: No se encontraron columnas de reporte con datos en la respuesta de la API.")
+        return df_ventana
+    if not ETL_Incremental.CARGA_INCREMENTAL:
+        return df_ventana
+
+    return ETL_Incremental.cargar_incremental(ENDPOINT_HISTORICO, df_ventana, CLAVES_HISTORICO, 'Fecha', desde)
 
 # ----------------------------------------------------------------------------------
 # --- EJECUCIÓN DEL FLUJO ETL COMPLETO ---
@@ -153,78 +131,39 @@ def expandir_y_unificar_reporte(
 
 if __name__ == '__main__':
     
-    print("Iniciando Extracción y Aplanamiento Inicial...")
-    df_base = extraer_datos_api(API_URL, HEADERS)
-    
-    if df_base.empty:
-        print(" No se pudo extraer la base de datos o está vacía. Finalizando.")
-        exit()
-    
-    print(f"✔️ Datos extraídos y aplanados a nivel inicial. Filas: {len(df_base)}")
-    
-    # 2. DEFINICIÓN Y APLICACIÓN DE REPORTES
-    reportes_config = [
-        ("DESEMPEÑO 360", "Desempeño 360", []),
-        ("VENTAS 360", "Ventas 360", []),
-        ("PRODUCCION 360", "Produccion 360", []),
-        ("INVENTARIOS 360", "Inventarios 360", []),
-    ]
-    
-    lista_tablas = []
-    
-    for col_expandir, nom_reporte, _ in reportes_config:
-        df_reporte = expandir_y_unificar_reporte(df_base, col_expandir, nom_reporte, [])
-        if not df_reporte.empty:
-            lista_tablas.append(df_reporte)
-            print(f"   ✔️ Reporte '{nom_reporte}' generado ({len(df_reporte)} filas).")
-
-    if not lista_tablas:
-        print("Ningún reporte pudo ser generado. Finalizando.")
+    print("Iniciando Extracción y Desdinamización de Reportes...")
+    df_final = extraer_ext_datos()
+
+    if df_final.empty:
+        print(" No se pudo extraer la base de datos o ningún reporte pudo ser generado. Finalizando.")
         exit()
-        
-    # CONCATENA_TABLAS (Table.Combine)
-    df_final = pd.concat(lista_tablas, ignore_index=True)
-    print(f"    Tablas concatenadas. Filas totales: {len(df_final)}")
-    
-    # 3. TRANSFORMACIONES FINALES
 
-    # Renombrar date a Fecha y SEGMENTO a Division (para compatibilidad con tu archivo final)
-    df_final.rename(columns={'date': 'Fecha', 'SEGMENTO': 'Division'}, inplace=True)
+    # --- 4. GUARDADO EN EL ALMACÉN INTERMEDIO (lo que leen TR_Real y Dim_Planta) ---
+    df_final = ETL_Almacen.guardar_tabla('Ext_Datos', df_final)
+    print(f"✅ Ext_Datos guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('Ext_Datos')}")
 
-    # Filtrar plantas excluidas
-    plantas_a_excluir = ["BRUCKNER", "DESCONOCIDO", "RECICLADORA"]
-    df_final = df_final[~df_final['planta'].isin(plantas_a_excluir)].copy()
-    
-    # Cambiar Tipos y limpiar
-    df_final['Valor'] = pd.to_numeric(df_final['Valor'], errors='coerce')
-    df_final['Fecha'] = pd.to_datetime(df_final['Fecha'], errors='coerce')
-    df_final = df_final.astype({
-        "planta": 'str',
-        "Division": 'str',
-        "Reporte": 'str',
-        "Concepto Reporte": 'str'
-    }, errors='ignore')
-
-    # --- 4. EXPORTACIÓN DEL RESULTADO A LA CARPETA DE DESCARGAS ---
+    # --- 5. EXPORTACIÓN OPCIONAL DEL RESULTADO A LA CARPETA DE DESCARGAS ---
     output_filename = 'Ext_Datos.csv'
     
-    try:
-        # 1. Determinar la ruta de la carpeta de Descargas de forma universal
-        descargas_dir = Path.home() / 'Downloads'
-        descargas_dir.mkdir(parents=True, exist_ok=True) 
-        output_path = descargas_dir / output_filename
-
-        # 2. Exportar el DataFrame a CSV
-        # 💥 CORRECCIÓN: Usar 'utf-8-sig' para forzar a Excel a reconocer la codificación, 
-        # lo que soluciona los problemas con Ñ, acentos y títulos.
-        df_final.to_csv(output_path, index=False, encoding='utf-8-sig')
+    if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+        try:
+            # 1. Determinar la ruta de la carpeta de Descargas de forma universal
+            descargas_dir = Path.home() / 'Downloads'
+            descargas_dir.mkdir(parents=True, exist_ok=True) 
+            output_path = descargas_dir / output_filename
+
+            # 2. Exportar el DataFrame a CSV
+            # 💥 CORRECCIÓN: Usar 'utf-8-sig' para forzar a Excel a reconocer la codificación, 
+            # lo que soluciona los problemas con Ñ, acentos y títulos.
+            df_final.to_csv(output_path, index=False, encoding='utf-8-sig')
+            ETL_Almacen.registrar_exportacion('Ext_Datos', output_path)
         
-        print("\n================ EXPORTACIÓN ================")
-        print("✅ Exportación exitosa. Archivo guardado con codificación UTF-8-SIG (Compatible con Excel/Ñ):")
-        print(f"{output_path}")
+            print("\n================ EXPORTACIÓN ================")
+            print("✅ Exportación exitosa. Archivo guardado con codificación UTF-8-SIG (Compatible con Excel/Ñ):")
+            print(f"{output_path}")
 
-    except Exception as e:
-        print(f"❌ Error crítico al exportar el archivo: {e}")
+        except Exception as e:
+            print(f"❌ Error crítico al exportar el archivo: {e}")
         
     # Resultado final
     print("\n================ RESULTADO FINAL EN MEMORIA ================")
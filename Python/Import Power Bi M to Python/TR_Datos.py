@@ -3,6 +3,11 @@ import numpy as np
 import os
 from typing import List, Dict, Any, Optional
 
+import ETL_Almacen
+import ETL_Calendario
+import ETL_Joins
+import ETL_Perfil
+
 # ==============================================================================
 # CONFIGURACIÓN DE RUTAS Y COLUMNAS
 # ==============================================================================
@@ -33,31 +38,53 @@ NORMALIZACION_MAP = {
 # FUNCIÓN DE CARGA Y PREPROCESAMIENTO
 # ==============================================================================
 
+def es_columna_texto(serie: pd.Series) -> bool:
+    """True para columnas de texto: object, texto de pandas (str/string) o categóricas."""
+    return (
+        serie.dtype == 'object'
+        or isinstance(serie.dtype, (pd.StringDtype, pd.CategoricalDtype))
+    )
+
+
+def normalizar_catalogo(df: pd.DataFrame, catalog_name: str) -> pd.DataFrame:
+    """Normaliza las claves de texto y asegura los tipos de fecha de un DataFrame ya cargado."""
+    config = NORMALIZACION_MAP.get(catalog_name, {})
+    
+    # Normalizar claves de texto (del almacén llegan como categóricas o texto, de Excel como object)
+    for col in config.get('keys', []):
+        if col in df.columns and es_columna_texto(df[col]):
+            df[col] = ETL_Joins.normalizar_texto(df[col])
+    
+    # Convertir a datetime
+    for col in config.get('date_cols', []):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    # === FIX para el KeyError: 'id' en DiasFestivos ===
+    if catalog_name == 'DiasFestivos' and df is not None:
+        if 'id' not in df.columns:
+            df['id'] = 1
+            print(f"    ✅ FIX aplicado: Columna 'id' agregada con valor 1 a {catalog_name}.")
+    # ===================================================
+
+    return df
+
+
+def preparar_origen(df_origen: pd.DataFrame) -> pd.DataFrame:
+    """Renombra columnas comunes del DataFrame base (por si el encabezado de Excel varía)."""
+    if "Concepto Reporte" in df_origen.columns:
+        df_origen.rename(columns={"Concepto Reporte": "Concepto_Reporte"}, inplace=True)
+    if "SEGMENTO" in df_origen.columns:
+        df_origen.rename(columns={"SEGMENTO": "Division"}, inplace=True)
+    return df_origen
+
+
 def safe_load_and_normalize(file_path: str, catalog_name: str) -> Optional[pd.DataFrame]:
-    """Carga un archivo Excel, normaliza las claves de texto y asegura tipos de fecha."""
+    """Carga una tabla del almacén intermedio (o su Excel), normaliza las claves de texto y asegura tipos de fecha."""
     try:
-        # Se asume que el archivo base TR_Real también es Excel, ya que los catálogos lo son.
-        df = pd.read_excel(file_path, engine='openpyxl')
-        config = NORMALIZACION_MAP.get(catalog_name, {})
-        
-        # Normalizar claves de texto
-        for col in config.get('keys', []):
-            if col in df.columns and df[col].dtype == 'object':
-                df[col] = df[col].astype(str).str.upper().str.strip()
-        
-        # Convertir a datetime
-        for col in config.get('date_cols', []):
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-
-        # === FIX para el KeyError: 'id' en DiasFestivos ===
-        if catalog_name == 'DiasFestivos' and df is not None:
-            if 'id' not in df.columns:
-                df['id'] = 1
-                print(f"    ✅ FIX aplicado: Columna 'id' agregada con valor 1 a {catalog_name}.")
-        # ===================================================
-                
-        return df
+        # El almacén (Parquet/Arrow) evita releer con openpyxl; el Excel queda como respaldo.
+        df = ETL_Almacen.leer_tabla(catalog_name, file_path)
+        return normalizar_catalogo(df, catalog_name)
     except FileNotFoundError:
         print(f"❌ ERROR: Archivo no encontrado para {catalog_name} en: {file_path}")
         return None
@@ -82,10 +109,7 @@ def load_all_data() -> Dict[str, Optional[pd.DataFrame]]:
     # Verificar si el DF Origen cargó correctamente
     if data['df_origen'] is not None:
         # Renombrar columnas comunes si existen (por si el encabezado de Excel varía)
-        if "Concepto Reporte" in data['df_origen'].columns:
-            data['df_origen'].rename(columns={"Concepto Reporte": "Concepto_Reporte"}, inplace=True)
-        if "SEGMENTO" in data['df_origen'].columns:
-            data['df_origen'].rename(columns={"SEGMENTO": "Division"}, inplace=True)
+        preparar_origen(data['df_origen'])
         
         print(f"✔️ Carga de TR_Real (df_origen) completada. {len(data['df_origen'])} filas.")
 
@@ -112,123 +136,123 @@ def aplicar_logica_m_completa(
         print("❌ Error: Columna 'Orden' faltante. No se puede ejecutar el filtro Máquinas.")
         return pd.DataFrame()
 
-    # Normalizar claves de df_trabajo
-    df_trabajo['Concepto'] = df_trabajo['Concepto'].astype(str).str.upper().str.strip()
-    df_trabajo['planta'] = df_trabajo['planta'].astype(str).str.upper().str.strip()
-    df_trabajo['Concepto Capacidad'] = df_trabajo['Concepto Capacidad'].astype(str).str.upper().str.strip()
-    df_trabajo['Fecha'] = pd.to_datetime(df_trabajo['Fecha'], errors='coerce')
+    # Normalizar claves de df_trabajo (una vez por valor distinto)
+    with ETL_Perfil.paso('0. Normalización de claves', df_trabajo) as paso:
+        for col in ['Concepto', 'planta', 'Concepto Capacidad']:
+            df_trabajo[col] = ETL_Joins.normalizar_texto(df_trabajo[col])
+        df_trabajo['Fecha'] = pd.to_datetime(df_trabajo['Fecha'], errors='coerce')
 
+        # Claves enteras de los hechos: cada catálogo se resuelve como posiciones (sin pd.merge)
+        diccionario = ETL_Joins.DiccionarioClaves()
+        diccionario.agregar('planta', df_trabajo['planta'])
+        diccionario.agregar('concepto', df_trabajo['Concepto'], df_trabajo['Concepto Capacidad'])
+        diccionario.agregar('fecha', df_trabajo['Fecha'])
+        diccionario.agregar('reporte', df_trabajo['Reporte'])
+        paso.salida(df_trabajo)
 
     # ==========================================================================
     # 1. INICIA CARGA MÁQUINAS Y NO MÁQUINAS POR SEPARADO
     # ==========================================================================
     
-    # 1.1. Carga registros de máquinas (Orden = 1000)
-    df_maquinas = df_trabajo[df_trabajo['Orden'] == 1000].copy()
-    
-    # 1.2. Restricción de Máquinas por Planta (Inner Join con ConceptosMaquinas)
-    df_maquinas_restringidas = pd.merge(
-        df_maquinas,
-        df_conceptos_maquinas,
-        left_on=['planta', 'Concepto'],
-        right_on=['PLANTA', 'CONCEPTO'],
-        how='inner' # Aplica la restricción
-    )
-    
-    # 1.3. Eliminar columnas del catálogo (Columnas quitadas)
-    cols_to_remove = [c for c in ['PLANTA', 'CONCEPTO'] if c in df_maquinas_restringidas.columns]
-    df_maquinas_restringidas.drop(columns=cols_to_remove, inplace=True, errors='ignore')
-    
-    # 1.4. Carga de registros no máquinas (Orden != 1000)
-    df_sin_maquinas = df_trabajo[df_trabajo['Orden'] != 1000].copy()
-    
-    # 1.5. Concatenación de las dos tablas
-    df_concatena = pd.concat([df_maquinas_restringidas, df_sin_maquinas], ignore_index=True)
+    with ETL_Perfil.paso('1. Máquinas y no máquinas (Join ConceptosMaquinas)', df_trabajo) as paso:
+        # 1.1. Carga registros de máquinas (Orden = 1000)
+        es_maquina = df_trabajo['Orden'].eq(1000).fillna(False).to_numpy(dtype=bool)
+        
+        # 1.2. Restricción de Máquinas por Planta (Inner Join con ConceptosMaquinas: solo filtra)
+        posiciones_maquinas = ETL_Joins.resolver(
+            diccionario,
+            {'planta': diccionario.codificar('planta', df_trabajo['planta']),
+             'concepto': diccionario.codificar('concepto', df_trabajo['Concepto'])},
+            df_conceptos_maquinas,
+            {'planta': 'PLANTA', 'concepto': 'CONCEPTO'}
+        )
+        
+        # 1.3 - 1.5. Máquinas restringidas seguidas de los registros no máquinas (Orden != 1000)
+        indices = np.concatenate([
+            np.flatnonzero(es_maquina & (posiciones_maquinas >= 0)),
+            np.flatnonzero(~es_maquina),
+        ])
+        df_concatena = df_trabajo.take(indices).reset_index(drop=True)
+
+        codigos = {
+            'planta': diccionario.codificar('planta', df_concatena['planta']),
+            'concepto': diccionario.codificar('concepto', df_concatena['Concepto']),
+            'concepto_capacidad': diccionario.codificar('concepto', df_concatena['Concepto Capacidad']),
+            'fecha': diccionario.codificar('fecha', df_concatena['Fecha']),
+            'reporte': diccionario.codificar('reporte', df_concatena['Reporte']),
+        }
+        paso.salida(df_concatena)
     
     # ==========================================================================
     # 2. PROCESOS PARA ELIMINAR DÍAS DOMINGOS Y FESTIVOS EN LAS METAS
     # ==========================================================================
     
-    # 2.1. IdSemana Agregada: (0 = Domingo)
-    df_concatena['Id_Semana'] = df_concatena['Fecha'].dt.dayofweek + 1
-    df_concatena['Id_Semana'] = df_concatena['Id_Semana'].replace({7: 0}) 
-
-    # 2.2. Join DíasFestivos (Left Outer Join)
-    df_concatena = pd.merge(
-        df_concatena,
-        df_dias_festivos[['Fecha', 'id']],
-        on='Fecha',
-        how='left'
-    ).rename(columns={'id': 'id_Festivo'}) 
-    df_concatena['id_Festivo'].fillna(0, inplace=True)
-    df_concatena['id_Festivo'] = df_concatena['id_Festivo'].astype(int)
+    # 2.1 - 2.2. Domingos y DíasFestivos: una sola lectura del calendario por fecha
+    # (un día es festivo si su primer registro en DiasFestivos tiene id = 1)
+    with ETL_Perfil.paso('2.1 - 2.2. Domingos y DíasFestivos', df_concatena) as paso:
+        df_festivos = df_dias_festivos.drop_duplicates(subset=['Fecha'])
+        calendario = ETL_Calendario.Calendario.para_fechas(
+            df_concatena['Fecha'], df_festivos[df_festivos['id'] == 1]
+        )
+        es_no_laborable = calendario.es_no_laborable(df_concatena['Fecha'])
+        paso.salida(es_no_laborable)
 
     # 2.3. Join ConceptosProdFlag (Left Outer Join)
-    df_concatena = pd.merge(
-        df_concatena,
-        df_conceptos_prod_flag[['Column2', 'Column6', 'Column9']],
-        left_on=['Concepto', 'Reporte'],
-        right_on=['Column2', 'Column6'],
-        how='left'
-    ).rename(columns={'Column9': 'id_Conceptos_Prod'}) 
-    
-    df_concatena.drop(columns=['Column2', 'Column6'], inplace=True, errors='ignore')
-    
-    # 2.4. Columna condicional (Ajuste de Meta a 0)
-    condicion_dia_inhabil = (df_concatena['Id_Semana'] == 0) | (df_concatena['id_Festivo'] == 1)
-    condicion_conceptos_aplicables = (df_concatena['Reporte'] == "Desempeño 360") | \
-                                     (df_concatena['id_Conceptos_Prod'] == 1) | \
-                                     (df_concatena['Orden'] == 1000)
-    
-    condicion_final = condicion_dia_inhabil & condicion_conceptos_aplicables
-    
-    df_concatena['Meta_Temp'] = np.where(condicion_final, 0, df_concatena['Meta'])
+    with ETL_Perfil.paso('2.3. Join ConceptosProdFlag', df_concatena) as paso:
+        posiciones_prod = ETL_Joins.resolver(
+            diccionario,
+            {'concepto': codigos['concepto'], 'reporte': codigos['reporte']},
+            df_conceptos_prod_flag,
+            {'concepto': 'Column2', 'reporte': 'Column6'}
+        )
+        id_conceptos_prod = ETL_Joins.tomar(df_conceptos_prod_flag['Column9'], posiciones_prod)
+        paso.salida(id_conceptos_prod)
     
-    # 2.5. Limpieza y Renombrado
-    df_concatena.drop(columns=['Meta', 'id_Festivo', 'Id_Semana', 'id_Conceptos_Prod'], inplace=True, errors='ignore')
-    df_concatena.rename(columns={'Meta_Temp': 'Meta'}, inplace=True)
+    with ETL_Perfil.paso('2.4 - 2.5. Meta ajustada', df_concatena) as paso:
+        # 2.4. Columna condicional (Ajuste de Meta a 0)
+        condicion_dia_inhabil = es_no_laborable
+        condicion_conceptos_aplicables = (df_concatena['Reporte'] == "Desempeño 360") | \
+                                         (id_conceptos_prod == 1) | \
+                                         df_concatena['Orden'].eq(1000).fillna(False)
+        
+        condicion_final = condicion_dia_inhabil & condicion_conceptos_aplicables
+        
+        # 2.5. Meta ajustada
+        meta = pd.Series(np.where(condicion_final, 0, df_concatena['Meta']))
+        paso.salida(meta)
 
     # ==========================================================================
     # 3. MULTIPLICAR LAS METAS POR LOS DÍAS LABORADOS
     # ==========================================================================
+    columnas_laborados = {'fecha': 'date', 'planta': 'planta', 'concepto': 'Conceptos_DiasLaborados'}
     
     # 3.1. Join Días Laborados para CONCEPTOS (Left Outer Join)
-    df_concatena = pd.merge(
-        df_concatena,
-        df_dias_laborados[['date', 'planta', 'Conceptos_DiasLaborados', 'Dias_Laborados']],
-        left_on=['Fecha', 'planta', 'Concepto'],
-        right_on=['date', 'planta', 'Conceptos_DiasLaborados'],
-        how='left',
-        suffixes=('', '_ConceptoLaborado') 
-    )
-    df_concatena.drop(columns=['date', 'Conceptos_DiasLaborados'], inplace=True, errors='ignore')
-    df_concatena['Dias_Laborados'].fillna(1.0, inplace=True) 
+    with ETL_Perfil.paso('3.1. Join Días Laborados (Concepto)', df_concatena) as paso:
+        posiciones_concepto = ETL_Joins.resolver(
+            diccionario,
+            {'fecha': codigos['fecha'], 'planta': codigos['planta'], 'concepto': codigos['concepto']},
+            df_dias_laborados, columnas_laborados
+        )
+        dias_laborados_concepto = ETL_Joins.tomar(df_dias_laborados['Dias_Laborados'], posiciones_concepto).fillna(1.0)
+        paso.salida(dias_laborados_concepto)
 
     # 3.2. Join Días Laborados para CONCEPTO CAPACIDAD (Left Outer Join)
-    df_concatena = pd.merge(
-        df_concatena,
-        df_dias_laborados[['date', 'planta', 'Conceptos_DiasLaborados', 'Dias_Laborados']],
-        left_on=['Fecha', 'planta', 'Concepto Capacidad'],
-        right_on=['date', 'planta', 'Conceptos_DiasLaborados'],
-        how='left',
-        suffixes=('_Concepto', '_Capacidad')
-    ).rename(columns={'Dias_Laborados_Capacidad': 'Dias_LaboradosCapacidad'}) 
-
-    df_concatena.drop(columns=['date_Capacidad', 'Conceptos_DiasLaborados_Capacidad'], inplace=True, errors='ignore')
-    df_concatena['Dias_LaboradosCapacidad'].fillna(1.0, inplace=True) 
-
-    # 3.3. Multiplicación
-    df_concatena['ProyectadoTemp'] = df_concatena['Meta'] * df_concatena['Dias_Laborados_Concepto']
-    df_concatena['CapacidadTemp'] = df_concatena['Valor Capacidad'] * df_concatena['Dias_LaboradosCapacidad']
-
-    # 3.4. Limpieza y Renombrado
-    cols_a_quitar_meta = ['Meta', 'Valor Capacidad', 'Dias_Laborados_Concepto', 'Dias_LaboradosCapacidad']
-    df_concatena.drop(columns=cols_a_quitar_meta, inplace=True, errors='ignore')
-    df_concatena.rename(columns={'ProyectadoTemp': 'Meta', 'CapacidadTemp': 'Valor Capacidad'}, inplace=True)
-
-    # 3.5. Tipo cambiado
-    df_concatena['Meta'] = pd.to_numeric(df_concatena['Meta'], errors='coerce')
-    df_concatena['Valor Capacidad'] = pd.to_numeric(df_concatena['Valor Capacidad'], errors='coerce')
+    with ETL_Perfil.paso('3.2. Join Días Laborados (Concepto Capacidad)', df_concatena) as paso:
+        posiciones_capacidad = ETL_Joins.resolver(
+            diccionario,
+            {'fecha': codigos['fecha'], 'planta': codigos['planta'], 'concepto': codigos['concepto_capacidad']},
+            df_dias_laborados, columnas_laborados
+        )
+        dias_laborados_capacidad = ETL_Joins.tomar(df_dias_laborados['Dias_Laborados'], posiciones_capacidad).fillna(1.0)
+        paso.salida(dias_laborados_capacidad)
+
+    # 3.3 - 3.5. Multiplicación y Tipo cambiado
+    with ETL_Perfil.paso('3.3 - 3.5. Multiplicación', df_concatena) as paso:
+        df_concatena['Meta'] = pd.to_numeric(meta * dias_laborados_concepto, errors='coerce')
+        df_concatena['Valor Capacidad'] = pd.to_numeric(
+            df_concatena['Valor Capacidad'] * dias_laborados_capacidad, errors='coerce'
+        )
+        paso.salida(df_concatena)
 
     # ==========================================================================
     # 4. FINALIZACIÓN Y REORDENAMIENTO
@@ -271,14 +295,20 @@ if __name__ == '__main__':
             print("\nPrimeras 5 filas:")
             print(df_resultado.head().to_markdown(index=False))
             
-            # EXPORTAR A EXCEL EN CARPETA DE DESCARGAS
-            try:
-                df_resultado.to_excel(OUTPUT_PATH, index=False, engine='openpyxl')
-                print(f"\n✅ **¡Éxito!** El archivo final se ha guardado en:")
-                print(f"   {OUTPUT_PATH}")
-            except Exception as e:
-                print(f"\n❌ ERROR al exportar a Excel: {e}")
-                print("Por favor, verifica que el archivo no esté abierto y que la ruta sea accesible.")
+            # Almacén intermedio (Parquet/Arrow): es lo que leen Dim_Concepto y fctFinanzasDiario
+            df_resultado = ETL_Almacen.guardar_tabla('TR_Datos', df_resultado)
+            print(f"\n✅ TR_Datos guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('TR_Datos')}")
+
+            # EXPORTACIÓN OPCIONAL A EXCEL EN CARPETA DE DESCARGAS
+            if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+                try:
+                    df_resultado.to_excel(OUTPUT_PATH, index=False, engine='openpyxl')
+                    ETL_Almacen.registrar_exportacion('TR_Datos', OUTPUT_PATH)
+                    print(f"\n✅ **¡Éxito!** El archivo final se ha guardado en:")
+                    print(f"   {OUTPUT_PATH}")
+                except Exception as e:
+                    print(f"\n❌ ERROR al exportar a Excel: {e}")
+                    print("Por favor, verifica que el archivo no esté abierto y que la ruta sea accesible.")
                 
         else:
             print("\n🛑 El DataFrame final está vacío después de la transformación M.")
@@ -1,14 +1,17 @@
 import pandas as pd
-import numpy as np
-import os
-from functools import reduce
+
+import ETL_Almacen
+import ETL_CatalogoConceptos
+import ETL_Joins
+import ETL_Numeros
+import ETL_Perfil
+import ETL_Pivote
 
 # ==============================================================================
 # CONFIGURACIÓN Y RUTAS
 # ==============================================================================
 # Rutas de Archivos: Se usan las rutas locales proporcionadas por el usuario.
 RUTA_EXT_DATOS = r"C:\Users\USUARIO\Downloads\Ext_Datos.csv"
-RUTA_CATALOGO = r"C:\Users\USUARIO\Downloads\ConceptosReporte.xlsx"
 RUTA_SALIDA_EXCEL = r"C:\Users\USUARIO\Downloads\TR_Real.xlsx" # Archivo de salida
 
 # Claves de JOIN
@@ -45,33 +48,30 @@ TIPO_SALDO_MAP_COLUMNAS = {
 # CARGA DE DATOS
 # ==============================================================================
 
+def preparar_origen(df_origen: pd.DataFrame) -> pd.DataFrame:
+    """Renombra las columnas de Ext_Datos y limpia 'Valor' a numérico."""
+    # CORRECCIÓN CRÍTICA: Renombrar 'Concepto Reporte' y 'SEGMENTO'
+    columnas_renombrar = {"SEGMENTO": "Division"}
+    if "Concepto Reporte" in df_origen.columns:
+        columnas_renombrar["Concepto Reporte"] = "Concepto_Reporte"
+        
+    df_origen.rename(columns=columnas_renombrar, inplace=True)
+    
+    # Limpieza y conversión de 'Valor' a numérico (sin pasar por cadenas si ya es numérico)
+    if 'Valor' in df_origen.columns:
+        df_origen['Valor'] = ETL_Numeros.a_numero(df_origen['Valor'], 'Valor').fillna(0)
+
+    return df_origen
+
+
 def cargar_datos():
     """Carga los datos y realiza la limpieza y el renombrado inicial."""
     print("Iniciando carga de datos...")
     
     # Cargar Origen (Ext_Datos)
     try:
-        # Se lee el CSV con la codificación que soporta Ñ y acentos
-        df_origen = pd.read_csv(RUTA_EXT_DATOS, encoding='utf-8') 
-        
-        # CORRECCIÓN CRÍTICA: Renombrar 'Concepto Reporte' y 'SEGMENTO'
-        columnas_renombrar = {"SEGMENTO": "Division"}
-        if "Concepto Reporte" in df_origen.columns:
-            columnas_renombrar["Concepto Reporte"] = "Concepto_Reporte"
-            
-        df_origen.rename(columns=columnas_renombrar, inplace=True)
-        
-        # Limpieza y conversión de 'Valor' a numérico
-        if 'Valor' in df_origen.columns:
-            # La limpieza de formato es crucial para valores numéricos
-            df_origen['Valor'] = df_origen['Valor'].astype(str)
-            df_origen['Valor'] = (
-                df_origen['Valor']
-                .str.replace('$', '', regex=False).str.replace(' ', '', regex=False)
-                .str.replace(',', '', regex=False).str.replace('.', ',', regex=False)
-                .str.replace(',', '.', regex=False)
-            )
-            df_origen['Valor'] = pd.to_numeric(df_origen['Valor'], errors='coerce').fillna(0)
+        # Se lee del almacén intermedio (o del CSV si se editó fuera del flujo)
+        df_origen = preparar_origen(ETL_Almacen.leer_tabla('Ext_Datos', RUTA_EXT_DATOS))
             
         print(f"✅ Ext_Datos cargado y renombrado ({len(df_origen)} filas).")
     except Exception as e:
@@ -80,39 +80,37 @@ def cargar_datos():
 
     # Cargar Catálogo (ConceptosReporte)
     try:
-        # Usar openpyxl como motor de lectura para compatibilidad con Excel.
-        df_catalogo = pd.read_excel(RUTA_CATALOGO, engine='openpyxl') 
-        print(f"✅ Catálogo ConceptosReporte cargado ({len(df_catalogo)} filas).")
+        # Snapshot compilado del catálogo (tabla + índice de las claves de JOIN)
+        catalogo = ETL_CatalogoConceptos.cargar_catalogo()
+        print(f"✅ Catálogo ConceptosReporte cargado ({len(catalogo.tabla)} filas).")
     except Exception as e:
         print(f"❌ ERROR al cargar Catálogo: {e}")
         return df_origen, None
 
-    return df_origen, df_catalogo
+    return df_origen, catalogo
 
 # ==============================================================================
 # TRANSFORMACIÓN (Equivalente a la lógica M)
 # ==============================================================================
 
-def transformar_logica_m(df_origen, df_catalogo):
-    """Aplica la lógica de transformación M a los DataFrames de Pandas."""
-    if df_origen is None or df_catalogo is None:
+def transformar_logica_m(df_origen, catalogo):
+    """Aplica la lógica de transformación M a Ext_Datos con el catálogo compilado (ETL_CatalogoConceptos)."""
+    if df_origen is None or catalogo is None:
         return pd.DataFrame()
 
     # 1. Normalización de Claves de JOIN (Crítica para el merge)
     print("\n--- NORMALIZACIÓN DE CLAVES DE JOIN ---")
-    for col in JOIN_COLS_ORIGEN:
-        df_origen[col] = df_origen[col].astype(str).str.upper().str.strip()
-    for col in JOIN_COLS_CATALOGO:
-        df_catalogo[col] = df_catalogo[col].astype(str).str.upper().str.strip()
+    # (una vez por valor distinto; las columnas categóricas del almacén siguen categóricas)
+    with ETL_Perfil.paso('1. Normalización de claves de join', df_origen) as paso:
+        for col in JOIN_COLS_ORIGEN:
+            df_origen[col] = ETL_Joins.normalizar_texto(df_origen[col])
+        paso.salida(df_origen)
     
-    # 2. Join (Consultas combinadas)
-    df_join = pd.merge(
-        df_origen,
-        df_catalogo,
-        left_on=JOIN_COLS_ORIGEN,
-        right_on=JOIN_COLS_CATALOGO,
-        how='inner' # JoinKind.Inner
-    )
+    # 2. Join (Consultas combinadas), JoinKind.Inner contra el índice ya normalizado
+    # del catálogo (JOIN_COLS_CATALOGO) que trae el snapshot
+    with ETL_Perfil.paso('2. Join ConceptosReporte', df_origen) as paso:
+        df_join = catalogo.unir(df_origen, JOIN_COLS_ORIGEN, normalizacion='texto')
+        paso.salida(df_join)
     
     if df_join.empty:
         print("❌ ERROR DE JOIN: El DataFrame combinado está vacío.")
@@ -121,20 +119,22 @@ def transformar_logica_m(df_origen, df_catalogo):
     print(f"✅ Join con Catálogo completado ({len(df_join)} filas).")
     
     # 3. Expansión y Renombrado (Se expandió ConceptosReporte)
-    df_expandido = df_join.copy().rename(columns=EXPANSION_RENAME_MAP)
-    
-    # 💥 CORRECCIÓN CRÍTICA: NORMALIZAR COLUMNAS DE AGRUPACIÓN DEL CATÁLOGO
-    # Esto asegura que "Concepto" del catálogo, por ejemplo, no tenga espacios extra 
-    # o diferencias de mayúsculas/minúsculas que rompan el pivot.
-    print("--- NORMALIZACIÓN DE CLAVES DE AGRUPACIÓN ---")
-    cols_a_normalizar_post_join = [
-        "Concepto", "Unidad", "Concepto2", "Concepto Capacidad", "TipoSaldo"
-    ]
-    for col in cols_a_normalizar_post_join:
-        if col in df_expandido.columns:
-            df_expandido[col] = df_expandido[col].astype(str).str.upper().str.strip()
-        else:
-            print(f"⚠️ Advertencia: La columna de agrupación '{col}' no se encontró para normalizar.")
+    with ETL_Perfil.paso('3. Expansión y normalización de agrupación', df_join) as paso:
+        df_expandido = df_join.copy().rename(columns=EXPANSION_RENAME_MAP)
+        
+        # 💥 CORRECCIÓN CRÍTICA: NORMALIZAR COLUMNAS DE AGRUPACIÓN DEL CATÁLOGO
+        # Esto asegura que "Concepto" del catálogo, por ejemplo, no tenga espacios extra 
+        # o diferencias de mayúsculas/minúsculas que rompan el pivot.
+        print("--- NORMALIZACIÓN DE CLAVES DE AGRUPACIÓN ---")
+        cols_a_normalizar_post_join = [
+            "Concepto", "Unidad", "Concepto2", "Concepto Capacidad", "TipoSaldo"
+        ]
+        for col in cols_a_normalizar_post_join:
+            if col in df_expandido.columns:
+                df_expandido[col] = ETL_Joins.normalizar_texto(df_expandido[col])
+            else:
+                print(f"⚠️ Advertencia: La columna de agrupación '{col}' no se encontró para normalizar.")
+        paso.salida(df_expandido)
 
     
     # 4. Preparación para Pivot
@@ -144,20 +144,19 @@ def transformar_logica_m(df_origen, df_catalogo):
          print("❌ ¡FALLO CRÍTICO!: La columna 'TipoSaldo' está vacía o no tiene valores válidos.")
          return pd.DataFrame()
 
-    df_pivot_source = df_expandido[df_expandido['TipoSaldo'].isin(valid_tipos_encontrados)].copy()
-    df_pivot_source['Columna Final'] = df_pivot_source['TipoSaldo'].map(TIPO_SALDO_MAP_COLUMNAS)
+    df_pivot_source = df_expandido[df_expandido['TipoSaldo'].isin(valid_tipos_encontrados)]
 
     # 5. Pivot y Agrupación (Consolida saldos por columnas base)
     cols_base = [col for col in GRUPO_COLS if col in df_expandido.columns]
     
     try:
-        df_agrupado = pd.pivot_table(
-            df_pivot_source,
-            index=cols_base, 
-            columns='Columna Final', 
-            values='Valor', 
-            aggfunc='sum' 
-        ).fillna(0).reset_index() 
+        # Una sola agrupación por (claves, TipoSaldo) con TipoSaldo a columnas (ver ETL_Pivote).
+        # Como pivot_table, se descartan las filas con claves nulas.
+        with ETL_Perfil.paso('5. Pivot y agrupación', df_pivot_source) as paso:
+            df_agrupado = ETL_Pivote.pivotar_saldos(
+                df_pivot_source, cols_base, mapa_columnas=TIPO_SALDO_MAP_COLUMNAS, conservar_nulos=False
+            )
+            paso.salida(df_agrupado)
         
         print("✅ Pivot y Agrupación consolidadas completadas.")
     except Exception as e:
@@ -172,11 +171,13 @@ def transformar_logica_m(df_origen, df_catalogo):
     df_agrupado[SALDO_COLS] = df_agrupado[SALDO_COLS].astype(float)
     
     # 6. Filtrado (QuitaValorCero)
-    condicion_no_cero = (df_agrupado[SALDO_COLS].abs().sum(axis=1) != 0)
-    df_final = df_agrupado[condicion_no_cero].copy()
-    
-    # 7. Reordenamiento (Columnas reordenadas)
-    df_final = df_final.reindex(columns=[col for col in GRUPO_COLS + SALDO_COLS if col in df_final.columns])
+    with ETL_Perfil.paso('6 - 7. Quita valor cero y reordenamiento', df_agrupado) as paso:
+        condicion_no_cero = (df_agrupado[SALDO_COLS].abs().sum(axis=1) != 0)
+        df_final = df_agrupado[condicion_no_cero].copy()
+        
+        # 7. Reordenamiento (Columnas reordenadas)
+        df_final = df_final.reindex(columns=[col for col in GRUPO_COLS + SALDO_COLS if col in df_final.columns])
+        paso.salida(df_final)
 
     print(f"\n✅ Eliminadas filas con saldos totales en cero. Filas finales: {len(df_final)}")
     return df_final
@@ -187,21 +188,27 @@ def transformar_logica_m(df_origen, df_catalogo):
 # ==============================================================================
 
 if __name__ == '__main__':
-    df_origen, df_catalogo = cargar_datos()
+    df_origen, catalogo = cargar_datos()
     
-    if df_origen is not None and df_catalogo is not None:
-        df_reporte_final = transformar_logica_m(df_origen, df_catalogo)
+    if df_origen is not None and catalogo is not None:
+        df_reporte_final = transformar_logica_m(df_origen, catalogo)
         
         if not df_reporte_final.empty:
             print("\n================ RESULTADO FINAL DEL REPORTE ================")
             
-            # 🚀 EXPORTAR A EXCEL
-            try:
-                # La exportación a Excel es robusta con el formato .xlsx
-                df_reporte_final.to_excel(RUTA_SALIDA_EXCEL, index=False)
-                print(f"✅ Exportación a Excel exitosa: El reporte se guardó en:\n{RUTA_SALIDA_EXCEL}")
-            except Exception as e:
-                print(f"❌ ERROR al guardar el archivo Excel: {e}")
+            # Almacén intermedio (Parquet/Arrow): es lo que lee TR_Datos
+            df_reporte_final = ETL_Almacen.guardar_tabla('TR_Real', df_reporte_final)
+            print(f"✅ TR_Real guardado en el almacén intermedio: {ETL_Almacen.ruta_tabla('TR_Real')}")
+
+            # 🚀 EXPORTACIÓN OPCIONAL A EXCEL
+            if ETL_Almacen.EXPORTAR_INTERMEDIOS:
+                try:
+                    # La exportación a Excel es robusta con el formato .xlsx
+                    df_reporte_final.to_excel(RUTA_SALIDA_EXCEL, index=False)
+                    ETL_Almacen.registrar_exportacion('TR_Real', RUTA_SALIDA_EXCEL)
+                    print(f"✅ Exportación a Excel exitosa: El reporte se guardó en:\n{RUTA_SALIDA_EXCEL}")
+                except Exception as e:
+                    print(f"❌ ERROR al guardar el archivo Excel: {e}")
             
             print(f"\nFilas resultantes: {len(df_reporte_final)}")
             print("\nPrimeras 5 filas:")
@@ -1,6 +1,10 @@
 import pandas as pd
 import os
 import numpy as np
+from typing import Optional
+
+import ETL_Almacen
+import ETL_Joins
 
 # ==============================================================================
 # CONFIGURACIÓN DE RUTAS Y ARCHIVOS DE ORIGEN
@@ -25,37 +29,49 @@ RUTA_DIM_PLANTA_CTE = os.path.join(RUTA_BASE, ARCHIVO_DIM_PLANTA_CTE)
 OUTPUT_FILE_NAME = "fctAtencionClientes.xlsx"
 OUTPUT_PATH = os.path.join(RUTA_BASE, OUTPUT_FILE_NAME)
 
+# Columnas de las dimensiones que se usan: la clave natural y la clave sustituta
+COLUMNAS_DIM_CLIENTE = ['Cliente', 'Key_Cliente']
+COLUMNAS_DIM_EMPLEADO = ['Empleado', 'Key_Empleado']
+COLUMNAS_DIM_PLANTA_CTE = ['planta', 'Key_PlantasCte']
+
 
-def safe_load_excel(file_path: str, name: str) -> pd.DataFrame:
-    """Carga un archivo Excel de forma segura, intentando forzar 'Fecha' a datetime."""
+def safe_load_excel(file_path: str, name: str, columnas: Optional[list] = None) -> pd.DataFrame:
+    """
+    Carga una tabla del almacén intermedio (Parquet/Arrow) de forma segura.
+    El Excel de file_path solo se lee si se editó fuera del flujo o si la tabla no está en el almacén.
+    Las fechas se normalizan después, en la transformación.
+    """
     try:
-        # Intentamos cargar y forzar la columna 'Fecha' a datetime para la normalización.
-        df = pd.read_excel(file_path, engine='openpyxl', parse_dates=['Fecha', 'Fecha Inicio', 'Fecha Atendido'])
-        print(f"✔️ Archivo '{name}' cargado.")
+        df = ETL_Almacen.leer_tabla(name, file_path, columnas=columnas)
+        print(f"✔️ Tabla '{name}' cargada.")
         return df
     except FileNotFoundError:
-        print(f"❌ ERROR: El archivo '{name}' no se encontró en: {file_path}")
+        print(f"❌ ERROR: La tabla '{name}' no se encontró en el almacén ni en: {file_path}")
         return None
     except Exception as e:
-        # Fallback a carga simple si parse_dates falla
-        try:
-             df = pd.read_excel(file_path, engine='openpyxl')
-             print(f"⚠️ Aviso: Archivo '{name}' cargado sin forzar fechas.")
-             return df
-        except:
-             print(f"❌ ERROR al cargar '{name}' (Fallo total): {e}")
-             return None
+        print(f"❌ ERROR al cargar '{name}': {e}")
+        return None
 
 
-def transformar_e_integrar_atencion_clientes() -> pd.DataFrame:
+def transformar_e_integrar_atencion_clientes(
+    df_fact: Optional[pd.DataFrame] = None,
+    df_dim_cliente: Optional[pd.DataFrame] = None,
+    df_dim_empleado: Optional[pd.DataFrame] = None,
+    df_dim_planta_cte: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
     """
-    Aplica la lógica M para realizar los tres LEFT JOINS e integrar las claves de dimensiones.
+    Aplica la lógica M de los tres LEFT JOINS para integrar las claves de dimensiones.
+    Los DataFrames que ya estén en memoria no se vuelven a leer desde Excel.
     """
     # 1. Carga de datos
-    df_fact = safe_load_excel(RUTA_FACT, "Ext_Atencion a clientes")
-    df_dim_cliente = safe_load_excel(RUTA_DIM_CLIENTE, "DimCliente")
-    df_dim_empleado = safe_load_excel(RUTA_DIM_EMPLEADO, "DimEmpleado")
-    df_dim_planta_cte = safe_load_excel(RUTA_DIM_PLANTA_CTE, "DimPlantaClientes")
+    if df_fact is None:
+        df_fact = safe_load_excel(RUTA_FACT, "Ext_Atencion a clientes")
+    if df_dim_cliente is None:
+        df_dim_cliente = safe_load_excel(RUTA_DIM_CLIENTE, "DimCliente", COLUMNAS_DIM_CLIENTE)
+    if df_dim_empleado is None:
+        df_dim_empleado = safe_load_excel(RUTA_DIM_EMPLEADO, "DimEmpleado", COLUMNAS_DIM_EMPLEADO)
+    if df_dim_planta_cte is None:
+        df_dim_planta_cte = safe_load_excel(RUTA_DIM_PLANTA_CTE, "DimPlantaClientes", COLUMNAS_DIM_PLANTA_CTE)
 
     if df_fact is None or df_dim_cliente is None or df_dim_empleado is None or df_dim_planta_cte is None:
         return pd.DataFrame()
@@ -72,32 +88,15 @@ def transformar_e_integrar_atencion_clientes() -> pd.DataFrame:
             print(f"✔️ Columna '{col}' normalizada (horas quitadas).")
 
 
-    # --- Joins e Integración de Claves (Mapeo de LEFT OUTER JOIN a pd.merge) ---
-
-    # 2. y 3. JOIN con DimCliente (on Cliente)
-    df_trabajo = pd.merge(
-        df_trabajo,
-        df_dim_cliente[['Cliente', 'Key_Cliente']],
-        on='Cliente',
-        how='left' # JoinKind.LeftOuter
-    )
-
-    # 4. y 5. JOIN con DimEmpleado (on Empleado)
-    df_trabajo = pd.merge(
-        df_trabajo,
-        df_dim_empleado[['Empleado', 'Key_Empleado']],
-        on='Empleado',
-        how='left' # JoinKind.LeftOuter
-    )
-
-    # 6. y 7. JOIN con DimPlantaClientes (on planta)
-    df_trabajo = pd.merge(
-        df_trabajo,
-        df_dim_planta_cte[['planta', 'Key_PlantasCte']],
-        on='planta',
-        how='left' # JoinKind.LeftOuter
-    )
-    
+    # --- Joins e Integración de Claves (LEFT OUTER JOIN que solo trae la clave) ---
+    # Las tres dimensiones se resuelven en una sola pasada (ver ETL_Joins.resolver_estrella)
+    # 2. a 7. JOIN con DimCliente (on Cliente), DimEmpleado (on Empleado) y DimPlantaClientes (on planta)
+    df_trabajo, _ = ETL_Joins.resolver_estrella(df_trabajo, [
+        ETL_Joins.EspecDimension('DimCliente', df_dim_cliente, {'Cliente': 'Cliente'}, 'Key_Cliente'),
+        ETL_Joins.EspecDimension('DimEmpleado', df_dim_empleado, {'Empleado': 'Empleado'}, 'Key_Empleado'),
+        ETL_Joins.EspecDimension('DimPlantaClientes', df_dim_planta_cte, {'planta': 'planta'}, 'Key_PlantasCte'),
+    ])
+
     # 8. #"Columnas quitadas": Eliminar columnas de texto
     columnas_a_quitar = ["planta", "Cliente", "Teléfono", "Empleado"]
     df_trabajo.drop(columns=columnas_a_quitar, inplace=True, errors='ignore')
@@ -133,7 +132,10 @@ if __name__ == '__main__':
     if not df_resultado.empty:
         print("\n✔️ Integración completada. La tabla de hechos ahora usa claves numéricas.")
         
-        # 🚀 EXPORTACIÓN A EXCEL EN CARPETA DE DESCARGAS
+        # Almacén intermedio (Parquet/Arrow)
+        df_resultado = ETL_Almacen.guardar_tabla('fctAtencionClientes', df_resultado)
+
+        # 🚀 EXPORTACIÓN A EXCEL EN CARPETA DE DESCARGAS (salida final para el modelo)
         try:
             # Creamos un ExcelWriter para aplicar el formato de fecha
             writer = pd.ExcelWriter(
@@ -145,6 +147,7 @@ if __name__ == '__main__':
             
             df_resultado.to_excel(writer, index=False, sheet_name='fctAtencionClientes')
             writer.close() 
+            ETL_Almacen.registrar_exportacion('fctAtencionClientes', OUTPUT_PATH)
 
             print(f"\n✅ **¡Éxito!** La tabla de hechos final se ha guardado en:")
             print(f"   {OUTPUT_PATH}")
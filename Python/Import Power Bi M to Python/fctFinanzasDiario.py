@@ -1,6 +1,10 @@
 import pandas as pd
 import os
 import numpy as np
+from typing import Optional
+
+import ETL_Almacen
+import ETL_Joins
 
 # ==============================================================================
 # CONFIGURACIÓN DE RUTAS Y ARCHIVOS DE ORIGEN
@@ -22,26 +26,46 @@ RUTA_DIM_PLANTA = os.path.join(RUTA_BASE, ARCHIVO_DIM_PLANTA)
 OUTPUT_FILE_NAME = "fctFinanzasDiario.xlsx"
 OUTPUT_PATH = os.path.join(RUTA_BASE, OUTPUT_FILE_NAME)
 
+# Columnas de las dimensiones que se usan: la clave natural y la clave sustituta
+COLUMNAS_DIM_CONCEPTO = ['Reporte', 'Concepto', 'Key_Conceptos']
+COLUMNAS_DIM_PLANTA = ['planta', 'Division', 'Key_Plantas']
+
 
-def safe_load_excel(file_path: str, name: str) -> pd.DataFrame:
-    """Carga un archivo Excel de forma segura."""
+def safe_load_excel(file_path: str, name: str, columnas: Optional[list] = None) -> pd.DataFrame:
+    """
+    Carga una tabla del almacén intermedio (Parquet/Arrow) de forma segura.
+    El Excel de file_path solo se lee si se editó fuera del flujo o si la tabla no está en el almacén.
+    """
     try:
-        return pd.read_excel(file_path, engine='openpyxl')
+        return ETL_Almacen.leer_tabla(name, file_path, columnas=columnas)
     except FileNotFoundError:
-        print(f"❌ ERROR: El archivo '{name}' no se encontró en: {file_path}")
+        print(f"❌ ERROR: La tabla '{name}' no se encontró en el almacén ni en: {file_path}")
         return None
     except Exception as e:
         print(f"❌ ERROR al cargar '{name}': {e}")
         return None
 
 
-def transformar_e_integrar_datos(ruta_fact: str, ruta_dim_concepto: str, ruta_dim_planta: str) -> pd.DataFrame:
-    """Aplica la lógica M para crear claves compuestas, realizar joins y limpieza."""
+def transformar_e_integrar_datos(
+    ruta_fact: str, 
+    ruta_dim_concepto: str, 
+    ruta_dim_planta: str,
+    df_fact: Optional[pd.DataFrame] = None,
+    df_dim_concepto: Optional[pd.DataFrame] = None,
+    df_dim_planta: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Aplica la lógica M para crear claves compuestas, realizar joins y limpieza.
+    Los DataFrames que ya estén en memoria no se vuelven a leer desde Excel.
+    """
 
     # 1. Carga de datos
-    df_fact = safe_load_excel(ruta_fact, "TR_Datos.xlsx")
-    df_dim_concepto = safe_load_excel(ruta_dim_concepto, "DimConcepto")
-    df_dim_planta = safe_load_excel(ruta_dim_planta, "DimPlanta")
+    if df_fact is None:
+        df_fact = safe_load_excel(ruta_fact, "TR_Datos")
+    if df_dim_concepto is None:
+        df_dim_concepto = safe_load_excel(ruta_dim_concepto, "DimConcepto", COLUMNAS_DIM_CONCEPTO)
+    if df_dim_planta is None:
+        df_dim_planta = safe_load_excel(ruta_dim_planta, "DimPlanta", COLUMNAS_DIM_PLANTA)
 
     if df_fact is None or df_dim_concepto is None or df_dim_planta is None:
         return pd.DataFrame()
@@ -62,35 +86,18 @@ def transformar_e_integrar_datos(ruta_fact: str, ruta_dim_concepto: str, ruta_di
 
 
     # --- Joins e Integración de Claves ---
-
-    # 2. #"Personalizada Agregada": Crear IdConcepto
-    # each Text.From([Reporte]) & "|" & Text.From([Concepto])
-    df_trabajo['IdConcepto'] = df_trabajo['Reporte'].astype(str) + '|' + df_trabajo['Concepto'].astype(str)
-    
-    # 3. y 4. #"Consultas combinadas" y #"Se expandió Conceptos": LEFT JOIN con DimConcepto
-    # Une por IdConcepto y trae Key_Conceptos
-    df_trabajo = pd.merge(
-        df_trabajo,
-        df_dim_concepto[['IdConcepto', 'Key_Conceptos']],
-        on='IdConcepto',
-        how='left' # JoinKind.LeftOuter
-    )
-
-    # 5. #"Personalizada Agregada1": Crear IdPlanta
-    # each [planta]&"|"&[Division]
-    df_trabajo['IdPlanta'] = df_trabajo['planta'].astype(str) + '|' + df_trabajo['Division'].astype(str)
-
-    # 6. y 7. #"Consultas combinadas1" y #"Se expandió Plantas": LEFT JOIN con DimPlanta
-    # Une por IdPlanta y trae Key_Plantas
-    df_trabajo = pd.merge(
-        df_trabajo,
-        df_dim_planta[['IdPlanta', 'Key_Plantas']],
-        on='IdPlanta',
-        how='left' # JoinKind.LeftOuter
-    )
-    
-    # 8. #"Columnas quitadas": Eliminar columnas de texto y claves temporales
-    columnas_a_quitar = ["planta", "Concepto", "IdConcepto", "IdPlanta", "Reporte", "Division"]
+    # En M: IdConcepto = Reporte & "|" & Concepto, IdPlanta = planta & "|" & Division y un
+    # LEFT JOIN por cada una. Aquí no se arma ningún texto por fila: las dos claves se
+    # resuelven en una pasada sobre los códigos enteros de (Reporte, Concepto) y
+    # (planta, Division) (ver ETL_Joins.resolver_estrella).
+    # 2. a 7. #"Personalizada Agregada", #"Se expandió Conceptos", #"Personalizada Agregada1" y #"Se expandió Plantas"
+    df_trabajo, _ = ETL_Joins.resolver_estrella(df_trabajo, [
+        ETL_Joins.EspecDimension('DimConcepto', df_dim_concepto, {'Reporte': 'Reporte', 'Concepto': 'Concepto'}, 'Key_Conceptos'),
+        ETL_Joins.EspecDimension('DimPlanta', df_dim_planta, {'planta': 'planta', 'Division': 'Division'}, 'Key_Plantas'),
+    ])
+
+    # 8. #"Columnas quitadas": Eliminar columnas de texto
+    columnas_a_quitar = ["planta", "Concepto", "Reporte", "Division"]
     df_trabajo.drop(columns=columnas_a_quitar, inplace=True, errors='ignore')
 
     # 9. #"Índice agregado": Crear fctIndice
@@ -126,9 +133,13 @@ if __name__ == '__main__':
         print(f"Filas resultantes: {len(df_resultado)}")
         print(df_resultado.head().to_markdown(index=False))
         
-        # 🚀 EXPORTACIÓN A EXCEL EN CARPETA DE DESCARGAS
+        # Almacén intermedio (Parquet/Arrow)
+        df_resultado = ETL_Almacen.guardar_tabla('fctFinanzasDiario', df_resultado)
+
+        # 🚀 EXPORTACIÓN A EXCEL EN CARPETA DE DESCARGAS (salida final para el modelo)
         try:
             df_resultado.to_excel(OUTPUT_PATH, index=False, engine='openpyxl') 
+            ETL_Almacen.registrar_exportacion('fctFinanzasDiario', OUTPUT_PATH)
             print(f"\n✅ **¡Éxito!** La tabla de hechos final se ha guardado en:")
             print(f"   {OUTPUT_PATH}")
         except Exception as e:
@@ -0,0 +1,66 @@
+import os
+
+import pandas as pd
+import pytest
+
+import ETL_Almacen
+import ETL_DAG
+
+pytest.importorskip('openpyxl')
+
+NOMBRE = 'Prueba_Almacen'
+
+
+@pytest.fixture
+def etapa(tmp_path, monkeypatch):
+    """Etapa de prueba con el almacén y la exportación en una carpeta temporal."""
+    monkeypatch.setattr(ETL_Almacen, 'RUTA_ALMACEN', str(tmp_path / 'almacen'))
+    df = pd.DataFrame({'Concepto': ['a', 'b', 'c'], 'Valor': [1.5, 2.0, 3.25]})
+    etapa = ETL_DAG.Etapa(NOMBRE, 'prueba.py', lambda: df, ruta_salida=str(tmp_path / 'descargas' / f'{NOMBRE}.xlsx'))
+    monkeypatch.setitem(ETL_DAG.ETAPAS_POR_NOMBRE, NOMBRE, etapa)
+    return etapa
+
+
+def _ejecutar(etapa):
+    resultado = ETL_DAG.ejecutar_etapa(etapa, [], exportar=True)
+    assert resultado.error is None
+    assert resultado.almacenado and resultado.exportado
+    return resultado
+
+
+def _envejecer(ruta, segundos=60):
+    """Atrasa la fecha de modificación del archivo (la exportación queda claramente más reciente)."""
+    fecha = os.path.getmtime(ruta) - segundos
+    os.utime(ruta, (fecha, fecha))
+
+
+def test_ida_y_vuelta_lee_el_almacen(etapa, monkeypatch):
+    resultado = _ejecutar(etapa)
+    _envejecer(etapa.ruta_almacen)
+    assert os.path.getmtime(etapa.ruta_salida) > os.path.getmtime(etapa.ruta_almacen)
+
+    leidos = []
+    leer_archivo = ETL_Almacen.leer_archivo
+    monkeypatch.setattr(ETL_Almacen, 'leer_archivo', lambda ruta, *args: leidos.append(ruta) or leer_archivo(ruta, *args))
+
+    assert ETL_DAG.ruta_vigente(NOMBRE) == etapa.ruta_almacen
+    pd.testing.assert_frame_equal(ETL_DAG.leer_salida(NOMBRE), resultado.df)
+    assert leidos == [etapa.ruta_almacen]
+
+
+def test_excel_editado_fuera_del_flujo(etapa):
+    _ejecutar(etapa)
+    _envejecer(etapa.ruta_almacen)
+
+    editado = pd.DataFrame({'Concepto': ['z'], 'Valor': [9.5]})
+    editado.to_excel(etapa.ruta_salida, index=False)
+
+    assert ETL_DAG.ruta_vigente(NOMBRE) == etapa.ruta_salida
+    pd.testing.assert_frame_equal(ETL_DAG.leer_salida(NOMBRE), editado)
+
+
+def test_sin_almacen_lee_el_respaldo(etapa):
+    _ejecutar(etapa)
+    os.remove(etapa.ruta_almacen)
+    assert ETL_Almacen.ruta_vigente(NOMBRE, etapa.ruta_salida) == etapa.ruta_salida
+    assert ETL_Almacen.ruta_vigente(NOMBRE) is None
@@ -0,0 +1,25 @@
+import os
+
+import ETL_Cache
+
+
+def _escribir(carpeta, nombre, texto):
+    (carpeta / nombre).write_text(texto, encoding='utf-8')
+
+
+def test_hash_codigo_solo_modulos_importados(tmp_path, monkeypatch):
+    monkeypatch.setattr(ETL_Cache, 'BASE_PATH', str(tmp_path))
+    _escribir(tmp_path, 'Etapa.py', 'import pandas as pd\nimport ETL_A\n\ndef f():\n    from ETL_C import g\n')
+    _escribir(tmp_path, 'ETL_A.py', 'import os\nimport ETL_B\n')
+    _escribir(tmp_path, 'ETL_B.py', 'import ETL_A\n')
+    _escribir(tmp_path, 'ETL_C.py', 'x = 1\n')
+    _escribir(tmp_path, 'ETL_DAG.py', 'import ETL_A\n')
+
+    modulos = [os.path.basename(ruta) for ruta in ETL_Cache.modulos_locales('Etapa.py')]
+    assert modulos == ['Etapa.py', 'ETL_A.py', 'ETL_B.py', 'ETL_C.py']
+
+    firma = ETL_Cache.hash_codigo('Etapa.py')
+    _escribir(tmp_path, 'ETL_DAG.py', 'import ETL_A\nimport ETL_C\n')
+    assert ETL_Cache.hash_codigo('Etapa.py') == firma
+    _escribir(tmp_path, 'ETL_B.py', 'import ETL_A\ny = 2\n')
+    assert ETL_Cache.hash_codigo('Etapa.py') != firma
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import ETL_Excel
+
+openpyxl = pytest.importorskip('openpyxl')
+
+MOTORES = ['openpyxl'] + (['calamine'] if ETL_Excel.CALAMINE_DISPONIBLE else [])
+
+# Columnas con tipos mezclados: la cuadrícula sin encabezado las deja como texto/object
+FILAS = [
+    ['mixta', 'texto', 'fecha', 'bool', 'entero', 'flotante', 'na', 'texto_numerico', 'vacia', 'mixta_texto', 'bool_nulo'],
+    [1, 'a', datetime(2024, 1, 1), True, 1, 1.5, 'NA', '1', None, 'x', True],
+    [None, 'b', datetime(2024, 1, 2), False, 2, None, 2, '2', None, 1, None],
+    [3, None, None, True, 3, 2.5, 3, '3.5', None, None, False],
+    ['4', 'd', datetime(2024, 1, 4), False, 4, 3.0, None, '4', None, 'y', True],
+]
+
+
+@pytest.fixture
+def libro(tmp_path, monkeypatch):
+    monkeypatch.setattr(ETL_Excel, 'CACHE_EXCEL_EN_DISCO', False)
+    monkeypatch.setattr(ETL_Excel, '_HOJAS', {})
+    hoja = openpyxl.Workbook()
+    for fila in FILAS:
+        hoja.active.append(fila)
+    ruta = tmp_path / 'mezcla.xlsx'
+    hoja.save(ruta)
+    return str(ruta)
+
+
+@pytest.mark.parametrize('motor', MOTORES)
+@pytest.mark.parametrize('opciones', [
+    {},
+    {'header': None},
+    {'skiprows': 1, 'header': None},
+    {'nrows': 2},
+    {'skiprows': 2},
+    {'usecols': [0, 3, 10]},
+    {'usecols': ['mixta', 'bool_nulo']},
+    {'usecols': lambda nombre: nombre.startswith('mixta')},
+])
+def test_leer_excel_igual_a_read_excel(libro, motor, opciones, monkeypatch):
+    monkeypatch.setattr(ETL_Excel, 'MOTOR_EXCEL', motor)
+    esperado = pd.read_excel(libro, engine=motor, **opciones)
+    pd.testing.assert_frame_equal(ETL_Excel.leer_excel(libro, **opciones), esperado)
+
+
+def test_columna_mixta_numerica(libro):
+    df = ETL_Excel.leer_excel(libro)
+    assert df['mixta'].dtype == 'float64'
+    assert df['mixta'].tolist()[2:] == [3.0, 4.0]
+
+
+def test_lecturas_comparten_la_cuadricula(libro):
+    primera = ETL_Excel.leer_excel(libro)
+    primera.loc[0, 'entero'] = 100
+    assert ETL_Excel.leer_excel(libro).loc[0, 'entero'] == 1
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import ETL_HTTP
+
+
+@pytest.fixture
+def ruta_bloqueo(tmp_path, monkeypatch):
+    monkeypatch.setattr(ETL_HTTP, 'CACHE_HTTP_DIR', str(tmp_path))
+    return os.path.join(str(tmp_path), 'prueba.lock')
+
+
+def _pid_terminado() -> int:
+    proceso = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proceso.wait()
+    return proceso.pid
+
+
+def test_bloqueo_guarda_el_dueno_y_lo_libera(ruta_bloqueo):
+    with ETL_HTTP.bloqueo('prueba'):
+        with open(ruta_bloqueo, encoding='utf-8') as f:
+            assert f.read().split()[0] == str(os.getpid())
+    assert not os.path.exists(ruta_bloqueo)
+
+
+def test_bloqueo_de_un_proceso_terminado_se_toma(ruta_bloqueo):
+    with open(ruta_bloqueo, 'w', encoding='utf-8') as f:
+        f.write(f"{_pid_terminado()} token")
+    with ETL_HTTP.bloqueo('prueba'):
+        pass
+    assert not os.path.exists(ruta_bloqueo)
+
+
+def test_bloqueo_de_un_proceso_activo_no_se_toma(ruta_bloqueo):
+    proceso = subprocess.Popen([sys.executable, '-c', 'pass'])
+    with open(ruta_bloqueo, 'w', encoding='utf-8') as f:
+        f.write(f"{proceso.pid} token")
+    assert not ETL_HTTP._bloqueo_abandonado(ruta_bloqueo, f"{proceso.pid} token")
+    proceso.wait()
+    assert ETL_HTTP._bloqueo_abandonado(ruta_bloqueo, f"{proceso.pid} token")
+
+
+def test_bloqueo_ajeno_no_se_borra_al_salir(ruta_bloqueo):
+    with ETL_HTTP.bloqueo('prueba'):
+        os.remove(ruta_bloqueo)
+        with open(ruta_bloqueo, 'w', encoding='utf-8') as f:
+            f.write(f"{_pid_terminado()} otro")
+    assert os.path.exists(ruta_bloqueo)
@@ -0,0 +1,55 @@
+import io
+import json
+
+import pandas as pd
+
+import ETL_KPI
+
+REGISTROS = [
+    {'GENERAL': {'date': '2024-01-01', 'planta': 'A', 'SEGMENTO': 'S', 'DIAS_HABILES': 20},
+     'VENTAS 360': {'Toneladas': 1.5, 'Kilos': None}},
+    {'GENERAL': {'date': '2024-01-02', 'planta': 'B', 'SEGMENTO': 'S', 'DIAS_HABILES': None},
+     'VENTAS 360': {'Toneladas': '7', 'Nuevo': 3}},
+    {'date': '2024-01-03', 'planta': 'C', 'VENTAS 360': {'Toneladas': 'n/d'}},
+]
+
+
+def _flujo(datos) -> io.BytesIO:
+    return io.BytesIO(json.dumps(datos, ensure_ascii=False).encode('utf-8'))
+
+
+def test_lector_sin_ijson_por_bloques(monkeypatch):
+    monkeypatch.setattr(ETL_KPI, 'TAMANO_BLOQUE_LECTURA', 7)
+    respuesta = {'total': 123456, 'meta': {'x': [1, 2]}, 'vacia': [], 'data': REGISTROS, 'otra': [{'z': 1}]}
+    assert list(ETL_KPI.iterar_registros_texto(_flujo(respuesta))) == REGISTROS
+
+
+def test_lector_sin_ijson_raiz_que_no_es_diccionario():
+    assert list(ETL_KPI.iterar_registros_texto(_flujo(REGISTROS))) == []
+
+
+def test_tabla_cruda_larga_por_lotes():
+    df = ETL_KPI.construir_tabla_cruda(iter(REGISTROS), tamano_lote=2)
+
+    assert list(df.columns) == ETL_KPI.COLUMNAS_ID + ['Campo', 'Valor']
+    assert list(df['Campo'].cat.categories) == [
+        'GENERAL.DIAS_HABILES', 'VENTAS 360.Toneladas', 'VENTAS 360.Kilos', 'VENTAS 360.Nuevo'
+    ]
+    # Solo valores numéricos: los nulos y el texto no numérico no generan fila
+    esperado = pd.DataFrame({
+        'date': ['2024-01-01', '2024-01-01', '2024-01-02', '2024-01-02'],
+        'planta': ['A', 'A', 'B', 'B'],
+        'Campo': ['GENERAL.DIAS_HABILES', 'VENTAS 360.Toneladas', 'VENTAS 360.Toneladas', 'VENTAS 360.Nuevo'],
+        'Valor': [20.0, 1.5, 7.0, 3.0],
+    })
+    pd.testing.assert_frame_equal(
+        df[['date', 'planta', 'Campo', 'Valor']].astype({'date': str, 'planta': str, 'Campo': str}), esperado,
+        check_dtype=False,
+    )
+
+
+def test_proyeccion_de_campos():
+    df = ETL_KPI.construir_tabla_cruda(iter(REGISTROS))
+    ventas = ETL_KPI.proyectar_campos(df, lambda campo: campo.startswith('VENTAS 360.'))
+    assert list(ventas['Campo'].cat.categories) == ['VENTAS 360.Toneladas', 'VENTAS 360.Kilos', 'VENTAS 360.Nuevo']
+    assert ventas['Valor'].tolist() == [1.5, 7.0, 3.0]
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ETL_Numeros
+
+
+@pytest.mark.parametrize('textos, esperado', [
+    (['$1,234', '$12,50', '$3,000'], [1234.0, 1250.0, 3000.0]),  # Coma de miles: punto decimal
+    (['$ 1,234.50', '(300.00)', 'MXN 7.25'], [1234.5, -300.0, 7.25]),
+    (['1.234,50', '(2,5)'], [1234.5, -2.5]),
+    (['1.234.567', '12'], [1234567.0, 12.0]),
+    (['12,5', '3,25', '7'], [12.5, 3.25, 7.0]),
+    (['1,5', '1,500'], [15.0, 1500.0]),  # Ambiguo: se queda en punto decimal
+    (['1,234', '2,000'], [1234.0, 2000.0]),
+])
+def test_a_numero(textos, esperado):
+    assert ETL_Numeros.a_numero(pd.Series(textos)).tolist() == esperado
+
+
+@pytest.mark.parametrize('textos, formato', [
+    (['1,234', '12,50'], ETL_Numeros.FORMATO_PUNTO_DECIMAL),
+    (['12,50', '3.5'], ETL_Numeros.FORMATO_PUNTO_DECIMAL),
+    (['12,50', '3,5'], ETL_Numeros.FORMATO_COMA_DECIMAL),
+    (['1.234,5'], ETL_Numeros.FORMATO_COMA_DECIMAL),
+    (['1.234.567'], ETL_Numeros.FORMATO_COMA_DECIMAL),
+    (['1234'], ETL_Numeros.FORMATO_PUNTO_DECIMAL),
+    ([], ETL_Numeros.FORMATO_PUNTO_DECIMAL),
+])
+def test_detectar_formato(textos, formato):
+    assert ETL_Numeros.detectar_formato(pd.Series(textos, dtype=object)) == formato
+
+
+def test_a_numero_nulos_y_no_convertibles(capsys):
+    serie = pd.Series(['1,234.5', None, '', 'n/d', '1,234.5'], index=[10, 11, 12, 13, 14], name='Valor')
+    resultado = ETL_Numeros.a_numero(serie, 'Valor')
+
+    assert resultado.index.tolist() == [10, 11, 12, 13, 14]
+    np.testing.assert_array_equal(resultado.to_numpy(), [1234.5, np.nan, np.nan, np.nan, 1234.5])
+    assert "1 celdas de la columna 'Valor'" in capsys.readouterr().out
+
+
+def test_a_numero_columna_numerica():
+    serie = pd.Series([1, 2, 3], dtype='int64')
+    assert ETL_Numeros.a_numero(serie).dtype == 'float64'
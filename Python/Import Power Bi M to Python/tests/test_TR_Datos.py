@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+import ETL_Esquemas
+import TR_Datos
+
+FECHAS = pd.to_datetime(['2024-01-02', '2024-01-03', '2024-01-04'])
+
+
+def _origen() -> pd.DataFrame:
+    df = pd.DataFrame({
+        'Fecha': FECHAS.repeat(2),
+        'planta': ['Planta A', 'planta b'] * 3,
+        'Division': 'D1',
+        'Reporte': 'Ventas 360',
+        'Concepto': ['Toneladas', 'toneladas '] * 3,
+        'Unidad': 'TON',
+        'Orden': 1,
+        'Concepto2': None,
+        'Concepto Capacidad': 'Capacidad',
+        'Real': 1.0,
+        'Meta': [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+        'Valor Capacidad': 5.0,
+    })
+    return ETL_Esquemas.aplicar_esquema(df, 'TR_Real')
+
+
+def _catalogos(dias_laborados: pd.DataFrame):
+    return (
+        pd.DataFrame({'PLANTA': ['PLANTA A'], 'CONCEPTO': ['MAQUINA']}),
+        pd.DataFrame({'Fecha': pd.to_datetime(['2024-12-25']), 'id': [1]}),
+        pd.DataFrame({'Column2': ['OTRO'], 'Column6': ['VENTAS 360'], 'Column9': [1]}),
+        dias_laborados,
+    )
+
+
+def _ejecutar(dias_laborados: pd.DataFrame) -> pd.DataFrame:
+    """Como ETL_DAG.etapa_tr_datos: catálogos normalizados y lógica M."""
+    maquinas, festivos, prod_flag, laborados = _catalogos(dias_laborados)
+    return TR_Datos.aplicar_logica_m_completa(
+        TR_Datos.preparar_origen(_origen()),
+        TR_Datos.normalizar_catalogo(maquinas, 'ConceptosMaquinas'),
+        TR_Datos.normalizar_catalogo(festivos, 'DiasFestivos'),
+        TR_Datos.normalizar_catalogo(prod_flag, 'ConceptosProdFlag'),
+        TR_Datos.normalizar_catalogo(laborados, 'Ext_DiasLaborados'),
+    )
+
+
+def _dias_laborados(planta, concepto) -> pd.DataFrame:
+    return pd.DataFrame({
+        'date': FECHAS.repeat(2),
+        'planta': planta * 3,
+        'Conceptos_DiasLaborados': concepto * 3,
+        'Dias_Laborados': [2, 3, 2, 3, 2, 3],
+    })
+
+
+@pytest.mark.parametrize('tipado', [False, True])
+def test_catalogo_dias_laborados_con_claves_sin_normalizar(tipado):
+    # Claves en minúsculas y con espacios; tipado=True las deja categóricas, como las lee el almacén
+    laborados = _dias_laborados([' planta a', 'Planta B'], ['toneladas', 'Toneladas '])
+    if tipado:
+        laborados = ETL_Esquemas.aplicar_esquema(laborados, 'Ext_DiasLaborados')
+        assert isinstance(laborados['planta'].dtype, pd.CategoricalDtype)
+
+    resultado = _ejecutar(laborados)
+    limpio = _ejecutar(_dias_laborados(['PLANTA A', 'PLANTA B'], ['TONELADAS', 'TONELADAS']))
+
+    assert resultado['Meta'].tolist() == [20.0, 60.0, 60.0, 120.0, 100.0, 180.0]
+    pd.testing.assert_series_equal(resultado['Meta'], limpio['Meta'])
+
+
+def test_normalizar_catalogo_conserva_categoricas():
+    laborados = ETL_Esquemas.aplicar_esquema(_dias_laborados([' planta a', 'Planta B'], ['x', 'y']), 'Ext_DiasLaborados')
+    normalizado = TR_Datos.normalizar_catalogo(laborados, 'Ext_DiasLaborados')
+    assert isinstance(normalizado['planta'].dtype, pd.CategoricalDtype)
+    assert set(normalizado['planta']) == {'PLANTA A', 'PLANTA B'}
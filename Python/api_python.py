@@ -2,8 +2,15 @@ import pandas as pd
 import requests
 import json
 import numpy as np 
+import os
+import sys
 from typing import List, Dict, Any, Optional
-from unidecode import unidecode # Necesario para limpiar claves de merge
+
+# Módulos compartidos del flujo ETL (catálogo compilado de conceptos y pivote de saldos)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Import Power Bi M to Python'))
+import ETL_CatalogoConceptos
+import ETL_Perfil
+import ETL_Pivote
 
 # --- 1. CONFIGURACIÓN ---
 API_URL = "https://kpis.grupo-ortiz.site/Controllers/apiController.php?op=api"
@@ -11,184 +18,13 @@ HEADERS = {'Accept': 'application/json'}
 ID_VARS = ["date", "planta", "SEGMENTO"] 
 REPORTE_COLS = ["VENTAS 360", "PRODUCCION 360", "INVENTARIOS 360", "DESEMPEÑO 360"]
 
-# Columnas de saldo que serán desdinamizadas (Unpivot) para crear 'TIPO SALDO'
-UNPIVOT_VALUE_COLS = ["REAL", "META", "CAPACIDAD", "CAPACIDAD 91", "VALOR TOPE", "VALOR PLANTA", "VALOR TRANSITO"] 
-
 # ==================================================================================
-# --- CONTENIDO DEL CSV CARGADO (SIMULACIÓN DE LECTURA) ---
+# --- CATÁLOGO ConceptosReporte ---
 # ==================================================================================
-# Utiliza el contenido literal que proporcionaste
-CATALOGO_CSV_CONTENT = """
-,,,,,,,,,,,,,,,
-,CONCEPTO,REAL,META,CAPACIDAD,VALOR TOPE,VALOR PLANTA,VALOR TRANSITO,DIAS LABORABLES,DIAS LABORABLES CAPACIDADES,CONCEPTO CAPACIDAD,UNIDAD,SECCION,ORDEN,CONCEPTO 2,FLAG
-,💵 Ventas,IMPORTE TOTAL,META VENTA IMPORTE,,,,,DIAS VENTA IMPORTE,,,$,Desempeño 360,1,💵 Ventas,
-,📉 Costo de Ventas,COSTO TOTAL,META COSTO,,,,,DIAS COSTO,,,$,Desempeño 360,2,📉 Costo de Ventas,
-,💰 Gasto de Operación,GASTO OPERATIVO,META GASTO,,,,,DIAS GASTO,,,$,Desempeño 360,3,💰 Gasto de Operación,
-,💸 Utilidad Neta,FLUJO NETO,META UTILIDAD,,,,,DIAS UTILIDAD,,,$,Desempeño 360,4,💸 Utilidad Neta,
-,,,,,,,,,,,,,,,
-,,,,,,,,,,,,,,,
-,,,,,,,,,,,,,,,
-,CONCEPTO,REAL,META,CAPACIDAD,VALOR TOPE,VALOR PLANTA,VALOR TRANSITO,DIAS LABORABLES,DIAS LABORABLES CAPACIDADES,CONCEPTO CAPACIDAD,UNIDAD,SECCION,ORDEN,CONCEPTO 2,FLAG
-,1A kg,PRIMERA PRODUCCION KG,META PRIMERA KG,,,,,DIAS PRIMERA KG,,,kg,Produccion 360,5,1A,1
-,1A pz,PRIMERA PRODUCCION PZ,META PRIMERA PZS,,,,,DIAS PRIMERA PZS,,,pz,Produccion 360,6,1A,1
-,2DA kg,SEGUNDA PRODUCCION KG,META SEGUNDA KG,,,,,DIAS SEGUNDA KG,,,kg,Produccion 360,7,2DA,1
-,2DA pz,SEGUNDA PRODUCCION PZ,META SEGUNDA PZS,,,,,DIAS SEGUNDA PZS,,,pz,Produccion 360,8,2DA,1
-,Desperdicio kg,DESPERDICIO PRODUCCION KG,META DESPERDICIO KG,,,,,DIAS DESPERDICIO KG,,,kg,Produccion 360,9,DESPERDICIO,1
-,PELETIZADO KILOS,PELETIZADO P,META PELETIZADO P,,,,,DIAS PELETIZADO P,,,kg,Produccion 360,10,PELETIZADO KILOS,1
-,PRODUCCION TOTAL,PRODUCCION TOTAL KG,META PRODUCCION TOTAL KG,,,,,,,,kg,Produccion 360,11,PRODUCCION TOTAL,1
-,KG POR PERSONA,KG POR PERSONA,META KG POR PERSONA,,,,,DIAS KG POR PERSONA,,,KILOS,Produccion 360,12,KG POR PERSONA,1
-,PZ POR PERSONA,PZ POR PERSONA,META PZ POR PERSONA,,,,,DIAS PZ POR PERSONA,,,PIEZAS,Produccion 360,13,PZ POR PERSONA,1
-,,,,,,,,,,,,,,,
-,,,,,,,,,,,,,,,
-,CONCEPTO,REAL,META,CAPACIDAD,VALOR TOPE,VALOR PLANTA,VALOR TRANSITO,DIAS LABORABLES,DIAS LABORABLES CAPACIDADES,CONCEPTO CAPACIDAD,UNIDAD,SECCION,ORDEN,CONCEPTO 2,FLAG
-,EXTRUDER,EXTRUDER,META EXTRUDER,META CAPACIDAD EXTRUDER,,,,DIAS EXTRUDER,DIAS CAPACIDAD EXTRUDER,META CAPACIDAD EXTRUDER,KILOS,Produccion 360,1000,EXTRUDER,2
-,EXTRUDER MONOFILAMENTO,EXTRUDER MONOFILAMENTO,META EXTRUDER MONOFILAMENTO,META CAPACIDAD EXTRUDER MONOFILAMENTO,,,,DIAS EXTRUDER MONOFILAMENTO,DIAS CAPACIDAD EXTRUDER MONOFILAMENTO,META CAPACIDAD EXTRUDER MONOFILAMENTO,KILOS,Produccion 360,1000,EXTRUDER MONOFILAMENTO,2
-,EXTRUDER RAFIA FIBRILADA,EXTRUDER RAFIA FIBRILADA,META EXTRUDER RAFIA FIBRILADA,META CAPACIDAD EXTRUDER RAFIA FIBRILADA,,,,DIAS EXTRUDER RAFIA FIBRILADA,DIAS CAPACIDAD EXTRUDER RAFIA FIBRILADA,META CAPACIDAD EXTRUDER RAFIA FIBRILADA,KILOS,Produccion 360,1000,EXTRUDER RAFIA FIBRILADA,2
-,EXTRUDER RAFIA SOPLADA,EXTRUDER RAFIA SOPLADA,META EXTRUDER RAFIA SOPLADA,META CAPACIDAD EXTRUDER RAFIA SOPLADA,,,,DIAS EXTRUDER RAFIA SOPLADA,DIAS CAPACIDAD EXTRUDER RAFIA SOPLADA,META CAPACIDAD EXTRUDER RAFIA SOPLADA,KILOS,Produccion 360,1000,EXTRUDER RAFIA SOPLADA,2
-,TELARES,TELARES MT,META TELARES,META CAPACIDAD TELARES,,,,DIAS TELARES,DIAS CAPACIDAD TELARES,META CAPACIDAD TELARES,METROS,Produccion 360,1000,TELARES,2
-,TELAR JUMBO,TELAR JUMBO MT,META TELARES JUMBO,META CAPACIDAD TELAR JUMBO,,,,DIAS TELARES JUMBO,DIAS CAPACIDAD TELAR JUMBO,META CAPACIDAD TELAR JUMBO,METROS,Produccion 360,1000,TELAR JUMBO,2
-,VALVULADO,VALVULADO,META VALVULADO,META CAPACIDAD VALVULADO,,,,DIAS VALVULADO,DIAS CAPACIDAD VALVULADO,META CAPACIDAD VALVULADO,PIEZAS,Produccion 360,1000,VALVULADO,2
-,LAMINADO,LAMINADO,META LAMINADO,META CAPACIDAD LAMINADO,,,,DIAS LAMINADO,DIAS CAPACIDAD LAMINADO,META CAPACIDAD LAMINADO,METROS,Produccion 360,1000,LAMINADO,2
-,IMPRESION,IMPRESION,META IMPRESION,META CAPACIDAD IMPRESION,,,,DIAS IMPRESION,DIAS CAPACIDAD IMPRESION,META CAPACIDAD IMPRESION,METROS,Produccion 360,1000,IMPRESION,2
-,CONFECCION,CONFECCION,META CONFECCION,META CAPACIDAD CONFECCION,,,,DIAS CONFECCION,DIAS CAPACIDAD CONFECCION,META CAPACIDAD CONFECCION,PIEZAS,Produccion 360,1000,CONFECCION,2
-,CABLEADORAS,PRODUCCION CABLE KG,META CABLEADORAS,META CAPACIDAD CABLEADORAS,,,,DIAS CABLEADORAS,DIAS CAPACIDAD CABLEADORAS,META CAPACIDAD CABLEADORAS,KILOS,Produccion 360,1000,CABLEADORAS,2
-,BOLERAS RAFIAS FIBRILADA,BOLERA RAFIA FIBRILADA,META BOLERAS RAFIAS FIBRILADA,META CAPACIDAD BOLERAS RAFIAS FIBRILADA,,,,DIAS BOLERAS RAFIAS FIBRILADA,DIAS CAPACIDAD BOLERAS RAFIAS FIBRILADA,META CAPACIDAD BOLERAS RAFIAS FIBRILADA,KILOS,Produccion 360,1000,BOLERAS RAFIAS FIBRILADA,2
-,BOLERAS RAFIA SOPLADA,BOLERA RAFIA SOPLADA,META BOLERAS RAFIA SOPLADA,META CAPACIDAD BOLERAS RAFIA SOPLADA,,,,DIAS BOLERAS RAFIA SOPLADA,DIAS CAPACIDAD BOLERAS RAFIA SOPLADA,META CAPACIDAD BOLERAS RAFIA SOPLADA,KILOS,Produccion 360,1000,BOLERAS RAFIA SOPLADA,2
-,OVER,OVER,META OVER,META CAPACIDAD OVER,,,,DIAS OVER,DIAS CAPACIDAD OVER,META CAPACIDAD OVER,PIEZAS,Produccion 360,1000,OVER,2
-,AUTOMATEX,AUTOMATEX PZ,META AUTOMATEX,META CAPACIDAD AUTOMATEX,,,,DIAS AUTOMATEX,DIAS CAPACIDAD AUTOMATEX,META CAPACIDAD AUTOMATEX,PIEZAS,Produccion 360,1000,AUTOMATEX,2
-,PRENSA ,PRENSA PZ,META PRENSA,META CAPACIDAD PRENSA,,,,DIAS PRENSA,DIAS CAPACIDAD PRENSA,META CAPACIDAD PRENSA,PIEZAS,Produccion 360,1000,PRENSA,2
-,FFS,FFS,META FFS,META CAPACIDAD FFS,,,,DIAS FFS,DIAS CAPACIDAD FFS,META CAPACIDAD FFS,KILOS,Produccion 360,1000,FFS,2
-,SML0,SML0 KG,META SML0,META CAPACIDAD SML0,,,,DIAS SML0,DIAS CAPACIDAD SML0,META CAPACIDAD SML0,KILOS,Produccion 360,1000,SML0,2
-,SML1,SML1 KG,META SML1,META CAPACIDAD SML1,,,,DIAS SML1,DIAS CAPACIDAD SML1,META CAPACIDAD SML1,KILOS,Produccion 360,1000,SML1,2
-,SML2,SML2 KG,META SML2,META CAPACIDAD SML2,,,,DIAS SML2,DIAS CAPACIDAD SML2,META CAPACIDAD SML2,KILOS,Produccion 360,1000,SML2,2
-,SML4,SML4 KG,META SML4,META CAPACIDAD SML4,,,,DIAS SML4,DIAS CAPACIDAD SML4,META CAPACIDAD SML4,KILOS,Produccion 360,1000,SML4,2
-,PREESTIRADO,PREESTIRADO KG,META PREESTIRADO,META CAPACIDAD PREESTIRADO,,,,DIAS PREESTIRADO,DIAS CAPACIDAD PREESTIRADO,META CAPACIDAD PREESTIRADO,KILOS,Produccion 360,1000,PREESTIRADO,2
-,REBOBINADO,REBOBINADO KG,META REBOBINADO,META CAPACIDAD REBOBINADO,,,,DIAS REBOBINADO,DIAS CAPACIDAD REBOBINADO,META CAPACIDAD REBOBINADO,KILOS,Produccion 360,1000,REBOBINADO,2
-,CORTADORA,CORTADORA KG,META CORTADORA,META CAPACIDAD CORTADORA,,,,DIAS CORTADORA,DIAS CAPACIDAD CORTADORA,META CAPACIDAD CORTADORA,KILOS,Produccion 360,1000,CORTADORA,2
-,BOLSEO,BOLSEO,META BOLSEO,META CAPACIDAD BOLSEO,,,,DIAS BOLSEO,DIAS CAPACIDAD BOLSEO,META CAPACIDAD BOLSEO,PIEZAS,Produccion 360,1000,BOLSEO,2
-,PELETIZADORA,PELETIZADORA,META PELETIZADORA,META CAPACIDAD PELETIZADORA,,,,DIAS PELETIZADORA,DIAS CAPACIDAD PELETIZADORA,META CAPACIDAD PELETIZADORA,KILOS,Produccion 360,1000,PELETIZADORA,2
-,LAVADORA,LAVADORA,META LAVADORA,META CAPCIDAD LAVADORA,,,,DIAS LAVADORA,DIAS CAPCIDAD LAVADORA,META CAPCIDAD LAVADORA,KILOS,Produccion 360,1000,LAVADORA,2
-,RECTA,RECTA,META RECTA,META CAPACIDAD RECTA,,,,DIAS RECTA,DIAS CAPACIDAD RECTA,META CAPACIDAD RECTA,METROS,Produccion 360,1000,RECTA,2
-,CORTE,CORTE,META CORTE,META CAPACIDAD CORTE,,,,DIAS CORTE,DIAS CAPACIDAD CORTE,META CAPACIDAD CORTE,METROS,Produccion 360,1000,CORTE,2
-,,,,,,,,,,,,,,,
-,,,,,,,,,,,,,,,
-,,,,,,,,,,,,,,,
-,CONCEPTO,REAL,META,CAPACIDAD,VALOR TOPE,VALOR PLANTA,VALOR TRANSITO,DIAS LABORABLES,DIAS LABORABLES CAPACIDADES,CONCEPTO CAPACIDAD,UNIDAD,SECCION,ORDEN,CONCEPTO 2,FLAG
-,EFICIENCIA KG,KG POR PERSONA,-,,,,,,,,KILOS,Produccion 360,20,EFICIENCIA,
-,EFICIENCIA PZ,PZ POR PERSONA,-,,,,,,,,PIEZAS,Produccion 360,21,EFICIENCIA,
-,,,,,,,,,,,,,,,
-,,,,,,,,,,,,,,,
-,CONCEPTO,REAL,META,CAPACIDAD,VALOR TOPE,VALOR PLANTA,VALOR TRANSITO,DIAS LABORABLES,DIAS LABORABLES CAPACIDADES,CONCEPTO CAPACIDAD,UNIDAD,SECCION,ORDEN,CONCEPTO 2,FLAG
-,PRECIO DE VENTA,PRECIO DE VENTA POR KILO,-,,,,,-,,,$,Ventas 360,22,PRECIO DE VENTA,
-,COSTO VENTA,COSTO POR KILO DE VENTA,-,,,,,-,,,$,Ventas 360,23,COSTO VENTA,
-,COSTO PRODUCCION,COSTO PRODUCCION POR KILO,-,,,,,-,,,$,Ventas 360,24,COSTO PRODUCCION,
-,PRECIO PRODUCCION,PRECIO DE VENTA POR KILO PRODUCCION,-,,,,,-,,,$,Ventas 360,25,PRECIO PRODUCCION,
-,PEDIDOS COLOCADOS KG,PEDIDOS COLOCADOS KG,-,,,,,-,,,KILOS,Ventas 360,26,PEDIDOS COLOCADOS,
-,PEDIDOS COLOCADOS PZ,PEDIDOS COLOCADOS PZ,-,,,,,-,,,PIEZAS,Ventas 360,27,PEDIDOS COLOCADOS,
-,FACTURADO KG,FACTURADO KG,META VENTA KILOS FACTURADO,,,,,DIAS FACTURADO KG,,,KILOS,Ventas 360,28,FACTURADO,
-,FACTURADO PZ,FACTURADO PZ,META VENTA PIEZAS FACTURADO,,,,,DIAS FACTURADO PZ,,,PIEZAS,Ventas 360,29,FACTURADO,
-,FABRICADO KG,FABRICADO KG,-,,,,,-,,,KILOS,Ventas 360,30,FABRICADO,
-,FABRICADO PZ,FABRICADO PZ,-,,,,,-,,,PIEZAS,Ventas 360,31,FABRICADO,
-,PRECIO VENTA PELETIZADO,PRECIO VENTA PELETIZADO,-,,,,,-,,,$,Ventas 360,32,PRECIO VENTA PELETIZADO,
-,PRECIO VENTA TRITURADO,PRECIO VENTA TRITURADO,-,,,,,-,,,$,Ventas 360,33,PRECIO VENTA TRITURADO,
-,PRECIO VENTA LAVADO,PRECIO VENTA LAVADO,-,,,,,-,,,$,Ventas 360,34,PRECIO VENTA LAVADO,
-,,,,,,,,,,,,,,,
-,,,,,,,,,,,,,,,
-,CONCEPTO,REAL,META,CAPACIDAD,VALOR TOPE,VALOR PLANTA,VALOR TRANSITO,DIAS LABORABLES,DIAS LABORABLES CAPACIDADES,CONCEPTO CAPACIDAD,UNIDAD,SECCION,ORDEN,CONCEPTO 2,FLAG
-,PT KG,,,,PT INVENTARIO TOPE KG,PT INVENTARIO KG,-,DIAS STOCK PT KG,,,KILOS,Inventarios 360,101,PT KG,
-,PT PZ,,,,PT INVENTARIO TOPE PZ,PT INVENTARIO PZ,-,DIAS STOCK PT PZS,,,PIEZAS,Inventarios 360,102,PT PZ,
-,2DA KG,,,,-,SEGUNDA INVENTARIO KG,-,,,,KILOS,Inventarios 360,103,2DA KG,
-,2DA PZ,,,,-,SEGUNDA INVENTARIO PZ,-,,,,PIEZAS,Inventarios 360,104,2DA PZ,
-,MP KG,,,,MP INVENTARIO TOPE,MP INVENTARIO PLANTA,MP INVENTARIO TRANSITO,DIAS MAXIMO MP,,,KILOS,Inventarios 360,105,MP KG,
-,DESPERDICIO KG,,,,META DESPERDICIO INVENTARIO,DESPERDICIO INVENTARIO KG,-,DIAS DESPERDICIO INVENTARIO KG,,,KILOS,Inventarios 360,106,DESPERDICIO KG,
-,PELETIZADO KG,,,,META PELETIZADO KG,PELETIZADO KG,-,DIAS STOCK INVENTARIO PELETIZADO,,,KILOS,Inventarios 360,107,PELETIZADO KG,
-"""
-
-
-# ==================================================================================
-# --- FUNCIONES DE CARGA Y LIMPIEZA DEL CATÁLOGO (ConceptosReporte) ---
-# ==================================================================================
-
-def cargar_catalogo_desde_csv_cargado(csv_content: str) -> pd.DataFrame:
-    """
-    Procesa el contenido del CSV cargado, maneja múltiples encabezados y el unpivot 
-    para crear la tabla ConceptosReporte (el catálogo).
-    """
-    print("   📥 Iniciando Carga Robusta y Limpieza del Catálogo CSV...")
-    try:
-        # 1. Leer el contenido como DataFrame, sin encabezados y sin saltar filas
-        from io import StringIO
-        df_raw = pd.read_csv(StringIO(csv_content), header=None, skiprows=0, sep=',', engine='python', skipinitialspace=True)
-        
-        # 2. Encontrar todas las filas de encabezado (donde la columna B es 'CONCEPTO')
-        # La columna 0 es la primera coma vacía, la columna 1 es 'CONCEPTO'
-        header_indices = df_raw[df_raw.iloc[:, 1].astype(str).str.strip().str.upper() == 'CONCEPTO'].index.tolist()
-        
-        if not header_indices:
-            raise ValueError("No se encontraron filas de encabezado 'CONCEPTO' en la columna B del CSV.")
-
-        df_list = []
-        
-        # 3. Procesar cada sección del catálogo
-        for i, start_index in enumerate(header_indices):
-            
-            # Determinar el final de esta sección (inicio de la siguiente o final del archivo)
-            end_index = header_indices[i+1] if i + 1 < len(header_indices) else len(df_raw)
-            
-            # Obtener el sub-DataFrame
-            df_section = df_raw.iloc[start_index:end_index].copy()
-            
-            # Promover encabezados
-            new_header = df_section.iloc[0].astype(str).str.strip().str.upper().tolist()
-            df_section = df_section[1:].copy()
-            df_section.columns = new_header
-            df_section = df_section.reset_index(drop=True)
-
-            # Quitar filas completamente vacías o con CONCEPTO vacío
-            df_section = df_section[df_section['CONCEPTO'].astype(str).str.strip() != ''].copy()
-            
-            df_list.append(df_section)
-
-        # 4. Concatenar todas las secciones limpias
-        df_base = pd.concat(df_list, ignore_index=True)
-        
-        # 5. Estandarizar columnas a utilizar
-        cols_to_keep_upper = [col.upper() for col in ["CONCEPTO", "REAL", "META", "CAPACIDAD", "VALOR TOPE", 
-                                                      "VALOR PLANTA", "VALOR TRANSITO", 
-                                                      "UNIDAD", "SECCION", "ORDEN", "CONCEPTO 2", "CONCEPTO CAPACIDAD"]]
-        
-        df_base = df_base.filter(items=cols_to_keep_upper, axis=1).copy()
-        df_base = df_base.replace({np.nan: ''})
-        
-        # Forzar Orden a numérico, manejando errores (como '1000' o '-'/vacío)
-        if 'ORDEN' in df_base.columns:
-            df_base['ORDEN'] = pd.to_numeric(df_base['ORDEN'], errors='coerce').astype('Int64', errors='ignore')
-            
-        # 6. Desdinamización (Unpivot) para simular la estructura de ConceptosReporte con TipoSaldo
-        id_cols_unpivot = [col for col in df_base.columns if col not in [c.upper() for c in UNPIVOT_VALUE_COLS]]
-        
-        df_unpivot = df_base.melt(
-            id_vars=id_cols_unpivot,
-            value_vars=[col.upper() for col in UNPIVOT_VALUE_COLS if col.upper() in df_base.columns],
-            var_name="TIPO SALDO",
-            value_name="CONCEPTO REPORTE"
-        )
-        
-        # 7. Limpieza final de filas generadas por el Unpivot (donde el concepto real del reporte es '-')
-        df_unpivot = df_unpivot[
-            (df_unpivot['CONCEPTO REPORTE'].astype(str).str.strip() != '') & 
-            (df_unpivot['CONCEPTO REPORTE'].astype(str).str.strip() != '-') &
-            (~df_unpivot['CONCEPTO REPORTE'].astype(str).str.upper().isin(['NAN', 'NONE']))
-        ].copy()
-        
-        df_unpivot['TIPO SALDO'] = df_unpivot['TIPO SALDO'].astype(str).str.upper()
-        
-        print(f"   ✔️ Catálogo (ConceptosReporte) cargado y transformado con {len(df_unpivot)} filas.")
-        return df_unpivot
-
-    except Exception as e:
-        print(f"❌ Error al procesar Catálogo CSV: {e}")
-        return pd.DataFrame()
+# El catálogo sale del snapshot compilado de ConceptosReporte.py (ETL_CatalogoConceptos),
+# el mismo que usa TR_Real: ya trae el índice de las claves normalizadas para el merge.
+COLUMNAS_CATALOGO = ["CONCEPTO", "UNIDAD", "SECCION", "ORDEN", "CONCEPTO 2", "CONCEPTO CAPACIDAD",
+                     "TIPO SALDO", "CONCEPTO REPORTE"]
 
 
 # ==================================================================================
@@ -265,9 +101,12 @@ def expandir_y_unificar_reporte(
     return df_unpivot.dropna(subset=id_cols_present, how='all')
 
 # --- Función de Transformación del Script M (Se mantiene la lógica anterior) ---
-def crear_tabla_procesada_catalogos(df_api_limpio: pd.DataFrame, df_catalogo: pd.DataFrame) -> pd.DataFrame:
+def crear_tabla_procesada_catalogos(
+    df_api_limpio: pd.DataFrame,
+    catalogo: ETL_CatalogoConceptos.CatalogoConceptos
+) -> pd.DataFrame:
     """Implementa en Python la lógica del script de Power Query (Lenguaje M)."""
-    if df_api_limpio.empty or df_catalogo.empty:
+    if df_api_limpio.empty or catalogo.tabla.empty:
         return pd.DataFrame()
 
     print("\n   Creando Tabla Final: Procesando Catálogos y Consolidando Saldos (Lógica M)...")
@@ -276,27 +115,15 @@ def crear_tabla_procesada_catalogos(df_api_limpio: pd.DataFrame, df_catalogo: pd
     df_temp = df_api_limpio.rename(columns={'SEGMENTO': 'Division'}).copy()
     
     # --- Estandarización de Claves para el Merge (CRÍTICO) ---
-    def clean_key_normalized(s):
-        if pd.isna(s): return ''
-        s_str = str(s).strip()
-        s_normalized = unidecode(s_str).upper()
-        # Limpieza de caracteres que pueden variar entre la API y el Catálogo
-        s_cleaned = s_normalized.replace(" ", "").replace("360", "").replace("$", "").replace("💵", "").replace("📉", "").replace("💰", "").replace("💸", "").replace(":", "").replace("-", "")
-        return s_cleaned
-
-    df_catalogo['SECCION_KEY'] = df_catalogo['SECCION'].apply(clean_key_normalized)
-    df_temp['Reporte_KEY'] = df_temp['Reporte'].apply(clean_key_normalized)
-    df_catalogo['CONCEPTO_REPORTE_KEY'] = df_catalogo['CONCEPTO REPORTE'].apply(clean_key_normalized)
-    df_temp['Concepto_Reporte_KEY'] = df_temp['Concepto_Reporte'].apply(clean_key_normalized)
-    
+    # Sin acentos, mayúsculas, sin espacios, sin '360' ni símbolos ($, emojis, ':', '-').
+    # Las claves del catálogo ya vienen normalizadas en el índice del snapshot ('claves');
+    # las de la API se normalizan una vez por valor distinto.
     # #"Consultas combinadas" (Table.NestedJoin - Inner)
-    df_merged = pd.merge(
-        df_temp,
-        df_catalogo,
-        left_on=['Concepto_Reporte_KEY', 'Reporte_KEY'],
-        right_on=['CONCEPTO_REPORTE_KEY', 'SECCION_KEY'],
-        how='inner' 
-    )
+    with ETL_Perfil.paso('Consultas combinadas (Join ConceptosReporte)', df_temp) as paso:
+        df_merged = catalogo.unir(
+            df_temp, ['Concepto_Reporte', 'Reporte'], normalizacion='claves', columnas=COLUMNAS_CATALOGO
+        )
+        paso.salida(df_merged)
     
     if df_merged.empty:
         print("❌ Fallo: La combinación (Merge) de datos de la API y el Catálogo resultó en 0 filas.")
@@ -307,55 +134,30 @@ def crear_tabla_procesada_catalogos(df_api_limpio: pd.DataFrame, df_catalogo: pd
         'CONCEPTO': 'Concepto', 'UNIDAD': 'Unidad', 'ORDEN': 'Orden',
         'CONCEPTO 2': 'Concepto2', 'TIPO SALDO': 'TipoSaldo',
         'CONCEPTO CAPACIDAD': 'Concepto Capacidad'
-    }).drop(columns=['CONCEPTO REPORTE', 'SECCION', 'Concepto_Reporte_KEY', 'Reporte_KEY', 'CONCEPTO_REPORTE_KEY', 'SECCION_KEY'], errors='ignore')
+    }).drop(columns=['CONCEPTO REPORTE', 'SECCION'], errors='ignore')
     
     df_expanded.rename(columns={'date': 'Fecha', 'FECHA': 'Fecha'}, inplace=True, errors='ignore')
     
     ID_GROUP_KEYS = ["Fecha", "planta", "Division", "Reporte", "Concepto", "Unidad", "Orden", "Concepto2", "Concepto Capacidad"]
     ID_GROUP_KEYS_PRESENT = [col for col in ID_GROUP_KEYS if col in df_expanded.columns]
 
-    saldos_map = {
-        "REAL": "Real", "META": "Meta", "VALOR TOPE": "Valor Tope", 
-        "VALOR PLANTA": "Valor Planta", "VALOR TRANSITO": "Valor Transito", 
-        "CAPACIDAD": "Valor Capacidad", "CAPACIDAD 91": "Valor Capacidad 91"
-    }
-    tipos_saldos_existentes = df_expanded['TipoSaldo'].unique()
-    saldos_map_final = {k: v for k, v in saldos_map.items() if k in tipos_saldos_existentes}
-
-    # Simulación de FCN_TipoSaldoAColumnas y ConcatenaSaldos
-    df_pivot_prep = []
-    
-    for tipo_saldo_m, nombre_columna_py in saldos_map_final.items():
-        df_filtro = df_expanded[df_expanded['TipoSaldo'] == tipo_saldo_m].copy()
-        
-        if not df_filtro.empty:
-            cols_to_drop = [c for c in ['Concepto_Reporte', 'TipoSaldo'] if c in df_filtro.columns]
-            df_filtro = df_filtro.drop(columns=cols_to_drop, errors='ignore')
-            
-            cols_to_select = ID_GROUP_KEYS_PRESENT + ['Valor']
-            df_filtro = df_filtro.filter(items=cols_to_select, axis=1).rename(columns={'Valor': nombre_columna_py})
-            df_pivot_prep.append(df_filtro)
-            
-    if not df_pivot_prep: return pd.DataFrame()
-    
-    df_concatenado = df_pivot_prep[0]
-    for df_next in df_pivot_prep[1:]:
-        df_concatenado = pd.merge(df_concatenado, df_next, on=ID_GROUP_KEYS_PRESENT, how='outer')
-
-    # #"Valor reemplazado" (Replace null, 0)
-    sum_cols = list(saldos_map_final.values())
-    df_concatenado[sum_cols] = df_concatenado[sum_cols].fillna(0) 
-    
-    # AgrupaConceptos (Table.Group)
-    df_grouped = df_concatenado.groupby(ID_GROUP_KEYS_PRESENT, dropna=False).sum(numeric_only=True).reset_index()
+    # FCN_TipoSaldoAColumnas + ConcatenaSaldos + AgrupaConceptos en una sola pasada:
+    # una agrupación por (claves, TipoSaldo) y TipoSaldo a columnas (ver ETL_Pivote)
+    with ETL_Perfil.paso('FCN_TipoSaldoAColumnas + AgrupaConceptos', df_expanded) as paso:
+        df_grouped = ETL_Pivote.pivotar_saldos(df_expanded, ID_GROUP_KEYS_PRESENT)
+        paso.salida(df_grouped)
+    sum_cols = [col for col in df_grouped.columns if col not in ID_GROUP_KEYS_PRESENT]
+    if not sum_cols: return pd.DataFrame()
 
     # QuitaValorCero (Table.SelectRows)
-    filtro_no_cero = (df_grouped[sum_cols].sum(axis=1) != 0)
-    df_final = df_grouped[filtro_no_cero].copy()
-    
-    final_cols_order = ["Fecha", "planta", "Division", "Reporte", "Concepto", "Unidad", "Orden", "Concepto2", "Concepto Capacidad"] + sum_cols
-    cols_present = [col for col in final_cols_order if col in df_final.columns]
-    df_final = df_final.filter(items=cols_present, axis=1)
+    with ETL_Perfil.paso('QuitaValorCero y reordenamiento', df_grouped) as paso:
+        filtro_no_cero = (df_grouped[sum_cols].sum(axis=1) != 0)
+        df_final = df_grouped[filtro_no_cero].copy()
+        
+        final_cols_order = ["Fecha", "planta", "Division", "Reporte", "Concepto", "Unidad", "Orden", "Concepto2", "Concepto Capacidad"] + sum_cols
+        cols_present = [col for col in final_cols_order if col in df_final.columns]
+        df_final = df_final.filter(items=cols_present, axis=1)
+        paso.salida(df_final)
 
     print(f"   ✔️ Tabla Final (Catálogo Procesado) creada con {len(df_final)} filas.")
     
@@ -368,10 +170,14 @@ def crear_tabla_procesada_catalogos(df_api_limpio: pd.DataFrame, df_catalogo: pd
 
 if __name__ == '__main__':
     
-    # 1. CARGA DEL CATÁLOGO DESDE EL CONTENIDO CSV
-    df_catalogo_conceptos = cargar_catalogo_desde_csv_cargado(CATALOGO_CSV_CONTENT)
+    # 1. CARGA DEL CATÁLOGO (SNAPSHOT COMPILADO DE ConceptosReporte)
+    try:
+        catalogo_conceptos = ETL_CatalogoConceptos.cargar_catalogo()
+    except Exception as e:
+        print(f"❌ Error al cargar el catálogo de conceptos: {e}")
+        catalogo_conceptos = None
     
-    if df_catalogo_conceptos.empty:
+    if catalogo_conceptos is None or catalogo_conceptos.tabla.empty:
         print("🛑 Error Fatal: El catálogo de conceptos no pudo ser cargado o está vacío. Finalizando.")
         exit()
     
@@ -404,7 +210,7 @@ if __name__ == '__main__':
     print(f"✔️ Ext_Datos (API Detallada) generado con {len(df_api_limpio)} filas.")
     
     # 3. CREACIÓN DE LA TABLA FINAL (MERGE API + CATÁLOGO)
-    df_procesado_catalogo = crear_tabla_procesada_catalogos(df_api_limpio, df_catalogo_conceptos)
+    df_procesado_catalogo = crear_tabla_procesada_catalogos(df_api_limpio, catalogo_conceptos)
 
     # 4. EXPORTACIÓN DEL RESULTADO
     output_filename = 'datos_api_procesados_final.csv'